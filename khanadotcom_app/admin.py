@@ -1,53 +1,159 @@
 from django.contrib import admin
+from django.db.models import Sum
+from django.urls import reverse
+from django.utils.html import format_html
 from .models import *
+from . import lifecycle, search
+from .admin_tools import AutocompleteFilter, CappedInlineFormSet, LargeTableAdminMixin
 
 # Register your models here
 
+
+class FullTextSearchMixin:
+    # Answer the changelist search box from the FTS index instead of
+    # LIKE '%term%' scans over search_fields.
+    search_kind = None
+
+    def get_search_results(self, request, queryset, search_term):
+        if not search_term or not search.search_available():
+            return super().get_search_results(request, queryset, search_term)
+        ids = search.matching_ids(self.search_kind, search_term)
+        if ids is None:
+            return queryset.none(), False
+        return queryset.filter(pk__in=ids), False
+
+
 @admin.register(User)
 class UserAdmin(admin.ModelAdmin):
     list_display = ('name', 'email', 'user_type', 'is_staff', 'is_active')
     list_filter = ('user_type', 'is_staff', 'is_active')
     search_fields = ('name', 'email')
+    # Orders the user autocomplete on order pages
+    ordering = ('name',)
 
 @admin.register(Restaurant)
-class RestaurantAdmin(admin.ModelAdmin):
+class RestaurantAdmin(FullTextSearchMixin, admin.ModelAdmin):
+    search_kind = search.RESTAURANT
     list_display = ('name', 'owner', 'address', 'phone_number', 'email')
     search_fields = ('name', 'owner__name', 'email')
+    # Orders the restaurant autocomplete on menu item pages
+    ordering = ('name',)
+
+def status_action(from_status, to_status):
+    def action(modeladmin, request, queryset):
+        moved = lifecycle.bulk_transition(queryset, from_status, to_status)
+        modeladmin.message_user(request, f"{len(moved)} orders moved to {to_status}.")
+
+    action.__name__ = f"mark_{from_status}_{to_status}"
+    action.short_description = f"Move selected {from_status} orders to {to_status}"
+    return action
+
 
 @admin.register(Order)
-class OrderAdmin(admin.ModelAdmin):
+class OrderAdmin(LargeTableAdminMixin, admin.ModelAdmin):
     list_display = ('order_id', 'user', 'total_amount', 'order_status', 'order_date')
+    list_select_related = ('user',)
     list_filter = ('order_status', 'created_at')
     search_fields = ('user__name', 'order_id')
+    autocomplete_fields = ('user',)
+    raw_id_fields = ('delivery_person', 'coupon')
+    # Status changes go through the lifecycle actions below
+    readonly_fields = ('order_status',)
+    actions = [
+        status_action(from_status, to_status)
+        for from_status, targets in lifecycle.TRANSITIONS.items()
+        for to_status in targets
+    ]
 
     class OrderItemInline(admin.TabularInline):
         model = OrderItem
+        autocomplete_fields = ('menu_item',)
+        extra = 0
 
     inlines = [OrderItemInline]
 
 @admin.register(MenuItem)
-class MenuItemAdmin(admin.ModelAdmin):
+class MenuItemAdmin(LargeTableAdminMixin, FullTextSearchMixin, admin.ModelAdmin):
+    search_kind = search.MENU_ITEM
     list_display = ('name', 'restaurant', 'price', 'availability')
-    list_filter = ('restaurant', 'availability')
+    list_select_related = ('restaurant',)
+    list_filter = (('restaurant', AutocompleteFilter), 'availability')
     search_fields = ('name', 'restaurant__name')
+    autocomplete_fields = ('restaurant',)
+    readonly_fields = ('order_lines',)
 
     class OrderItemInline(admin.TabularInline):
+        # Read-only: the latest order lines of the item, the rest are linked
+        # from order_lines.
         model = OrderItem
+        formset = CappedInlineFormSet
+        verbose_name_plural = f"Latest {CappedInlineFormSet.max_shown} order lines"
+        fields = ('order', 'quantity', 'price')
+        readonly_fields = fields
+        can_delete = False
+        extra = 0
+        max_num = 0
+
+        def get_queryset(self, request):
+            return super().get_queryset(request).select_related('order__user')
 
     inlines = [OrderItemInline]
 
+    @admin.display(description='Order lines')
+    def order_lines(self, obj):
+        if obj.pk is None:
+            return '-'
+        url = reverse('admin:khanadotcom_app_orderitem_changelist')
+        return format_html('<a href="{}?menu_item={}">All order lines of this item</a>', url, obj.pk)
+
 @admin.register(OrderItem)
-class OrderItemAdmin(admin.ModelAdmin):
+class OrderItemAdmin(LargeTableAdminMixin, admin.ModelAdmin):
     list_display = ('order', 'menu_item', 'quantity', 'price')
-    list_filter = ('order__order_status', 'menu_item__restaurant')
+    list_select_related = ('order__user', 'menu_item')
+    list_filter = ('order__order_status', ('menu_item__restaurant', AutocompleteFilter))
     search_fields = ('order__order_id', 'menu_item__name')
+    autocomplete_fields = ('menu_item',)
+    raw_id_fields = ('order',)
 
 admin.site.register(MenuItemCategory)
 admin.site.register(CustomerDetail)
 admin.site.register(DeliveryPerson)
-admin.site.register(Review)
 admin.site.register(Category)
-admin.site.register(Payment)
-admin.site.register(Coupon)
 admin.site.register(Notification)
+admin.site.register(OrderStatusLog)
+
+@admin.register(Review)
+class ReviewAdmin(LargeTableAdminMixin, admin.ModelAdmin):
+    list_display = ('review_id', 'user', 'restaurant', 'menu_item', 'rating', 'created_at')
+    list_select_related = ('user', 'restaurant', 'menu_item')
+    list_filter = ('rating',)
+    raw_id_fields = ('user', 'restaurant', 'customer', 'delivery_person', 'menu_item')
+
+@admin.register(Payment)
+class PaymentAdmin(LargeTableAdminMixin, admin.ModelAdmin):
+    list_display = ('payment_id', 'order', 'payment_method', 'amount', 'payment_status', 'payment_date')
+    list_select_related = ('order__user',)
+    list_filter = ('payment_method', 'payment_status')
+    search_fields = ('order__order_id', 'transaction_id')
+    raw_id_fields = ('order',)
+
+
+@admin.register(Coupon)
+class CouponAdmin(admin.ModelAdmin):
+    list_display = ('code', 'discount_percentage', 'max_discount_amount', 'valid_from', 'valid_to', 'active', 'max_uses', 'times_used')
+    list_filter = ('active',)
+    search_fields = ('code',)
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).annotate(used_total=Sum('usage_counters__used'))
+
+    @admin.display(ordering='used_total')
+    def times_used(self, obj):
+        return obj.used_total or 0
+
+
+@admin.register(OutboundEmail)
+class OutboundEmailAdmin(admin.ModelAdmin):
+    list_display = ('subject', 'status', 'attempts', 'next_attempt_at', 'sent_at')
+    list_filter = ('status',)
 
@@ -0,0 +1,172 @@
+from math import ceil
+
+from django.contrib import admin
+from django.contrib.admin.views.main import PAGE_VAR
+from django.contrib.admin.widgets import AutocompleteSelect
+from django.core.paginator import EmptyPage, Paginator
+from django.db.models import Max
+from django.forms.models import BaseInlineFormSet
+from django.utils.functional import cached_property
+
+# Building blocks for admin pages over the large tables (orders, order lines,
+# menu items). A changelist page should cost a fixed number of queries however
+# big the table is: related columns are joined with list_select_related, the
+# row count is estimated or counted only a few pages ahead instead of a
+# COUNT(*) over the table, filters on
+# relations search the related table instead of listing every row of it, and
+# inlines of unbounded relations show only the newest rows.
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Paginator for large tables, which never counts a whole table unless the
+    page asked for is near the end of it.
+
+    Unfiltered, it takes the highest primary key as the row count, an upper
+    bound when rows were deleted; within PAGES_AHEAD pages of the end it
+    counts the rows instead, as reaching those pages scans the table anyway.
+    Filtered, it counts at most COUNT_LIMIT rows, or up to PAGES_AHEAD pages
+    past ``current_page`` when that is further; when there are more, the
+    count is ``capped`` and shown as "N+", and moving on extends it. A page
+    past the end shows the last page rather than an error.
+    """
+
+    COUNT_LIMIT = 10000
+    PAGES_AHEAD = 10
+
+    def __init__(self, *args, current_page=1, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.current_page = current_page
+        self.capped = False
+        self.estimated = False
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if not queryset.query.where:
+            estimate = queryset.model._default_manager.aggregate(last=Max("pk"))["last"] or 0
+            near_end = self.current_page > ceil(estimate / self.per_page) - self.PAGES_AHEAD
+            if estimate > self.COUNT_LIMIT and not near_end:
+                self.estimated = True
+                return estimate
+        limit = max(self.COUNT_LIMIT, (self.current_page + self.PAGES_AHEAD) * self.per_page)
+        count = queryset[: limit + 1].count()
+        if count > limit:
+            self.capped = True
+            return limit
+        return count
+
+    @property
+    def count_display(self):
+        count = self.count  # sets capped and estimated
+        if self.capped:
+            return f"{count}+"
+        if self.estimated:
+            return f"about {count}"
+        return str(count)
+
+    def validate_number(self, number):
+        try:
+            return super().validate_number(number)
+        except EmptyPage:
+            if int(number) < 1:
+                raise
+            return self.num_pages
+
+
+class AutocompleteFilter(admin.RelatedFieldListFilter):
+    """
+    Filter on a relation with a search box (the admin's autocomplete widget)
+    instead of a link per related object. The related model's admin needs
+    search_fields, as for autocomplete_fields.
+    """
+
+    template = "admin/autocomplete_filter.html"
+
+    def __init__(self, field, request, params, model, model_admin, field_path):
+        self.admin_site = model_admin.admin_site
+        super().__init__(field, request, params, model, model_admin, field_path)
+
+    def field_choices(self, field, request, model_admin):
+        # The widget looks up the selected object itself.
+        return []
+
+    def has_output(self):
+        return True
+
+    def choices(self, changelist):
+        self.query_string = changelist.get_query_string(
+            remove=[self.lookup_kwarg, self.lookup_kwarg_isnull]
+        )
+        yield {
+            "selected": self.lookup_val is None and not self.lookup_val_isnull,
+            "query_string": self.query_string,
+            "display": "All",
+        }
+
+    def widget(self):
+        formfield = self.field.formfield(
+            widget=AutocompleteSelect(self.field, self.admin_site), required=False
+        )
+        return formfield.widget.render(
+            self.lookup_kwarg,
+            self.lookup_val[-1] if self.lookup_val else None,
+            attrs={
+                "id": f"id_filter_{self.field_path}",
+                "data-query": self.query_string,
+                # select2 triggers "change" on the original select
+                "onchange": (
+                    "var q = new URLSearchParams(this.dataset.query);"
+                    "if (this.value) q.set(this.name, this.value);"
+                    "window.location.search = q.toString();"
+                ),
+            },
+        )
+
+
+class LargeTableAdminMixin:
+    """ModelAdmin defaults for changelists over large tables."""
+
+    paginator = EstimatedCountPaginator
+    # Skips the second COUNT(*) behind "N results (M total)"
+    show_full_result_count = False
+
+    def get_paginator(self, request, queryset, per_page, orphans=0, allow_empty_first_page=True):
+        try:
+            current_page = max(int(request.GET.get(PAGE_VAR, 1)), 1)
+        except ValueError:
+            current_page = 1
+        return self.paginator(
+            queryset, per_page, orphans, allow_empty_first_page, current_page=current_page
+        )
+
+    def get_changelist_instance(self, request):
+        changelist = super().get_changelist_instance(request)
+        # The paginator shows the last page for pages past the end.
+        changelist.page_num = min(changelist.page_num, changelist.paginator.num_pages)
+        return changelist
+
+    @property
+    def media(self):
+        media = super().media
+        if any(
+            isinstance(spec, tuple) and issubclass(spec[1], AutocompleteFilter)
+            for spec in self.list_filter
+        ):
+            media += AutocompleteSelect(None, self.admin_site).media
+        return media
+
+
+class CappedInlineFormSet(BaseInlineFormSet):
+    """Inline formset of only the newest ``max_shown`` related rows."""
+
+    max_shown = 20
+
+    def get_queryset(self):
+        if not hasattr(self, "_queryset"):
+            rows = list(super().get_queryset().order_by("-pk")[: self.max_shown])
+            # Rows showing their parent (e.g. in __str__) must not load it again.
+            for row in rows:
+                setattr(row, self.fk.name, self.instance)
+            self._queryset = rows
+        return self._queryset
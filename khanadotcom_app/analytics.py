@@ -0,0 +1,152 @@
+import datetime
+
+from django.db import connection, transaction
+from django.db.models import Count, DecimalField, ExpressionWrapper, F, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .models import MenuItemDailyStats, OrderItem, RestaurantDailyStats
+
+# Sales rollups for the restaurant owner dashboard. Delivered orders are
+# summed per restaurant and day (RestaurantDailyStats) and per menu item and
+# day (MenuItemDailyStats), so the dashboard reads a few dozen small rows
+# instead of scanning orders and order items.
+#
+# lifecycle.py calls record_delivered() in the transaction that moves orders
+# to "delivered", which adds them to the rollups with one upsert per table;
+# delivered is final, so each order is added exactly once. rebuild()
+# recomputes a range of days from the orders, for the backfill_analytics
+# command. Days are order days in the current time zone.
+
+DASHBOARD_PERIODS = (7, 30, 90)
+TOP_DISHES = 10
+
+LINE_REVENUE = ExpressionWrapper(
+    F("price") * F("quantity"), output_field=DecimalField(max_digits=14, decimal_places=2)
+)
+
+
+def _restaurant_totals(lines):
+    return (
+        lines.annotate(day=TruncDate("order__order_date"))
+        .values_list("menu_item__restaurant_id", "day")
+        .annotate(
+            orders=Count("order_id", distinct=True),
+            items_sold=Sum("quantity"),
+            revenue=Sum(LINE_REVENUE),
+        )
+        .order_by()
+    )
+
+
+def _menu_item_totals(lines):
+    return (
+        lines.annotate(day=TruncDate("order__order_date"))
+        .values_list("menu_item_id", "menu_item__restaurant_id", "day")
+        # Not "quantity": the annotation would shadow the field in LINE_REVENUE
+        .annotate(sold=Sum("quantity"), revenue=Sum(LINE_REVENUE))
+        .order_by()
+    )
+
+
+def _upsert(model, columns, key_columns, counter_columns, rows):
+    """Insert ``rows``, or add their counters to the existing rows."""
+    if not rows:
+        return
+    qn = connection.ops.quote_name
+    fields = [model._meta.get_field(column) for column in columns]
+    rows = [
+        [field.get_db_prep_value(value, connection) for field, value in zip(fields, row)]
+        for row in rows
+    ]
+    sql = (
+        f"INSERT INTO {qn(model._meta.db_table)} ({', '.join(map(qn, columns))}) "
+        f"VALUES ({', '.join(['%s'] * len(columns))}) "
+        f"ON CONFLICT ({', '.join(map(qn, key_columns))}) DO UPDATE SET "
+        + ", ".join(f"{qn(c)} = {qn(c)} + excluded.{qn(c)}" for c in counter_columns)
+    )
+    with connection.cursor() as cursor:
+        cursor.executemany(sql, rows)
+
+
+def record_delivered(order_ids):
+    """Add newly delivered orders to the rollups; run in their transaction."""
+    lines = OrderItem.objects.filter(order_id__in=order_ids)
+    _upsert(
+        RestaurantDailyStats,
+        ["restaurant_id", "day", "orders", "items_sold", "revenue"],
+        ["restaurant_id", "day"],
+        ["orders", "items_sold", "revenue"],
+        list(_restaurant_totals(lines)),
+    )
+    _upsert(
+        MenuItemDailyStats,
+        ["menu_item_id", "restaurant_id", "day", "quantity", "revenue"],
+        ["menu_item_id", "day"],
+        ["quantity", "revenue"],
+        list(_menu_item_totals(lines)),
+    )
+
+
+def _day_start(day):
+    return timezone.make_aware(datetime.datetime.combine(day, datetime.time.min))
+
+
+def rebuild(start, end):
+    """Recompute the rollups of the days ``start`` to ``end``, inclusive.
+    Returns the number of restaurant-day rows written."""
+    lines = OrderItem.objects.filter(
+        order__order_status="delivered",
+        order__order_date__gte=_day_start(start),
+        order__order_date__lt=_day_start(end + datetime.timedelta(days=1)),
+    )
+    with transaction.atomic():
+        RestaurantDailyStats.objects.filter(day__range=(start, end)).delete()
+        MenuItemDailyStats.objects.filter(day__range=(start, end)).delete()
+        restaurant_rows = RestaurantDailyStats.objects.bulk_create(
+            RestaurantDailyStats(
+                restaurant_id=restaurant_id, day=day,
+                orders=orders, items_sold=items_sold, revenue=revenue,
+            )
+            for restaurant_id, day, orders, items_sold, revenue in _restaurant_totals(lines)
+        )
+        MenuItemDailyStats.objects.bulk_create(
+            MenuItemDailyStats(
+                menu_item_id=menu_item_id, restaurant_id=restaurant_id, day=day,
+                quantity=quantity, revenue=revenue,
+            )
+            for menu_item_id, restaurant_id, day, quantity, revenue in _menu_item_totals(lines)
+        )
+    return len(restaurant_rows)
+
+
+# Dashboard
+
+
+def dashboard(restaurant_id, days, today=None):
+    """Totals, per-day figures and top dishes of the last ``days`` days."""
+    today = today or timezone.localdate()
+    first_day = today - datetime.timedelta(days=days - 1)
+    stats = {
+        row.day: row
+        for row in RestaurantDailyStats.objects.filter(
+            restaurant_id=restaurant_id, day__gte=first_day
+        )
+    }
+    daily = [
+        stats.get(day) or RestaurantDailyStats(restaurant_id=restaurant_id, day=day)
+        for day in (today - datetime.timedelta(days=n) for n in range(days))
+    ]
+    top_dishes = (
+        MenuItemDailyStats.objects.filter(restaurant_id=restaurant_id, day__gte=first_day)
+        .values("menu_item_id", "menu_item__name")
+        .annotate(quantity=Sum("quantity"), revenue=Sum("revenue"))
+        .order_by("-revenue", "menu_item_id")[:TOP_DISHES]
+    )
+    return {
+        "orders": sum(row.orders for row in daily),
+        "items_sold": sum(row.items_sold for row in daily),
+        "revenue": sum((row.revenue for row in daily), 0),
+        "daily": daily,
+        "top_dishes": list(top_dishes),
+    }
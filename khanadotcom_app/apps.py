@@ -4,3 +4,11 @@ from django.apps import AppConfig
 class KhanadotcomAppConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'khanadotcom_app'
+
+    def ready(self):
+        from django.db.backends.signals import connection_created
+
+        from . import signals  # noqa: F401
+        from .database import configure_sqlite
+
+        connection_created.connect(configure_sqlite)
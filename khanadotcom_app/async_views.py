@@ -0,0 +1,87 @@
+import asyncio
+
+from django.contrib.auth.views import redirect_to_login
+from django.http import Http404
+from django.shortcuts import aget_object_or_404, render
+
+from .menu_cache import aget_menu
+from .menu_snapshot import aget_snapshot, snapshot_response
+from .models import Restaurant
+from .notifications import aunread_count
+from .orders import aorder_history_page
+from .pagination import akeyset_page
+from .views import RESTAURANT_ORDERINGS, RESTAURANTS_PER_PAGE
+
+# Async versions of the read-heavy browse views, used instead of the ones in
+# views.py when settings.ASYNC_BROWSE_VIEWS is on. Under the ASGI entry point
+# they wait on the database without holding a worker thread. Templates are
+# rendered in the event loop, so everything they touch must be loaded here.
+
+
+async def unread_notifications(request):
+    # The header badge; see context_processors.notifications
+    user = await request.auser()
+    return await aunread_count(user.pk) if user.is_authenticated else 0
+
+
+async def restaurant_list(request):
+    sort = request.GET.get("sort")
+    if sort not in RESTAURANT_ORDERINGS:
+        sort = "default"
+    restaurants = await akeyset_page(
+        Restaurant.objects.filter(is_deleted=False),
+        RESTAURANT_ORDERINGS[sort],
+        cursor=request.GET.get("after"),
+        page_size=RESTAURANTS_PER_PAGE,
+    )
+    context = {
+        "restaurants": restaurants,
+        "sort": sort,
+        "unread_notifications": await unread_notifications(request),
+    }
+    return render(request, "restaurant_list.html", context)
+
+
+async def restaurant_detail(request, restaurant_id):
+    restaurant = await aget_object_or_404(
+        Restaurant.objects.select_related("owner"), pk=restaurant_id
+    )
+    context = {
+        "restaurant": restaurant,
+        "unread_notifications": await unread_notifications(request),
+    }
+    return render(request, "restaurant_detail.html", context)
+
+
+async def menu_items(request, restaurant_id):
+    # The restaurant and its menu are independent lookups: run them together.
+    restaurant, menu_items, unread = await asyncio.gather(
+        aget_object_or_404(Restaurant, pk=restaurant_id),
+        aget_menu(restaurant_id),
+        unread_notifications(request),
+    )
+    context = {
+        "restaurant": restaurant,
+        "menu_items": menu_items,
+        "unread_notifications": unread,
+    }
+    return render(request, "menu_items.html", context)
+
+
+async def menu_json(request, restaurant_id):
+    snapshot = await aget_snapshot(restaurant_id)
+    if snapshot is None:
+        raise Http404("No Restaurant matches the given query.")
+    return snapshot_response(request, snapshot)
+
+
+async def order_history_view(request):
+    user = await request.auser()
+    if not user.is_authenticated:
+        return redirect_to_login(request.get_full_path(), "login")
+    orders = await aorder_history_page(user, cursor=request.GET.get("after"))
+    context = {
+        "orders": orders,
+        "unread_notifications": await aunread_count(user.pk),
+    }
+    return render(request, "order_history.html", context)
@@ -0,0 +1,32 @@
+import time
+
+# Version numbers kept in a cache, for entries keyed by version: bumping the
+# version makes every old entry unreachable, and they age out of the backend.
+# A missing version is seeded from the clock, so a version key that was
+# evicted can never come back pointing at an older entry still in the cache.
+
+
+def get_version(cache, key):
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, time.time_ns(), timeout=None)
+        version = cache.get(key)
+    return version
+
+
+async def aget_version(cache, key):
+    version = await cache.aget(key)
+    if version is None:
+        await cache.aadd(key, time.time_ns(), timeout=None)
+        version = await cache.aget(key)
+    return version
+
+
+def bump_version(cache, key):
+    """Move ``key`` to a new version; returns it."""
+    try:
+        return cache.incr(key)
+    except ValueError:
+        version = time.time_ns()
+        cache.set(key, version, timeout=None)
+        return version
@@ -0,0 +1,26 @@
+import asyncio
+
+from django.utils.functional import SimpleLazyObject
+
+from .notifications import unread_count
+
+
+def notifications(request):
+    """
+    ``unread_notifications`` for the header badge, read from the counter
+    only when a template uses it.
+    """
+
+    def unread():
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            pass
+        else:
+            # Async views render in the event loop, where request.user cannot
+            # be loaded; they put unread_notifications in their context.
+            return 0
+        user = request.user
+        return unread_count(user.pk) if user.is_authenticated else 0
+
+    return {"unread_notifications": SimpleLazyObject(unread)}
@@ -0,0 +1,170 @@
+import random
+import threading
+import time
+from collections import namedtuple
+from decimal import ROUND_HALF_UP, Decimal
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.exceptions import ValidationError
+from django.db.models import Exists, F, OuterRef, Q, Sum
+from django.utils import timezone
+
+from .cache_versions import bump_version, get_version
+from .models import Coupon, CouponUsageCounter
+
+# Coupon lookups at checkout are answered from an in-process dict of the
+# coupons that can still be used, keyed by code. Saving or deleting a Coupon
+# bumps a version number in COUPON_CACHE_ALIAS, which must be shared between
+# processes (see signals.py); each process checks it on lookup and reloads
+# its index when it changed or is older than COUPON_INDEX_MAX_AGE seconds, so
+# validating a code costs one cache read and a dict lookup.
+#
+# Redemptions are counted in CouponUsageCounter shards. A checkout increments
+# one random shard with a conditional UPDATE, so concurrent checkouts with a
+# popular code rarely contend for the same row, and max_uses still holds
+# exactly because every shard enforces its own part of it. The UPDATE also
+# checks that the coupon is still active and valid, so a stale index can
+# never grant a discount.
+
+VERSION_KEY = "coupons:version"
+
+ActiveCoupon = namedtuple(
+    "ActiveCoupon",
+    "coupon_id code discount_percentage max_discount_amount valid_from valid_to",
+)
+
+_index = (None, 0, {})  # (version, loaded at, {code: ActiveCoupon})
+_index_lock = threading.Lock()
+
+
+def normalize_code(code):
+    return (code or "").strip().upper()
+
+
+def _cache():
+    return caches[getattr(settings, "COUPON_CACHE_ALIAS", "default")]
+
+
+def bump_index_version():
+    bump_version(_cache(), VERSION_KEY)
+
+
+def _index_version():
+    return get_version(_cache(), VERSION_KEY)
+
+
+def _load_index():
+    rows = Coupon.objects.filter(active=True, valid_to__gt=timezone.now()).values_list(
+        "coupon_id", "code", "discount_percentage", "max_discount_amount",
+        "valid_from", "valid_to",
+    )
+    return {normalize_code(row[1]): ActiveCoupon(*row) for row in rows}
+
+
+def _stale(index, version):
+    max_age = getattr(settings, "COUPON_INDEX_MAX_AGE", 300)
+    return index[0] != version or time.monotonic() - index[1] > max_age
+
+
+def active_coupons():
+    global _index
+    version = _index_version()
+    if _stale(_index, version):
+        with _index_lock:
+            if _stale(_index, version):
+                _index = (version, time.monotonic(), _load_index())
+    return _index[2]
+
+
+def find_coupon(code, now=None):
+    """Return the ActiveCoupon for ``code`` or raise ValidationError."""
+    coupon = active_coupons().get(normalize_code(code))
+    now = now or timezone.now()
+    if coupon is None or coupon.valid_to <= now:
+        raise ValidationError("This coupon code is not valid.")
+    if coupon.valid_from > now:
+        raise ValidationError(f"This coupon can only be used from {coupon.valid_from:%d %b %Y}.")
+    return coupon
+
+
+def discount_for(coupon, subtotal):
+    discount = (subtotal * coupon.discount_percentage / 100).quantize(
+        Decimal("0.01"), rounding=ROUND_HALF_UP
+    )
+    if coupon.max_discount_amount is not None:
+        discount = min(discount, coupon.max_discount_amount)
+    return min(discount, subtotal)
+
+
+# Usage counters
+
+
+def shard_limits(max_uses, shards):
+    if max_uses is None:
+        return [None] * shards
+    base, extra = divmod(max_uses, shards)
+    return [base + (shard < extra) for shard in range(shards)]
+
+
+def sync_counters(coupon):
+    """Create the coupon's counter shards and spread max_uses over them.
+    Must run inside the transaction that saves the coupon."""
+    shards = getattr(settings, "COUPON_COUNTER_SHARDS", 8)
+    counters = {
+        counter.shard: counter
+        for counter in CouponUsageCounter.objects.select_for_update().filter(coupon=coupon)
+    }
+    if not counters:
+        CouponUsageCounter.objects.bulk_create([
+            CouponUsageCounter(coupon=coupon, shard=shard, limit=limit)
+            for shard, limit in enumerate(shard_limits(coupon.max_uses, shards))
+        ])
+        return
+    if coupon.max_uses is None:
+        CouponUsageCounter.objects.filter(coupon=coupon).update(limit=None)
+        return
+    # Hand out what is left after the redemptions so far, so the shards
+    # together never allow more than max_uses.
+    used = [counters[shard].used for shard in sorted(counters)]
+    remaining = shard_limits(max(coupon.max_uses - sum(used), 0), len(used))
+    for (shard, counter), spare in zip(sorted(counters.items()), remaining):
+        counter.limit = counter.used + spare
+    CouponUsageCounter.objects.bulk_update(counters.values(), ["limit"])
+
+
+def redeem(coupon, now=None):
+    """
+    Count one use of ``coupon``; raises ValidationError when it is used up or
+    no longer valid. Must run inside the checkout transaction so a failed
+    order releases it.
+    """
+    now = now or timezone.now()
+    # Checked against the coupon row, not the index, which may be stale.
+    valid = Exists(
+        Coupon.objects.filter(
+            pk=OuterRef("coupon_id"), active=True, valid_from__lte=now, valid_to__gt=now
+        )
+    )
+    shards = list(
+        CouponUsageCounter.objects.filter(coupon_id=coupon.coupon_id).values_list(
+            "shard", flat=True
+        )
+    )
+    random.shuffle(shards)
+    for shard in shards:
+        updated = CouponUsageCounter.objects.filter(
+            Q(limit__isnull=True) | Q(used__lt=F("limit")),
+            valid,
+            coupon_id=coupon.coupon_id,
+            shard=shard,
+        ).update(used=F("used") + 1)
+        if updated:
+            return
+    if not Coupon.objects.filter(valid, pk=coupon.coupon_id).exists():
+        raise ValidationError("This coupon code is not valid.")
+    raise ValidationError(f"Coupon {coupon.code} has been fully redeemed.")
+
+
+def times_used(coupon):
+    return coupon.usage_counters.aggregate(total=Sum("used"))["total"] or 0
@@ -0,0 +1,81 @@
+from django.conf import settings
+from django.db import connections
+
+# SQLite tuning and read routing.
+#
+# configure_sqlite runs on every new SQLite connection (it is connected to
+# connection_created in apps.py) and applies SQLITE_PRAGMAS. WAL lets readers
+# keep going while one writer commits, and synchronous=NORMAL only fsyncs at
+# checkpoints, which is durable in WAL mode except for the last transactions
+# before a power loss.
+#
+# ReadReplicaRouter sends reads of the browse models to a separate read-only
+# connection on the same file, so browse traffic never queues behind the
+# write connection.
+
+DEFAULT_PRAGMAS = {
+    "journal_mode": "wal",
+    "synchronous": "normal",
+    "busy_timeout": 5000,  # ms
+    "mmap_size": 256 * 1024 * 1024,  # bytes
+    "cache_size": -64 * 1024,  # negative: KiB, i.e. 64 MiB per connection
+}
+
+
+def _read_only(connection):
+    return "mode=ro" in str(connection.settings_dict["NAME"])
+
+
+def configure_sqlite(sender=None, connection=None, **kwargs):
+    if connection.vendor != "sqlite" or connection.is_in_memory_db():
+        return
+    pragmas = getattr(settings, "SQLITE_PRAGMAS", DEFAULT_PRAGMAS)
+    with connection.cursor() as cursor:
+        for name, value in pragmas.items():
+            if name == "journal_mode" and _read_only(connection):
+                # The journal mode is stored in the file; only a writable
+                # connection can change it.
+                continue
+            cursor.execute(f"PRAGMA {name} = {value}")
+
+
+def read_replica():
+    """The alias of the read-only connection, or None if there is none."""
+    alias = getattr(settings, "READ_REPLICA_DATABASE", "replica")
+    return alias if alias in connections.settings else None
+
+
+class ReadReplicaRouter:
+    """
+    Route reads of the browse models (restaurants, menus, categories and
+    reviews) to READ_REPLICA_DATABASE. Reads made inside a transaction on the
+    default database stay there, so a transaction always sees its own writes
+    and a consistent snapshot.
+    """
+
+    browse_models = {
+        "khanadotcom_app.restaurant",
+        "khanadotcom_app.menuitem",
+        "khanadotcom_app.category",
+        "khanadotcom_app.menuitemcategory",
+        "khanadotcom_app.review",
+    }
+
+    def db_for_read(self, model, **hints):
+        # DatabaseCache passes a stand-in model without label_lower
+        if getattr(model._meta, "label_lower", None) not in self.browse_models:
+            return None
+        if connections["default"].in_atomic_block:
+            return "default"
+        return read_replica()
+
+    def db_for_write(self, model, **hints):
+        # Instances loaded from the replica must still be saved to default.
+        return "default"
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Both aliases are the same database file.
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == "default"
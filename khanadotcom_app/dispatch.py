@@ -0,0 +1,165 @@
+import logging
+import math
+import re
+import time
+
+from django.db import transaction
+from django.dispatch import Signal
+
+from .models import DeliveryPerson, Order, OrderItem
+
+logger = logging.getLogger(__name__)
+
+# Orders that reach out_for_delivery are collected over a short window and
+# matched to available riders in batches. A rider is claimed with a
+# conditional UPDATE (availability_status=True -> False) and the order with
+# another one (delivery_person IS NULL), so concurrent dispatchers can never
+# book the same rider or the same order twice.
+
+DISPATCH_STATUS = "out_for_delivery"
+
+# Without coordinates on both sides the distance is estimated from how many
+# address words the rider and the restaurant share, scaled to this many km.
+ADDRESS_FALLBACK_KM = 10.0
+EARTH_RADIUS_KM = 6371.0
+
+_WORD_RE = re.compile(r"\w+", re.UNICODE)
+
+# Sent after a rider is booked, with ``order`` and ``delivery_person``.
+rider_assigned = Signal()
+
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    lat1, lon1, lat2, lon2 = map(math.radians, map(float, (lat1, lon1, lat2, lon2)))
+    a = (
+        math.sin((lat2 - lat1) / 2) ** 2
+        + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2
+    )
+    return 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(a))
+
+
+def _address_words(address):
+    return set(_WORD_RE.findall((address or "").lower()))
+
+
+def distance_score(rider, pickup):
+    """Estimated km between a rider and an order's pickup point."""
+    if None not in (rider.latitude, rider.longitude, pickup["latitude"], pickup["longitude"]):
+        return haversine_km(
+            rider.latitude, rider.longitude, pickup["latitude"], pickup["longitude"]
+        )
+    rider_words = _address_words(rider.user.address)
+    pickup_words = _address_words(pickup["address"])
+    if not rider_words or not pickup_words:
+        return ADDRESS_FALLBACK_KM
+    overlap = len(rider_words & pickup_words) / len(rider_words | pickup_words)
+    return ADDRESS_FALLBACK_KM * (1 - overlap)
+
+
+def pending_orders(limit):
+    return list(
+        Order.objects.filter(order_status=DISPATCH_STATUS, delivery_person__isnull=True)
+        .order_by("order_date")[:limit]
+    )
+
+
+def available_riders(limit):
+    return list(
+        DeliveryPerson.objects.filter(availability_status=True)
+        .select_related("user")
+        .order_by("updated_at")[:limit]
+    )
+
+
+def pickup_points(orders):
+    """{order_id: restaurant location} for a batch of orders, in one query."""
+    rows = OrderItem.objects.filter(order__in=orders).values_list(
+        "order_id",
+        "menu_item__restaurant__latitude",
+        "menu_item__restaurant__longitude",
+        "menu_item__restaurant__address",
+    )
+    points = {}
+    for order_id, latitude, longitude, address in rows:
+        points.setdefault(
+            order_id, {"latitude": latitude, "longitude": longitude, "address": address}
+        )
+    return points
+
+
+def match(orders, riders, pickups):
+    """
+    Greedy batch matching: every (order, rider) pair is scored and pairs are
+    taken from the shortest distance up, each order and rider at most once.
+    """
+    empty = {"latitude": None, "longitude": None, "address": ""}
+    pairs = sorted(
+        (distance_score(rider, pickups.get(order.order_id, empty)), i, j)
+        for i, order in enumerate(orders)
+        for j, rider in enumerate(riders)
+    )
+    used_orders, used_riders, matches = set(), set(), []
+    for score, i, j in pairs:
+        if i in used_orders or j in used_riders:
+            continue
+        used_orders.add(i)
+        used_riders.add(j)
+        matches.append((orders[i], riders[j], score))
+        if len(used_orders) == len(orders) or len(used_riders) == len(riders):
+            break
+    return matches
+
+
+def assign(order, rider):
+    """Book ``rider`` for ``order``; False if either was taken meanwhile."""
+    with transaction.atomic():
+        claimed = DeliveryPerson.objects.filter(
+            pk=rider.pk, availability_status=True
+        ).update(availability_status=False)
+        if not claimed:
+            return False
+        assigned = Order.objects.filter(
+            pk=order.pk, order_status=DISPATCH_STATUS, delivery_person__isnull=True
+        ).update(delivery_person=rider)
+        if not assigned:
+            # Someone else dispatched the order: give the rider back.
+            transaction.set_rollback(True)
+            return False
+    order.delivery_person = rider
+    rider.availability_status = False
+    rider_assigned.send(sender=Order, order=order, delivery_person=rider)
+    return True
+
+
+def dispatch_batch(batch_size=100):
+    """Match and assign one batch; returns the (order, rider, km) assigned."""
+    orders = pending_orders(batch_size)
+    if not orders:
+        return []
+    riders = available_riders(batch_size)
+    if not riders:
+        return []
+    assigned = []
+    for order, rider, score in match(orders, riders, pickup_points(orders)):
+        if assign(order, rider):
+            assigned.append((order, rider, score))
+    return assigned
+
+
+def run(window=5.0, batch_size=100, iterations=None):
+    """Dispatch forever (or ``iterations`` times), one batch per window."""
+    count = 0
+    while iterations is None or count < iterations:
+        started = time.monotonic()
+        try:
+            assigned = dispatch_batch(batch_size)
+        except Exception:
+            logger.exception("Dispatch batch failed")
+            assigned = []
+        for order, rider, score in assigned:
+            logger.info(
+                "Assigned order %s to rider %s (%.1f km)",
+                order.order_id, rider.delivery_person_id, score,
+            )
+        count += 1
+        time.sleep(max(window - (time.monotonic() - started), 0))
@@ -0,0 +1,144 @@
+import math
+import threading
+import time
+from collections import namedtuple
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import Count, Q, Sum
+from django.utils import timezone
+
+from .models import DeliveryPerson, Order
+
+# Delivery time estimates made at checkout. An order is ready after the
+# restaurant works through the orders ahead of it plus the basket's own
+# preparation time; a rider picks it up once it is ready and one is free,
+# then it takes DELIVERY_MINUTES to the customer.
+#
+# The inputs live in memory: the preparation minutes still queued at each
+# restaurant and the rider counts are loaded with three aggregate queries at
+# most every ETA_REFRESH_SECONDS, and orders placed by this process are added
+# to its queue straight away. estimate() itself is a few dict lookups.
+
+DEFAULT_PREPARATION_MINUTES = 15  # menu items without a preparation_time
+EXTRA_ITEM_MINUTES = 2  # per portion after the first, at most MAX_EXTRA_MINUTES
+MAX_EXTRA_MINUTES = 15
+KITCHEN_LANES = 3  # orders a kitchen prepares at the same time
+PREPARING_REMAINING = 0.5  # share of a "preparing" order still to do
+RIDER_PICKUP_MINUTES = 5  # a free rider getting to the restaurant
+RIDER_ROUND_TRIP_MINUTES = 35  # waiting for a busy rider to come back
+DELIVERY_MINUTES = 20
+# Orders left open for longer than this are abandoned, not queued.
+QUEUE_WINDOW = timedelta(hours=6)
+
+# Must match the condition of the order_queued_idx index.
+QUEUED_STATUSES = ["pending", "confirmed", "preparing"]
+
+Estimate = namedtuple("Estimate", "preparation_minutes queue_minutes ready_at delivery_at")
+
+
+class _State:
+    def __init__(self, loaded_at, backlog, idle_riders, busy_riders, waiting_for_rider):
+        self.loaded_at = loaded_at
+        self.backlog = backlog  # {restaurant_id: queued preparation minutes}
+        self.idle_riders = idle_riders
+        self.busy_riders = busy_riders
+        self.waiting_for_rider = waiting_for_rider
+
+
+_state = None
+_state_lock = threading.Lock()
+
+
+def _load():
+    backlog = {}
+    for restaurant_id, waiting, preparing in (
+        Order.objects.filter(
+            order_status__in=QUEUED_STATUSES,
+            created_at__gte=timezone.now() - QUEUE_WINDOW,
+        )
+        .values_list("restaurant_id")
+        .annotate(
+            waiting=Sum("preparation_minutes", filter=~Q(order_status="preparing")),
+            preparing=Sum("preparation_minutes", filter=Q(order_status="preparing")),
+        )
+        .order_by()
+    ):
+        if restaurant_id is not None:
+            backlog[restaurant_id] = (waiting or 0) + (preparing or 0) * PREPARING_REMAINING
+    riders = DeliveryPerson.objects.aggregate(
+        idle=Count("pk", filter=Q(availability_status=True)),
+        busy=Count("pk", filter=Q(availability_status=False)),
+    )
+    waiting = Order.objects.filter(
+        order_status="out_for_delivery", delivery_person__isnull=True
+    ).count()
+    return _State(time.monotonic(), backlog, riders["idle"], riders["busy"], waiting)
+
+
+def state():
+    global _state
+    max_age = getattr(settings, "ETA_REFRESH_SECONDS", 30)
+    current = _state
+    if current is None or time.monotonic() - current.loaded_at > max_age:
+        with _state_lock:
+            if _state is current:
+                _state = _load()
+            current = _state
+    return current
+
+
+def order_placed(restaurant_id, preparation_minutes):
+    """Count an order placed by this process until the next refresh."""
+    current = _state
+    if current is not None:
+        with _state_lock:
+            current.backlog[restaurant_id] = (
+                current.backlog.get(restaurant_id, 0) + preparation_minutes
+            )
+
+
+def preparation_minutes(lines):
+    """Minutes to prepare ``lines`` of (menu_item, quantity)."""
+    if not lines:
+        return 0
+    longest = max(
+        item.preparation_time or DEFAULT_PREPARATION_MINUTES for item, _ in lines
+    )
+    portions = sum(quantity for _, quantity in lines)
+    return longest + min(EXTRA_ITEM_MINUTES * (portions - 1), MAX_EXTRA_MINUTES)
+
+
+def rider_wait_minutes(current):
+    if current.idle_riders > current.waiting_for_rider:
+        return RIDER_PICKUP_MINUTES
+    # Every order waiting ahead needs a rider to come back first.
+    rounds = math.ceil(
+        (current.waiting_for_rider - current.idle_riders + 1) / max(current.busy_riders, 1)
+    )
+    return RIDER_PICKUP_MINUTES + RIDER_ROUND_TRIP_MINUTES * rounds
+
+
+def estimate(restaurant_id, lines, now=None):
+    """Estimate for an order of ``lines`` at the restaurant, placed ``now``."""
+    now = now or timezone.now()
+    current = state()
+    preparation = preparation_minutes(lines)
+    queue = current.backlog.get(restaurant_id, 0) / KITCHEN_LANES
+    ready_at = now + timedelta(minutes=queue + preparation)
+    pickup_at = max(ready_at, now + timedelta(minutes=rider_wait_minutes(current)))
+    return Estimate(
+        preparation_minutes=preparation,
+        queue_minutes=round(queue),
+        ready_at=ready_at,
+        delivery_at=pickup_at + timedelta(minutes=DELIVERY_MINUTES),
+    )
+
+
+def eta_fields(order):
+    """The estimates of an order values() dict, for JSON APIs."""
+    ready_at, delivery_at = order["estimated_ready_at"], order["delivery_date"]
+    return {
+        "estimated_ready_at": ready_at.isoformat() if ready_at else None,
+        "estimated_delivery_at": delivery_at.isoformat() if delivery_at else None,
+    }
@@ -0,0 +1,234 @@
+import csv
+import datetime
+from itertools import groupby
+
+from asgiref.sync import sync_to_async
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+
+from .database import read_replica
+from .models import OrderItem, Payment, Review
+
+# Streaming exports of orders (with their items), payments and reviews, as CSV
+# or NDJSON (one JSON object per line). Rows are read with values_list() over
+# the joined tables and .iterator(), so neither the web process nor the
+# export_data command ever holds more than one chunk of rows, whatever the
+# date range. Exports read from the read-only connection when there is one.
+#
+# Under ASGI, StreamingHttpResponse collects a sync iterator into a list
+# before sending anything, so export_response() hands it an async iterator
+# that produces each chunk in the sync thread instead.
+#
+# Orders are read as their item lines: in CSV every line repeats the order
+# columns, in NDJSON the lines of an order are grouped under "items". With a
+# restaurant filter only that restaurant's lines are exported.
+
+CHUNK_SIZE = 2000
+FORMATS = ("csv", "ndjson")
+# Bytes per chunk handed to the response
+BUFFER_SIZE = 64 * 1024
+
+ORDER_COLUMNS = (
+    ("order_id", "order_id"),
+    ("order_date", "order__order_date"),
+    ("status", "order__order_status"),
+    ("customer_id", "order__user_id"),
+    ("customer_name", "order__user__name"),
+    ("delivery_person_id", "order__delivery_person_id"),
+    ("coupon", "order__coupon__code"),
+    ("discount_amount", "order__discount_amount"),
+    ("total_amount", "order__total_amount"),
+    ("estimated_delivery_at", "order__delivery_date"),
+)
+ITEM_COLUMNS = (
+    ("item_id", "order_item_id"),
+    ("menu_item_id", "menu_item_id"),
+    ("menu_item_name", "menu_item__name"),
+    ("restaurant_id", "menu_item__restaurant_id"),
+    ("restaurant_name", "menu_item__restaurant__name"),
+    ("quantity", "quantity"),
+    ("price", "price"),
+)
+PAYMENT_COLUMNS = (
+    ("payment_id", "payment_id"),
+    ("payment_date", "payment_date"),
+    ("order_id", "order_id"),
+    ("customer_id", "order__user_id"),
+    ("method", "payment_method"),
+    ("status", "payment_status"),
+    ("amount", "amount"),
+    ("transaction_id", "transaction_id"),
+)
+REVIEW_COLUMNS = (
+    ("review_id", "review_id"),
+    ("created_at", "created_at"),
+    ("restaurant_id", "restaurant_id"),
+    ("restaurant_name", "restaurant__name"),
+    ("menu_item_id", "menu_item_id"),
+    ("menu_item_name", "menu_item__name"),
+    ("delivery_person_id", "delivery_person_id"),
+    ("customer_id", "user_id"),
+    ("customer_name", "user__name"),
+    ("rating", "rating"),
+    ("comment", "comment"),
+)
+
+
+def _day_start(day):
+    return timezone.make_aware(datetime.datetime.combine(day, datetime.time.min))
+
+
+def _date_filters(field, start, end):
+    """Filters for ``field`` between the dates ``start`` and ``end``, inclusive."""
+    filters = {}
+    if start:
+        filters[f"{field}__gte"] = _day_start(start)
+    if end:
+        filters[f"{field}__lt"] = _day_start(end + datetime.timedelta(days=1))
+    return filters
+
+
+def parse_filters(params):
+    """Filters from query parameters: from/to (YYYY-MM-DD) and restaurant.
+    Raises ValueError on malformed values."""
+    return {
+        "start": datetime.date.fromisoformat(params["from"]) if params.get("from") else None,
+        "end": datetime.date.fromisoformat(params["to"]) if params.get("to") else None,
+        "restaurant_id": int(params["restaurant"]) if params.get("restaurant") else None,
+    }
+
+
+def _values(queryset, columns, chunk_size):
+    queryset = queryset.using(read_replica() or "default")
+    return queryset.values_list(*(lookup for _, lookup in columns)).iterator(
+        chunk_size=chunk_size
+    )
+
+
+def order_rows(start=None, end=None, restaurant_id=None, chunk_size=CHUNK_SIZE):
+    lines = OrderItem.objects.filter(**_date_filters("order__order_date", start, end))
+    if restaurant_id is not None:
+        lines = lines.filter(menu_item__restaurant_id=restaurant_id)
+    lines = lines.order_by("order_id", "order_item_id")
+    return _values(lines, ORDER_COLUMNS + ITEM_COLUMNS, chunk_size)
+
+
+def payment_rows(start=None, end=None, restaurant_id=None, chunk_size=CHUNK_SIZE):
+    payments = Payment.objects.filter(**_date_filters("payment_date", start, end))
+    if restaurant_id is not None:
+        payments = payments.filter(order__restaurant_id=restaurant_id)
+    return _values(payments.order_by("payment_id"), PAYMENT_COLUMNS, chunk_size)
+
+
+def review_rows(start=None, end=None, restaurant_id=None, chunk_size=CHUNK_SIZE):
+    reviews = Review.objects.filter(**_date_filters("created_at", start, end))
+    if restaurant_id is not None:
+        reviews = reviews.filter(restaurant_id=restaurant_id)
+    return _values(reviews.order_by("review_id"), REVIEW_COLUMNS, chunk_size)
+
+
+EXPORTS = {
+    # kind: (columns, rows)
+    "orders": (ORDER_COLUMNS + ITEM_COLUMNS, order_rows),
+    "payments": (PAYMENT_COLUMNS, payment_rows),
+    "reviews": (REVIEW_COLUMNS, review_rows),
+}
+
+
+class _Echo:
+    # csv.writer target that hands back each formatted line
+    def write(self, value):
+        return value
+
+
+def _cell(value):
+    if isinstance(value, datetime.datetime):
+        return value.isoformat()
+    return value
+
+
+def csv_lines(kind, **filters):
+    columns, rows = EXPORTS[kind]
+    writer = csv.writer(_Echo())
+    yield writer.writerow([name for name, _ in columns])
+    for row in rows(**filters):
+        yield writer.writerow([_cell(value) for value in row])
+
+
+def _records(kind, **filters):
+    columns, rows = EXPORTS[kind]
+    names = [name for name, _ in columns]
+    if kind != "orders":
+        for row in rows(**filters):
+            yield dict(zip(names, row))
+        return
+    order_names = names[: len(ORDER_COLUMNS)]
+    item_names = names[len(ORDER_COLUMNS):]
+    # Lines come ordered by order, so each order's lines are adjacent.
+    for _, lines in groupby(rows(**filters), key=lambda row: row[0]):
+        lines = list(lines)
+        record = dict(zip(order_names, lines[0]))
+        record["items"] = [
+            dict(zip(item_names, line[len(ORDER_COLUMNS):])) for line in lines
+        ]
+        yield record
+
+
+def ndjson_lines(kind, **filters):
+    encoder = DjangoJSONEncoder(separators=(",", ":"))
+    for record in _records(kind, **filters):
+        yield encoder.encode(record) + "\n"
+
+
+def export_lines(kind, fmt, **filters):
+    """The export as an iterator of lines of text."""
+    if kind not in EXPORTS:
+        raise ValueError(f"Unknown export {kind!r}")
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown format {fmt!r}")
+    lines = csv_lines if fmt == "csv" else ndjson_lines
+    return lines(kind, **filters)
+
+
+def buffered(lines, size=BUFFER_SIZE):
+    """Join lines into chunks of about ``size`` characters."""
+    chunk, length = [], 0
+    for line in lines:
+        chunk.append(line)
+        length += len(line)
+        if length >= size:
+            yield "".join(chunk)
+            chunk, length = [], 0
+    if chunk:
+        yield "".join(chunk)
+
+
+async def aiter_chunks(chunks):
+    """Async iterator over the sync iterator ``chunks``, one step at a time."""
+    chunks = iter(chunks)
+    step = sync_to_async(next)
+    done = object()
+    try:
+        while (chunk := await step(chunks, done)) is not done:
+            yield chunk
+    finally:
+        # Release the database cursor when the client goes away.
+        if hasattr(chunks, "close"):
+            await sync_to_async(chunks.close)()
+
+
+def export_response(
+    kind, fmt, start=None, end=None, restaurant_id=None, asynchronous=False
+):
+    """The export as a streaming response; ``asynchronous`` under ASGI."""
+    lines = export_lines(kind, fmt, start=start, end=end, restaurant_id=restaurant_id)
+    content_type = "text/csv" if fmt == "csv" else "application/x-ndjson"
+    chunks = aiter_chunks(buffered(lines)) if asynchronous else buffered(lines)
+    response = StreamingHttpResponse(chunks, content_type=content_type)
+    name = "-".join(
+        [kind] + [day.isoformat() for day in (start, end) if day]
+        + ([f"restaurant{restaurant_id}"] if restaurant_id is not None else [])
+    )
+    response["Content-Disposition"] = f'attachment; filename="{name}.{fmt}"'
+    return response
@@ -3,6 +3,8 @@ from django import forms
 from django.contrib.auth.forms import UserCreationForm
 from django.contrib.auth import get_user_model
 from .models import *
+from .menu_cache import get_available_menu
+from .coupons import find_coupon, normalize_code
 import re
 
 
@@ -32,15 +34,38 @@ class SignUpForm(UserCreationForm):
 class OrderForm(forms.Form):
     items = forms.MultipleChoiceField(choices=[], widget=forms.CheckboxSelectMultiple)
     delivery_address = forms.CharField(widget=forms.Textarea(attrs={"rows": 4}))
+    coupon_code = forms.CharField(max_length=50, required=False)
 
     def __init__(self, restaurant_id, *args, **kwargs):
         super(OrderForm, self).__init__(*args, **kwargs)
-        menu_items = MenuItem.objects.filter(
-            restaurant_id=restaurant_id, availability=True
-        )
+        menu_items = get_available_menu(restaurant_id)
         self.fields["items"].choices = [
             (item.menu_item_id, f"{item.name} - ${item.price}") for item in menu_items
         ]
+        for item in menu_items:
+            self.fields[f"quantity_{item.menu_item_id}"] = forms.IntegerField(
+                label=f"Quantity of {item.name}",
+                min_value=1,
+                max_value=50,
+                initial=1,
+                required=False,
+            )
+
+    def clean_coupon_code(self):
+        # Unknown and expired codes are rejected here from the coupon index;
+        # the discount itself is computed and redeemed at checkout.
+        code = normalize_code(self.cleaned_data.get("coupon_code"))
+        if code:
+            find_coupon(code)
+        return code
+
+    def cleaned_quantities(self):
+        # {menu_item_id: quantity} for the selected items only
+        quantities = {}
+        for item_id in self.cleaned_data["items"]:
+            quantity = self.cleaned_data.get(f"quantity_{item_id}")
+            quantities[int(item_id)] = quantity or 1
+        return quantities
 
 
 class AadhaarValidationForm(forms.Form):
@@ -0,0 +1,148 @@
+import logging
+import multiprocessing
+import posixpath
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+from django.apps import apps
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connection, transaction
+
+from . import images
+from .menu_cache import bump_menu_version
+
+logger = logging.getLogger(__name__)
+
+# Uploaded pictures get resized WebP/JPEG variants and an inline placeholder,
+# rendered in a process pool after the upload is committed so neither the
+# request nor the web process's CPU time pays for it. Variant files are named
+# after the hash of the original and never change, so they can be served
+# with a far-future Cache-Control header. Each model keeps the variant
+# metadata in a JSON field next to the image field; it records the original
+# it was built from, so a replaced picture is processed again.
+
+IMAGE_FIELDS = {
+    # model label: (image field, variants field)
+    "khanadotcom_app.restaurant": ("profile_pic", "profile_pic_variants"),
+    "khanadotcom_app.menuitem": ("menu_item_pic", "menu_item_pic_variants"),
+    "khanadotcom_app.user": ("profile_picture", "profile_picture_variants"),
+}
+VARIANTS_DIR = "variants"
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def make_executor(max_workers=None):
+    # spawn: the web server process has threads, which fork does not copy.
+    return ProcessPoolExecutor(
+        max_workers=max_workers or getattr(settings, "IMAGE_PIPELINE_WORKERS", 2),
+        mp_context=multiprocessing.get_context("spawn"),
+    )
+
+
+def executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = make_executor()
+        return _executor
+
+
+def needs_variants(instance):
+    image_field, variants_field = IMAGE_FIELDS[instance._meta.label_lower]
+    name = getattr(instance, image_field).name
+    return bool(name) and getattr(instance, variants_field).get("source") != name
+
+
+def image_urls(instance, image_field):
+    """URLs of a picture and its variants, or None when there is no picture."""
+    image = getattr(instance, image_field)
+    if not image:
+        return None
+    variants = getattr(instance, f"{image_field}_variants")
+    if variants.get("source") != image.name:
+        # Not processed yet
+        return {"original": image.url, "placeholder": None, "sizes": []}
+    return {
+        "original": image.url,
+        "placeholder": variants["placeholder"],
+        "width": variants["width"],
+        "height": variants["height"],
+        "sizes": [
+            {
+                "width": size["width"],
+                "height": size["height"],
+                "webp": default_storage.url(size["webp"]),
+                "jpeg": default_storage.url(size["jpeg"]),
+            }
+            for size in variants["sizes"]
+        ],
+    }
+
+
+def read_source(name):
+    with default_storage.open(name, "rb") as f:
+        return f.read()
+
+
+def store_variants(model, pk, source, result):
+    """Save the rendered files and record them on the row, unless the
+    picture was replaced in the meantime."""
+    for name, data in result.pop("files").items():
+        path = posixpath.join(VARIANTS_DIR, name)
+        if not default_storage.exists(path):
+            default_storage.save(path, ContentFile(data))
+    for size in result["sizes"]:
+        size["webp"] = posixpath.join(VARIANTS_DIR, size["webp"])
+        size["jpeg"] = posixpath.join(VARIANTS_DIR, size["jpeg"])
+    result["source"] = source
+
+    image_field, variants_field = IMAGE_FIELDS[model._meta.label_lower]
+    updated = model.objects.filter(pk=pk, **{image_field: source}).update(
+        **{variants_field: result}
+    )
+    if updated and model._meta.label_lower == "khanadotcom_app.menuitem":
+        # Cached menus hold the item without its variants
+        restaurant_id = model.objects.filter(pk=pk).values_list("restaurant_id", flat=True).first()
+        if restaurant_id is not None:
+            bump_menu_version(restaurant_id)
+    return bool(updated)
+
+
+def _finished(model, pk, source, submitter, future):
+    try:
+        store_variants(model, pk, source, future.result())
+    except Exception:
+        logger.exception("Could not build image variants for %s %s", model.__name__, pk)
+    finally:
+        # Normally run by the executor's result thread, which opened its own
+        # connection; never close the submitting request's connection.
+        if threading.get_ident() != submitter:
+            connection.close()
+
+
+def submit(model_label, pk, source):
+    model = apps.get_model(model_label)
+    try:
+        data = read_source(source)
+    except OSError:
+        logger.exception("Could not read %s", source)
+        return None
+    future = executor().submit(images.render_variants, data)
+    submitter = threading.get_ident()
+    future.add_done_callback(lambda f: _finished(model, pk, source, submitter, f))
+    return future
+
+
+def schedule(instance):
+    """Build the variants of ``instance``'s picture after commit, if needed."""
+    if not needs_variants(instance):
+        return
+    label = instance._meta.label_lower
+    image_field, _ = IMAGE_FIELDS[label]
+    source = getattr(instance, image_field).name
+    pk = instance.pk
+    transaction.on_commit(lambda: submit(label, pk, source))
@@ -0,0 +1,85 @@
+import base64
+import hashlib
+import io
+
+from PIL import Image, ImageOps
+
+# Image resizing and encoding. This module only depends on Pillow so its
+# functions can run in worker processes that never set up Django; the
+# storage and model side lives in image_pipeline.py.
+
+VARIANT_WIDTHS = (160, 480, 1200)
+PLACEHOLDER_WIDTH = 16
+ENCODERS = {
+    "webp": ("WEBP", {"quality": 80, "method": 4}),
+    "jpeg": ("JPEG", {"quality": 82, "optimize": True, "progressive": True}),
+}
+
+
+def content_hash(data):
+    return hashlib.sha256(data).hexdigest()[:16]
+
+
+def _flatten(image):
+    # JPEG has no alpha channel: composite transparent images onto white.
+    if image.mode in ("RGBA", "LA") or "transparency" in image.info:
+        image = image.convert("RGBA")
+        background = Image.new("RGB", image.size, (255, 255, 255))
+        background.paste(image, mask=image.getchannel("A"))
+        return background
+    return image.convert("RGB")
+
+
+def _resize(image, width):
+    height = max(1, round(image.height * width / image.width))
+    return image.resize((width, height), Image.Resampling.LANCZOS)
+
+
+def _encode(image, fmt):
+    pil_format, options = ENCODERS[fmt]
+    buffer = io.BytesIO()
+    image.save(buffer, pil_format, **options)
+    return buffer.getvalue()
+
+
+def render_variants(data):
+    """
+    Decode an uploaded image and produce its resized WebP and JPEG variants
+    and an inline placeholder. Returns a dict holding the metadata and the
+    encoded files ({file name: bytes}); file names start with the hash of
+    the original so they never change once published.
+    """
+    digest = content_hash(data)
+    with Image.open(io.BytesIO(data)) as source:
+        image = ImageOps.exif_transpose(source)
+        image.load()
+    has_alpha = image.mode in ("RGBA", "LA") or "transparency" in image.info
+    webp_source = image.convert("RGBA" if has_alpha else "RGB")
+    jpeg_source = _flatten(image)
+
+    # Never upscale; a small original still gets one variant at its width.
+    widths = [width for width in VARIANT_WIDTHS if width < image.width] or [image.width]
+    if image.width < VARIANT_WIDTHS[-1] and image.width not in widths:
+        widths.append(image.width)
+
+    files = {}
+    sizes = []
+    for width in widths:
+        size = {"width": width}
+        for fmt, source in (("webp", webp_source), ("jpeg", jpeg_source)):
+            resized = _resize(source, width) if width != image.width else source
+            name = f"{digest}-{width}w.{'jpg' if fmt == 'jpeg' else fmt}"
+            files[name] = _encode(resized, fmt)
+            size[fmt] = name
+            size["height"] = resized.height
+        sizes.append(size)
+
+    placeholder = _encode(_resize(jpeg_source, PLACEHOLDER_WIDTH), "jpeg")
+    return {
+        "hash": digest,
+        "width": image.width,
+        "height": image.height,
+        "placeholder": "data:image/jpeg;base64," + base64.b64encode(placeholder).decode(),
+        "sizes": sizes,
+        "files": files,
+    }
@@ -0,0 +1,298 @@
+import bisect
+import contextvars
+import json
+import os
+import re
+import tempfile
+import threading
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.template.backends.django import DjangoTemplates, Template
+
+# Per-request performance metrics: resolved URL name, SQL query count and
+# time, duplicated queries (N+1 candidates), template render time and total
+# latency. They are aggregated per URL name into fixed-size histograms, so
+# memory stays constant however much traffic a process serves. Each process
+# writes a snapshot to REQUEST_METRICS_DIR every REQUEST_METRICS_FLUSH_SECONDS
+# for ``python manage.py dump_request_metrics`` to merge.
+
+LATENCY_BUCKETS_MS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100, 200)
+MAX_FINGERPRINTS_PER_VIEW = 20
+
+_IN_LIST_RE = re.compile(r"IN \((?:%s, )*%s\)")
+_current = contextvars.ContextVar("request_metrics", default=None)
+
+
+def fingerprint(sql):
+    # Parameters are already separate from the SQL; only the length of
+    # IN (...) lists differs between otherwise identical queries.
+    return _IN_LIST_RE.sub("IN (...)", sql)
+
+
+class RequestStats:
+    __slots__ = ("queries", "sql_time", "template_time", "fingerprints")
+
+    def __init__(self):
+        self.queries = 0
+        self.sql_time = 0.0
+        self.template_time = 0.0
+        self.fingerprints = {}
+
+    def duplicates(self):
+        return {sql: count for sql, count in self.fingerprints.items() if count > 1}
+
+
+class Histogram:
+    def __init__(self, bounds):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+
+    def add(self, value):
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+
+    def merge(self, counts):
+        self.counts = [a + b for a, b in zip(self.counts, counts)]
+
+    def quantile(self, q):
+        """Upper bound of the bucket holding the q-quantile."""
+        total = sum(self.counts)
+        if not total:
+            return None
+        seen = 0
+        for i, count in enumerate(self.counts):
+            seen += count
+            if seen >= q * total:
+                return self.bounds[i] if i < len(self.bounds) else float("inf")
+
+
+class ViewMetrics:
+    def __init__(self):
+        self.requests = 0
+        self.errors = 0
+        self.total_ms = 0.0
+        self.sql_ms = 0.0
+        self.template_ms = 0.0
+        self.queries = 0
+        self.latency = Histogram(LATENCY_BUCKETS_MS)
+        self.query_count = Histogram(QUERY_COUNT_BUCKETS)
+        self.duplicates = {}
+
+    def add(self, stats, total_ms, status_code):
+        self.requests += 1
+        self.errors += status_code >= 500
+        self.total_ms += total_ms
+        self.sql_ms += stats.sql_time * 1000
+        self.template_ms += stats.template_time * 1000
+        self.queries += stats.queries
+        self.latency.add(total_ms)
+        self.query_count.add(stats.queries)
+        for sql, count in stats.duplicates().items():
+            self._add_duplicate(sql, count)
+
+    def _add_duplicate(self, sql, count):
+        if sql not in self.duplicates and len(self.duplicates) >= MAX_FINGERPRINTS_PER_VIEW:
+            # Bounded: forget the least repeated fingerprint
+            smallest = min(self.duplicates, key=self.duplicates.get)
+            if self.duplicates[smallest] > count:
+                return
+            del self.duplicates[smallest]
+        self.duplicates[sql] = self.duplicates.get(sql, 0) + count
+
+    def to_dict(self):
+        return {
+            "requests": self.requests,
+            "errors": self.errors,
+            "total_ms": self.total_ms,
+            "sql_ms": self.sql_ms,
+            "template_ms": self.template_ms,
+            "queries": self.queries,
+            "latency_buckets": self.latency.counts,
+            "query_count_buckets": self.query_count.counts,
+            "duplicates": self.duplicates,
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        metrics = cls()
+        metrics.merge(data)
+        return metrics
+
+    def merge(self, data):
+        for field in ("requests", "errors", "total_ms", "sql_ms", "template_ms", "queries"):
+            setattr(self, field, getattr(self, field) + data[field])
+        self.latency.merge(data["latency_buckets"])
+        self.query_count.merge(data["query_count_buckets"])
+        for sql, count in data["duplicates"].items():
+            self._add_duplicate(sql, count)
+
+    def summary(self):
+        requests = self.requests or 1
+        return {
+            "requests": self.requests,
+            "errors": self.errors,
+            "avg_ms": round(self.total_ms / requests, 2),
+            "p50_ms": self.latency.quantile(0.5),
+            "p95_ms": self.latency.quantile(0.95),
+            "p99_ms": self.latency.quantile(0.99),
+            "avg_queries": round(self.queries / requests, 2),
+            "p95_queries": self.query_count.quantile(0.95),
+            "avg_sql_ms": round(self.sql_ms / requests, 2),
+            "avg_template_ms": round(self.template_ms / requests, 2),
+            "duplicate_queries": dict(
+                sorted(self.duplicates.items(), key=lambda item: -item[1])
+            ),
+        }
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self.views = {}
+        self.lock = threading.Lock()
+        self.last_flush = time.monotonic()
+
+    def record(self, view_name, stats, total_ms, status_code):
+        with self.lock:
+            metrics = self.views.get(view_name)
+            if metrics is None:
+                metrics = self.views[view_name] = ViewMetrics()
+            metrics.add(stats, total_ms, status_code)
+        self._maybe_flush()
+
+    def snapshot(self):
+        with self.lock:
+            return {name: metrics.to_dict() for name, metrics in self.views.items()}
+
+    def report(self):
+        with self.lock:
+            return {name: metrics.summary() for name, metrics in sorted(self.views.items())}
+
+    def _maybe_flush(self):
+        interval = getattr(settings, "REQUEST_METRICS_FLUSH_SECONDS", 30)
+        now = time.monotonic()
+        if now - self.last_flush < interval:
+            return
+        self.last_flush = now
+        flush(self.snapshot())
+
+
+registry = MetricsRegistry()
+
+
+def metrics_dir():
+    return getattr(settings, "REQUEST_METRICS_DIR", None) or os.path.join(
+        tempfile.gettempdir(), "khanadotcom-metrics"
+    )
+
+
+def flush(snapshot):
+    directory = metrics_dir()
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f"{os.getpid()}.json")
+    with open(path + ".tmp", "w") as f:
+        json.dump(snapshot, f)
+    os.replace(path + ".tmp", path)
+
+
+def load_snapshots():
+    """Merge the latest snapshot of every process into one report."""
+    merged = {}
+    directory = metrics_dir()
+    if not os.path.isdir(directory):
+        return {}
+    for filename in os.listdir(directory):
+        if not filename.endswith(".json"):
+            continue
+        with open(os.path.join(directory, filename)) as f:
+            for name, data in json.load(f).items():
+                if name in merged:
+                    merged[name].merge(data)
+                else:
+                    merged[name] = ViewMetrics.from_dict(data)
+    return {name: metrics.summary() for name, metrics in sorted(merged.items())}
+
+
+def record_query(execute, sql, params, many, context):
+    stats = _current.get()
+    if stats is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        stats.sql_time += time.perf_counter() - started
+        stats.queries += 1
+        key = fingerprint(sql)
+        stats.fingerprints[key] = stats.fingerprints.get(key, 0) + 1
+
+
+def install_query_recorder(sender=None, connection=None, **kwargs):
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+connection_created.connect(install_query_recorder)
+
+
+class InstrumentedTemplate(Template):
+    def render(self, context=None, request=None):
+        stats = _current.get()
+        if stats is None:
+            return super().render(context, request)
+        started = time.perf_counter()
+        try:
+            return super().render(context, request)
+        finally:
+            stats.template_time += time.perf_counter() - started
+
+
+class InstrumentedDjangoTemplates(DjangoTemplates):
+    """Django template backend that reports render time to the middleware."""
+
+    def from_string(self, template_code):
+        return InstrumentedTemplate(self.engine.from_string(template_code), self)
+
+    def get_template(self, template_name):
+        template = super().get_template(template_name)
+        return InstrumentedTemplate(template.template, self)
+
+
+class RequestMetricsMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        for connection in connections.all(initialized_only=True):
+            install_query_recorder(connection=connection)
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def _start(self):
+        return _current.set(RequestStats()), time.perf_counter()
+
+    def _finish(self, request, response, token, started):
+        total_ms = (time.perf_counter() - started) * 1000
+        stats = _current.get()
+        _current.reset(token)
+        match = getattr(request, "resolver_match", None)
+        view_name = match.view_name if match else "<unresolved>"
+        registry.record(view_name, stats, total_ms, response.status_code)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        token, started = self._start()
+        response = self.get_response(request)
+        self._finish(request, response, token, started)
+        return response
+
+    async def __acall__(self, request):
+        token, started = self._start()
+        response = await self.get_response(request)
+        self._finish(request, response, token, started)
+        return response
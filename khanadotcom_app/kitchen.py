@@ -0,0 +1,91 @@
+from .models import Order, OrderItem
+from .pagination import cursor_values, decode_cursor, encode_cursor, keyset_page
+
+# Kitchen screens poll feed() every few seconds. The first call (no cursor)
+# returns the restaurant's open orders and a cursor; each later call returns
+# only the orders created or changed since the cursor, in the order they
+# changed, with the cursor to send next time. Every status change goes
+# through lifecycle.py, which sets updated_at, so (updated_at, order_id) orders
+# all changes; a poll with nothing new is one range scan of the
+# order_kitchen_changes_idx index that returns no rows.
+#
+# Writers to SQLite are serialised and set updated_at inside their write
+# transaction, so a change can never commit with a timestamp below a cursor
+# that was already handed out.
+
+OPEN_STATUSES = ("pending", "confirmed", "preparing")
+FEED_ORDERING = ("updated_at", "order_id")
+FEED_PAGE_SIZE = 100
+# Cursor handed out when the restaurant had no orders yet
+EMPTY_CURSOR = [None, 0]
+
+
+def _cursor(order):
+    return encode_cursor([order.updated_at, order.order_id])
+
+
+def _entries(orders):
+    open_ids = [order.order_id for order in orders if order.order_status in OPEN_STATUSES]
+    items = {}
+    for order_id, name, quantity in (
+        OrderItem.objects.filter(order_id__in=open_ids)
+        .order_by("order_item_id")
+        .values_list("order_id", "menu_item__name", "quantity")
+    ):
+        items.setdefault(order_id, []).append({"name": name, "quantity": quantity})
+    return [
+        {
+            "id": order.order_id,
+            "status": order.order_status,
+            "placed_at": order.created_at,
+            "updated_at": order.updated_at,
+            "ready_by": order.estimated_ready_at,
+            # Only for open orders; the others are leaving the screen.
+            "items": items.get(order.order_id, []),
+        }
+        for order in orders
+    ]
+
+
+def _orders(restaurant_id):
+    return Order.objects.filter(restaurant_id=restaurant_id).only(
+        "order_id", "order_status", "created_at", "updated_at", "estimated_ready_at"
+    )
+
+
+def feed(restaurant_id, cursor=None, page_size=FEED_PAGE_SIZE):
+    """
+    {"orders": [...], "cursor": str, "has_more": bool, "full": bool}; "full"
+    is True when "orders" is the whole open queue rather than changes.
+    """
+    # A cursor that doesn't decode to an (updated_at, order_id) pair, e.g. one
+    # edited by hand, gets a full resync like a screen starting up.
+    empty = cursor is not None and decode_cursor(cursor) == EMPTY_CURSOR
+    values = EMPTY_CURSOR if empty else cursor_values(
+        _orders(restaurant_id), FEED_ORDERING, cursor
+    )
+    if values is None:
+        # Take the cursor before reading the queue: a change in between is
+        # sent again on the next poll rather than lost.
+        latest = _orders(restaurant_id).order_by("-updated_at", "-order_id").first()
+        queue = list(
+            _orders(restaurant_id)
+            .filter(order_status__in=OPEN_STATUSES)
+            .order_by("created_at", "order_id")
+        )
+        return {
+            "orders": _entries(queue),
+            "cursor": _cursor(latest) if latest else encode_cursor(EMPTY_CURSOR),
+            "has_more": False,
+            "full": True,
+        }
+    if empty:
+        # No orders when the screen started
+        cursor = None
+    page = keyset_page(_orders(restaurant_id), FEED_ORDERING, cursor, page_size)
+    return {
+        "orders": _entries(page.items),
+        "cursor": _cursor(page.items[-1]) if page.items else encode_cursor(values),
+        "has_more": page.has_next,
+        "full": False,
+    }
@@ -0,0 +1,111 @@
+from django.db import transaction
+from django.dispatch import Signal
+from django.utils import timezone
+
+from . import analytics
+from .models import DeliveryPerson, Order, OrderStatusLog
+
+# Legal order status transitions. Every change is a single
+#   UPDATE order SET order_status = <to> WHERE ... AND order_status = <from>
+# so concurrent kitchen and rider updates can never overwrite each other;
+# the loser simply updates zero rows.
+TRANSITIONS = {
+    "pending": ("confirmed", "cancelled"),
+    "confirmed": ("preparing", "cancelled"),
+    "preparing": ("out_for_delivery", "cancelled"),
+    "out_for_delivery": ("delivered",),
+    "delivered": (),
+    "cancelled": (),
+}
+
+# The rider is free again once the order has left their hands
+RELEASE_RIDER_STATUSES = ("delivered", "cancelled")
+
+# Sent after the transaction commits, with ``order_ids``, ``from_status``
+# and ``to_status``.
+order_status_changed = Signal()
+
+
+class InvalidTransition(Exception):
+    pass
+
+
+def check_transition(from_status, to_status):
+    if to_status not in TRANSITIONS.get(from_status, ()):
+        raise InvalidTransition(f"Cannot move an order from {from_status} to {to_status}.")
+
+
+def _after_transition(order_ids, from_status, to_status):
+    OrderStatusLog.objects.bulk_create(
+        [
+            OrderStatusLog(order_id=order_id, from_status=from_status, to_status=to_status)
+            for order_id in order_ids
+        ]
+    )
+    if to_status in RELEASE_RIDER_STATUSES:
+        DeliveryPerson.objects.filter(order__pk__in=order_ids).update(
+            availability_status=True
+        )
+    if to_status == "delivered":
+        # In the same transaction, so a delivery is counted exactly once
+        analytics.record_delivered(order_ids)
+    transaction.on_commit(
+        lambda: order_status_changed.send(
+            sender=Order,
+            order_ids=order_ids,
+            from_status=from_status,
+            to_status=to_status,
+        )
+    )
+
+
+def transition(order_id, from_status, to_status):
+    """
+    Move one order from ``from_status`` to ``to_status``. Returns False when
+    the order is no longer in ``from_status``.
+    """
+    check_transition(from_status, to_status)
+    with transaction.atomic():
+        updated = Order.objects.filter(pk=order_id, order_status=from_status).update(
+            order_status=to_status, updated_at=timezone.now()
+        )
+        if updated:
+            _after_transition([order_id], from_status, to_status)
+    return bool(updated)
+
+
+def advance(order, to_status):
+    """Like transition() for an Order instance, which is updated in place."""
+    if not transition(order.pk, order.order_status, to_status):
+        return False
+    order.order_status = to_status
+    return True
+
+
+def bulk_transition(queryset, from_status, to_status):
+    """
+    Move every order of ``queryset`` that is in ``from_status`` to
+    ``to_status``. Returns the ids of the orders that were moved.
+    """
+    check_transition(from_status, to_status)
+    with transaction.atomic():
+        order_ids = list(
+            Order.objects.filter(pk__in=queryset.values("pk"), order_status=from_status)
+            .select_for_update()
+            .values_list("order_id", flat=True)
+        )
+        if not order_ids:
+            return []
+        Order.objects.filter(pk__in=order_ids, order_status=from_status).update(
+            order_status=to_status, updated_at=timezone.now()
+        )
+        _after_transition(order_ids, from_status, to_status)
+    return order_ids
+
+
+def restaurant_orders(restaurant_id):
+    return Order.objects.filter(restaurant_id=restaurant_id)
+
+
+def confirm_pending_orders(restaurant_id):
+    return bulk_transition(restaurant_orders(restaurant_id), "pending", "confirmed")
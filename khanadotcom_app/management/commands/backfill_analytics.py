@@ -0,0 +1,50 @@
+import datetime
+import time
+
+from django.core.management.base import BaseCommand
+from django.db.models import Min
+from django.utils import timezone
+
+from khanadotcom_app import analytics
+from khanadotcom_app.models import Order
+
+
+class Command(BaseCommand):
+    help = "Recompute the restaurant and menu item sales rollups from delivered orders."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--from", dest="start", type=datetime.date.fromisoformat,
+            help="First day, YYYY-MM-DD; the first order day by default.",
+        )
+        parser.add_argument(
+            "--to", dest="end", type=datetime.date.fromisoformat,
+            help="Last day, YYYY-MM-DD; today by default.",
+        )
+        parser.add_argument(
+            "--days-per-chunk", type=int, default=7,
+            help="Days recomputed per transaction.",
+        )
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        start = options["start"]
+        if start is None:
+            first_order = Order.objects.aggregate(first=Min("order_date"))["first"]
+            if first_order is None:
+                self.stdout.write("No orders.")
+                return
+            start = timezone.localdate(first_order)
+        end = options["end"] or timezone.localdate()
+        step = datetime.timedelta(days=options["days_per_chunk"])
+
+        rows = 0
+        while start <= end:
+            chunk_end = min(start + step - datetime.timedelta(days=1), end)
+            rows += analytics.rebuild(start, chunk_end)
+            start = chunk_end + datetime.timedelta(days=1)
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Wrote {rows} restaurant-day rows in {time.monotonic() - started:.1f}s."
+            )
+        )
@@ -0,0 +1,141 @@
+import asyncio
+import statistics
+import time
+import types
+
+from django.core.handlers.asgi import ASGIHandler
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client
+from django.test.utils import override_settings
+from django.urls import include, path
+
+from khanadotcom_app import async_views, views
+from khanadotcom_app.models import Order, Restaurant
+
+HOST = "testserver"
+
+
+def browse_urlconf(stack):
+    """A URLconf serving the browse pages from ``stack``, everything else as usual."""
+    module = types.ModuleType(f"bench_urls_{stack.__name__}")
+    module.urlpatterns = [
+        path("restaurants/", stack.restaurant_list, name="restaurant_list"),
+        path(
+            "restaurants/<int:restaurant_id>/",
+            stack.restaurant_detail,
+            name="restaurant_detail",
+        ),
+        path(
+            "restaurants/<int:restaurant_id>/menu/", stack.menu_items, name="menu_items"
+        ),
+        path("order/history/", stack.order_history_view, name="order_history"),
+        path("", include("khanadotcom_project.urls")),
+    ]
+    return module
+
+
+async def asgi_get(app, url, cookie):
+    """Run one GET through the ASGI application; returns the status code."""
+    path_info, _, query = url.partition("?")
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "GET",
+        "scheme": "http",
+        "path": path_info,
+        "raw_path": path_info.encode(),
+        "query_string": query.encode(),
+        "root_path": "",
+        "headers": [(b"host", HOST.encode()), (b"cookie", cookie.encode())],
+        "client": ("127.0.0.1", 50000),
+        "server": (HOST, 80),
+    }
+    done = asyncio.Event()
+    status = []
+    body_sent = []
+
+    async def receive():
+        if not body_sent:
+            body_sent.append(True)
+            return {"type": "http.request", "body": b"", "more_body": False}
+        await done.wait()
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        if message["type"] == "http.response.start":
+            status.append(message["status"])
+        elif not message.get("more_body"):
+            done.set()
+
+    await app(scope, receive, send)
+    done.set()
+    return status[0]
+
+
+class Command(BaseCommand):
+    help = (
+        "Load-test the browse pages through the ASGI application with the "
+        "sync views and the async views, on the current database."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--requests", type=int, default=500, help="Per endpoint.")
+        parser.add_argument("--concurrency", type=int, default=32)
+
+    def handle(self, *args, **options):
+        restaurant = Restaurant.objects.filter(is_deleted=False).order_by("pk").first()
+        order = Order.objects.order_by("-pk").select_related("user").first()
+        if restaurant is None or order is None:
+            raise CommandError(
+                "Need at least one restaurant and one order; run generate_data first."
+            )
+        client = Client()
+        client.force_login(order.user)
+        cookie = "; ".join(f"{k}={v.value}" for k, v in client.cookies.items())
+        endpoints = [
+            "/restaurants/",
+            "/restaurants/?sort=rating",
+            f"/restaurants/{restaurant.pk}/",
+            f"/restaurants/{restaurant.pk}/menu/",
+            "/order/history/",
+        ]
+
+        self.stdout.write(
+            f"{'stack':<6} {'endpoint':<28} {'req/s':>8} {'p50 ms':>8} "
+            f"{'p95 ms':>8} {'p99 ms':>8}"
+        )
+        for stack in (views, async_views):
+            name = "async" if stack is async_views else "sync"
+            with override_settings(ROOT_URLCONF=browse_urlconf(stack), ALLOWED_HOSTS=[HOST]):
+                app = ASGIHandler()
+                for url in endpoints:
+                    rps, latencies = asyncio.run(
+                        self._load(app, url, cookie, options["requests"], options["concurrency"])
+                    )
+                    self.stdout.write(
+                        f"{name:<6} {url[:28]:<28} {rps:>8.1f} "
+                        f"{statistics.median(latencies):>8.2f} "
+                        f"{latencies[int(len(latencies) * 0.95) - 1]:>8.2f} "
+                        f"{latencies[int(len(latencies) * 0.99) - 1]:>8.2f}"
+                    )
+
+    async def _load(self, app, url, cookie, requests, concurrency):
+        status = await asgi_get(app, url, cookie)  # warm up caches
+        if status != 200:
+            raise CommandError(f"GET {url} returned {status}")
+        latencies = []
+        remaining = [requests]
+
+        async def worker():
+            while remaining[0] > 0:
+                remaining[0] -= 1
+                started = time.perf_counter()
+                await asgi_get(app, url, cookie)
+                latencies.append((time.perf_counter() - started) * 1000)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+        latencies.sort()
+        return requests / elapsed, latencies
@@ -0,0 +1,49 @@
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+from django.test import Client
+from django.test.utils import override_settings
+
+from khanadotcom_app import ratelimit
+
+HOST = "testserver"
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure the cost of a rate limit check against the counter table, and "
+        "compare a rejected login with one that reaches password hashing."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--checks", type=int, default=20000)
+        parser.add_argument("--logins", type=int, default=20)
+
+    def handle(self, *args, **options):
+        rule = ratelimit.Rule.parse("ip", "1000000/m")
+        checks = options["checks"]
+        started = time.perf_counter()
+        for i in range(checks):
+            ratelimit.hit("bench", rule, f"10.0.{i % 250}.{i % 199}")
+        per_check = (time.perf_counter() - started) / checks * 1e6
+        self.stdout.write(f"hit(): {per_check:.1f} us per rule checked")
+
+        client = Client(REMOTE_ADDR="10.9.9.9")
+        form = {"username": "nobody@example.test", "password": "wrong password"}
+        with override_settings(ALLOWED_HOSTS=[HOST], RATE_LIMITS={"login": [("ip", "1000000/m")]}):
+            allowed = self._time(client, form, options["logins"], expect=200)
+        with override_settings(ALLOWED_HOSTS=[HOST], RATE_LIMITS={"login": [("ip", "1/h")]}):
+            client.post("/login/", form)  # use up the allowance
+            rejected = self._time(client, form, options["logins"], expect=429)
+        self.stdout.write(f"POST /login/ allowed (hashes a password): {allowed:.2f} ms")
+        self.stdout.write(f"POST /login/ rejected with 429:          {rejected:.2f} ms")
+
+    def _time(self, client, form, count, expect):
+        timings = []
+        for _ in range(count):
+            started = time.perf_counter()
+            response = client.post("/login/", form)
+            timings.append((time.perf_counter() - started) * 1000)
+            assert response.status_code == expect, response.status_code
+        return statistics.median(timings)
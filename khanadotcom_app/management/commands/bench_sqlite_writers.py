@@ -0,0 +1,159 @@
+import multiprocessing
+import random
+import statistics
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, connections
+from django.db.backends.signals import connection_created
+
+from khanadotcom_app.database import configure_sqlite
+from khanadotcom_app.models import MenuItem, Order, Restaurant, User
+from khanadotcom_app.orders import place_order
+
+MARKER = "[bench_sqlite_writers]"
+
+
+def _untuned():
+    # Plain SQLite as Django opens it: deferred transactions, no pragmas.
+    connection_created.disconnect(configure_sqlite)
+    for alias in connections:
+        connections[alias].settings_dict["OPTIONS"].pop("transaction_mode", None)
+
+
+def _writer(args):
+    seed, checkouts, baskets, customers, start_at, plain = args
+    if plain:
+        _untuned()
+    rng = random.Random(seed)
+    users = User.objects.in_bulk(customers)
+    restaurants = Restaurant.objects.using("default").in_bulk(list(baskets))
+    latencies, locked = [], 0
+    time.sleep(max(0, start_at - time.time()))
+    for _ in range(checkouts):
+        restaurant_id = rng.choice(list(baskets))
+        started = time.perf_counter()
+        try:
+            place_order(
+                user=users[rng.choice(customers)],
+                restaurant=restaurants[restaurant_id],
+                delivery_address=MARKER,
+                quantities={item: rng.randint(1, 3) for item in baskets[restaurant_id]},
+            )
+        except OperationalError as e:
+            if "locked" not in str(e):
+                raise
+            locked += 1
+        else:
+            latencies.append((time.perf_counter() - started) * 1000)
+    connections.close_all()
+    return latencies, locked
+
+
+def _reader(args):
+    seed, reads, restaurant_ids, start_at, plain = args
+    if plain:
+        _untuned()
+    rng = random.Random(seed)
+    latencies, locked = [], 0
+    time.sleep(max(0, start_at - time.time()))
+    for _ in range(reads):
+        started = time.perf_counter()
+        try:
+            list(Restaurant.objects.filter(is_deleted=False).order_by("pk")[:20])
+            list(MenuItem.objects.filter(restaurant_id=rng.choice(restaurant_ids)))
+        except OperationalError as e:
+            if "locked" not in str(e):
+                raise
+            locked += 1
+        else:
+            latencies.append((time.perf_counter() - started) * 1000)
+    connections.close_all()
+    return latencies, locked
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure write contention on the SQLite database: several processes "
+        "place orders concurrently while others browse. Compare with --plain "
+        "to see the effect of the tuning in khanadotcom_app/database.py. "
+        "The benchmark orders are deleted afterwards."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--writers", type=int, default=8)
+        parser.add_argument("--readers", type=int, default=4)
+        parser.add_argument("--checkouts", type=int, default=200, help="Per writer.")
+        parser.add_argument("--reads", type=int, default=500, help="Per reader.")
+        parser.add_argument(
+            "--plain", action="store_true",
+            help="Rollback-journal mode, deferred transactions and no pragmas.",
+        )
+
+    def handle(self, *args, **options):
+        if connections["default"].vendor != "sqlite":
+            raise CommandError("This benchmark is for the SQLite backend.")
+        baskets = {}
+        for restaurant_id, item_id in (
+            MenuItem.objects.using("default")
+            .filter(availability=True, restaurant__is_deleted=False)
+            .order_by("restaurant_id", "pk")
+            .values_list("restaurant_id", "pk")[:2000]
+        ):
+            items = baskets.setdefault(restaurant_id, [])
+            if len(items) < 3:
+                items.append(item_id)
+        customers = list(
+            User.objects.filter(user_type="customer").values_list("pk", flat=True)[:100]
+        )
+        if not baskets or not customers:
+            raise CommandError("Need restaurants, menu items and customers; run generate_data first.")
+
+        plain = options["plain"]
+        self._journal_mode("delete" if plain else "wal")
+        connections.close_all()  # forked workers open their own connections
+
+        start_at = time.time() + 1
+        writers = [
+            (seed, options["checkouts"], baskets, customers, start_at, plain)
+            for seed in range(options["writers"])
+        ]
+        readers = [
+            (seed, options["reads"], list(baskets), start_at, plain)
+            for seed in range(options["readers"])
+        ]
+        context = multiprocessing.get_context("fork")
+        try:
+            with context.Pool(len(writers) + len(readers)) as pool:
+                write_results = pool.map_async(_writer, writers)
+                read_results = pool.map_async(_reader, readers)
+                started = time.time()
+                write_results, read_results = write_results.get(), read_results.get()
+                elapsed = time.time() - max(started, start_at)
+        finally:
+            deleted = Order.objects.filter(delivery_address=MARKER).delete()[1].get(
+                "khanadotcom_app.Order", 0
+            )
+            self._journal_mode("wal")
+
+        self.stdout.write(f"{'plain' if plain else 'tuned'} SQLite, {elapsed:.1f}s")
+        self._report("checkouts", write_results, elapsed)
+        self._report("reads", read_results, elapsed)
+        self.stdout.write(f"Deleted {deleted} benchmark orders.")
+
+    def _journal_mode(self, mode):
+        with connections["default"].cursor() as cursor:
+            cursor.execute(f"PRAGMA journal_mode = {mode}")
+
+    def _report(self, label, results, elapsed):
+        latencies = sorted(ms for worker, _ in results for ms in worker)
+        locked = sum(count for _, count in results)
+        if not latencies:
+            self.stdout.write(f"{label}: none succeeded, {locked} 'database is locked'")
+            return
+        self.stdout.write(
+            f"{label}: {len(latencies)} ok ({len(latencies) / elapsed:.0f}/s), "
+            f"{locked} 'database is locked', "
+            f"p50 {statistics.median(latencies):.1f} ms, "
+            f"p99 {latencies[int(len(latencies) * 0.99) - 1]:.1f} ms"
+        )
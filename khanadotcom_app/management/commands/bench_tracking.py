@@ -0,0 +1,79 @@
+import asyncio
+import statistics
+import time
+import tracemalloc
+
+from django.core.management.base import BaseCommand
+
+from khanadotcom_app.pubsub import InProcessBroker, order_channel
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure how many order-tracking subscribers one worker process can "
+        "hold: memory per subscriber and fan-out latency of a status event."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--subscribers", type=int, nargs="+", default=[1000, 10000, 50000]
+        )
+        parser.add_argument(
+            "--orders", type=int, default=100,
+            help="Subscribers are spread over this many order channels.",
+        )
+        parser.add_argument("--events", type=int, default=20)
+
+    def handle(self, *args, **options):
+        self.stdout.write(
+            f"{'subscribers':>12} {'KiB/sub':>8} {'p50 ms':>8} {'p99 ms':>8} {'max ms':>8}"
+        )
+        for count in options["subscribers"]:
+            row = asyncio.run(self._bench(count, options["orders"], options["events"]))
+            self.stdout.write("{:>12} {:>8.2f} {:>8.2f} {:>8.2f} {:>8.2f}".format(count, *row))
+
+    async def _bench(self, count, orders, events):
+        broker = InProcessBroker()
+        latencies = []
+        round_done = asyncio.Event()
+        pending = [0]
+
+        async def subscriber(subscription):
+            try:
+                for _ in range(events):
+                    sent_at = await subscription.get()
+                    latencies.append(time.perf_counter() - sent_at)
+                    pending[0] -= 1
+                    if not pending[0]:
+                        round_done.set()
+            finally:
+                subscription.close()
+
+        tracemalloc.start()
+        before = tracemalloc.take_snapshot()
+        tasks = [
+            asyncio.create_task(subscriber(broker.subscribe(order_channel(i % orders))))
+            for i in range(count)
+        ]
+        await asyncio.sleep(0)
+        after = tracemalloc.take_snapshot()
+        tracemalloc.stop()
+        memory = sum(stat.size_diff for stat in after.compare_to(before, "filename"))
+
+        # Publish one status change to every order, wait until every
+        # subscriber has it, then start the next round.
+        for _ in range(events):
+            round_done.clear()
+            pending[0] = count
+            for order_id in range(orders):
+                broker.publish(order_channel(order_id), time.perf_counter())
+            await round_done.wait()
+        await asyncio.gather(*tasks)
+
+        latencies.sort()
+        return (
+            memory / count / 1024,
+            statistics.median(latencies) * 1000,
+            latencies[int(len(latencies) * 0.99) - 1] * 1000,
+            latencies[-1] * 1000,
+        )
@@ -0,0 +1,66 @@
+from concurrent.futures import FIRST_COMPLETED, wait
+
+from django.apps import apps
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from khanadotcom_app import image_pipeline, images
+
+
+class Command(BaseCommand):
+    help = (
+        "Build the resized WebP/JPEG variants and placeholders of existing "
+        "restaurant, menu item and profile pictures."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--force", action="store_true", help="Rebuild variants that already exist."
+        )
+        parser.add_argument("--workers", type=int, default=None)
+        parser.add_argument("--chunk-size", type=int, default=500)
+
+    def handle(self, *args, **options):
+        workers = options["workers"] or getattr(settings, "IMAGE_PIPELINE_WORKERS", 2)
+        executor = image_pipeline.make_executor(workers)
+        max_pending = workers * 4
+        built = failed = 0
+        with executor:
+            for label, (image_field, variants_field) in image_pipeline.IMAGE_FIELDS.items():
+                model = apps.get_model(label)
+                rows = (
+                    model.objects.exclude(**{image_field: ""})
+                    .exclude(**{f"{image_field}__isnull": True})
+                    .only("pk", image_field, variants_field)
+                    .iterator(chunk_size=options["chunk_size"])
+                )
+                pending = {}
+                for instance in rows:
+                    if not options["force"] and not image_pipeline.needs_variants(instance):
+                        continue
+                    source = getattr(instance, image_field).name
+                    try:
+                        data = image_pipeline.read_source(source)
+                    except OSError as e:
+                        self.stderr.write(f"{label} {instance.pk}: {e}")
+                        failed += 1
+                        continue
+                    pending[executor.submit(images.render_variants, data)] = (instance.pk, source)
+                    if len(pending) >= max_pending:
+                        b, f = self._collect(model, pending, FIRST_COMPLETED)
+                        built, failed = built + b, failed + f
+                b, f = self._collect(model, pending)
+                built, failed = built + b, failed + f
+        self.stdout.write(self.style.SUCCESS(f"Built variants for {built} pictures, {failed} failed."))
+
+    def _collect(self, model, pending, return_when="ALL_COMPLETED"):
+        built = failed = 0
+        done, _ = wait(pending, return_when=return_when)
+        for future in done:
+            pk, source = pending.pop(future)
+            try:
+                built += image_pipeline.store_variants(model, pk, source, future.result())
+            except Exception as e:
+                self.stderr.write(f"{model._meta.label} {pk}: {e}")
+                failed += 1
+        return built, failed
@@ -0,0 +1,31 @@
+import logging
+
+from django.core.management.base import BaseCommand
+
+from khanadotcom_app import dispatch
+
+
+class Command(BaseCommand):
+    help = "Assign available delivery persons to orders that are out for delivery."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--window", type=float, default=5.0,
+            help="Seconds to collect pending orders between batches.",
+        )
+        parser.add_argument("--batch-size", type=int, default=100)
+        parser.add_argument(
+            "--once", action="store_true", help="Dispatch a single batch and exit."
+        )
+
+    def handle(self, *args, **options):
+        logging.basicConfig(level=logging.INFO, format="%(asctime)s %(message)s")
+        if options["once"]:
+            assigned = dispatch.dispatch_batch(options["batch_size"])
+            self.stdout.write(f"Assigned {len(assigned)} orders.")
+            return
+        self.stdout.write("Dispatcher running, press CTRL-C to stop.")
+        try:
+            dispatch.run(window=options["window"], batch_size=options["batch_size"])
+        except KeyboardInterrupt:
+            pass
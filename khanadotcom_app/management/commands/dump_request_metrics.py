@@ -0,0 +1,42 @@
+import json
+import shutil
+
+from django.core.management.base import BaseCommand
+
+from khanadotcom_app import instrumentation
+
+
+class Command(BaseCommand):
+    help = "Print the per-view request metrics collected by the web processes."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--json", action="store_true", help="Output raw JSON.")
+        parser.add_argument(
+            "--clear", action="store_true", help="Delete the collected snapshots."
+        )
+
+    def handle(self, *args, **options):
+        if options["clear"]:
+            shutil.rmtree(instrumentation.metrics_dir(), ignore_errors=True)
+            self.stdout.write("Metrics cleared.")
+            return
+        report = instrumentation.load_snapshots()
+        if options["json"]:
+            self.stdout.write(json.dumps(report, indent=2))
+            return
+        if not report:
+            self.stdout.write(f"No metrics in {instrumentation.metrics_dir()}.")
+            return
+
+        self.stdout.write(
+            f"{'view':<32} {'reqs':>7} {'avg ms':>8} {'p95 ms':>7} {'queries':>8} "
+            f"{'sql ms':>7} {'tmpl ms':>8}"
+        )
+        for name, row in report.items():
+            self.stdout.write(
+                f"{name[:32]:<32} {row['requests']:>7} {row['avg_ms']:>8} "
+                f"{row['p95_ms']:>7} {row['avg_queries']:>8} {row['avg_sql_ms']:>7} "
+                f"{row['avg_template_ms']:>8}"
+            )
+            for sql, count in list(row["duplicate_queries"].items())[:3]:
+                self.stdout.write(f"    repeated x{count}: {sql[:100]}")
@@ -0,0 +1,57 @@
+import datetime
+import time
+
+from django.core.management.base import BaseCommand
+
+from khanadotcom_app import exports
+
+
+class Command(BaseCommand):
+    help = "Export orders with their items, payments or reviews as CSV or NDJSON."
+
+    def add_arguments(self, parser):
+        parser.add_argument("kind", choices=sorted(exports.EXPORTS))
+        parser.add_argument("--format", default="csv", choices=exports.FORMATS)
+        parser.add_argument(
+            "--from", dest="start", type=datetime.date.fromisoformat,
+            help="First day to export, YYYY-MM-DD.",
+        )
+        parser.add_argument(
+            "--to", dest="end", type=datetime.date.fromisoformat,
+            help="Last day to export, YYYY-MM-DD.",
+        )
+        parser.add_argument("--restaurant", type=int, help="Only this restaurant's data.")
+        parser.add_argument("--output", help="File to write to; standard output by default.")
+        parser.add_argument("--chunk-size", type=int, default=exports.CHUNK_SIZE)
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        lines = exports.export_lines(
+            options["kind"],
+            options["format"],
+            start=options["start"],
+            end=options["end"],
+            restaurant_id=options["restaurant"],
+            chunk_size=options["chunk_size"],
+        )
+        if not options["output"]:
+            for chunk in exports.buffered(lines):
+                self.stdout.write(chunk, ending="")
+            return
+        written = 0
+
+        def counted(lines):
+            nonlocal written
+            for line in lines:
+                written += 1
+                yield line
+
+        with open(options["output"], "w", newline="", encoding="utf-8") as f:
+            for chunk in exports.buffered(counted(lines)):
+                f.write(chunk)
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Wrote {written - (options['format'] == 'csv')} records to "
+                f"{options['output']} in {time.monotonic() - started:.1f}s."
+            )
+        )
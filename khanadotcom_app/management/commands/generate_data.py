@@ -0,0 +1,320 @@
+import random
+import time
+from array import array
+from contextlib import contextmanager
+from datetime import timedelta
+from decimal import Decimal
+
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+
+from khanadotcom_app import eta
+from khanadotcom_app.models import (
+    Category, CustomerDetail, DeliveryPerson, MenuItem, MenuItemCategory, Order,
+    OrderItem, Payment, Restaurant, Review, User,
+)
+
+# Full-size dataset; --scale multiplies every count except the menu size.
+RESTAURANTS = 10_000
+MENU_ITEMS_PER_RESTAURANT = 100
+ORDERS = 10_000_000
+CUSTOMERS = 100_000
+DELIVERY_PERSONS = 2_000
+REVIEW_RATE = 0.2
+
+CATEGORIES = (
+    "Breakfast", "Starters", "Main Course", "Biryani", "Breads", "Desserts",
+    "Beverages", "South Indian", "Chinese", "Pizza", "Burgers", "Thali",
+)
+DISHES = (
+    "Masala Dosa", "Idli", "Paneer Tikka", "Butter Chicken", "Dal Makhani",
+    "Veg Biryani", "Chicken Biryani", "Garlic Naan", "Gulab Jamun", "Lassi",
+    "Hakka Noodles", "Margherita", "Veg Burger", "Chole Bhature", "Rasmalai",
+)
+AREAS = (
+    "Koramangala", "Indiranagar", "Whitefield", "Jayanagar", "HSR Layout",
+    "Malleshwaram", "BTM Layout", "Hebbal", "Marathahalli", "Banashankari",
+)
+STATUSES = ("delivered",) * 90 + ("cancelled",) * 5 + (
+    "pending", "confirmed", "preparing", "out_for_delivery", "out_for_delivery",
+)
+PAYMENT_METHODS = [choice for choice, _ in Payment.PAYMENT_METHOD_CHOICES]
+
+
+@contextmanager
+def explicit_timestamps(*models):
+    # bulk_create runs pre_save, which would stamp every row with "now";
+    # generated history needs its own dates.
+    fields = [
+        field for model in models for field in model._meta.concrete_fields
+        if getattr(field, "auto_now_add", False) or getattr(field, "auto_now", False)
+    ]
+    saved = [(field, field.auto_now, field.auto_now_add) for field in fields]
+    for field in fields:
+        field.auto_now = field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, auto_now, auto_now_add in saved:
+            field.auto_now, field.auto_now_add = auto_now, auto_now_add
+
+
+class Command(BaseCommand):
+    help = (
+        "Generate a large, realistic dataset with bulk inserts: restaurants, "
+        "menu items, customers, riders, orders with items, payments and reviews."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--scale", type=float, default=1.0,
+            help="Multiplier for the full-size dataset (10k restaurants, 1M menu "
+                 "items, 10M orders). E.g. 0.01 for a quick local dataset.",
+        )
+        parser.add_argument("--batch-size", type=int, default=5000)
+        parser.add_argument("--seed", type=int, default=42)
+        parser.add_argument("--days", type=int, default=365, help="Order history length.")
+        parser.add_argument(
+            "--tag", default="gen", help="Prefix of generated emails, must be unused."
+        )
+
+    def handle(self, *args, **options):
+        self.rng = random.Random(options["seed"])
+        self.batch_size = options["batch_size"]
+        self.tag = options["tag"]
+        self.now = timezone.now()
+        self.days = options["days"]
+        scale = options["scale"]
+
+        if User.objects.filter(email__startswith=f"{self.tag}-").exists():
+            raise CommandError(f"Data tagged '{self.tag}' already exists, use another --tag.")
+
+        def count(n):
+            return max(1, int(n * scale))
+
+        started = time.monotonic()
+        with explicit_timestamps(
+            User, Restaurant, DeliveryPerson, MenuItem, MenuItemCategory, Order,
+            OrderItem, Payment, Review, Category,
+        ):
+            categories = self._categories()
+            owners = self._users("owner", "restaurant_owner", count(RESTAURANTS / 5))
+            customers = self._users("customer", "customer", count(CUSTOMERS))
+            self._customer_details(customers)
+            riders = self._delivery_persons(count(DELIVERY_PERSONS))
+            restaurants = self._restaurants(owners, count(RESTAURANTS))
+            menus = self._menu_items(restaurants, MENU_ITEMS_PER_RESTAURANT, categories)
+            self._orders(count(ORDERS), customers, riders, restaurants, menus)
+
+        self.stdout.write("Rebuilding derived data...")
+        call_command("recompute_ratings", stdout=self.stdout)
+        call_command("rebuild_search_index", stdout=self.stdout)
+        call_command("backfill_analytics", days_per_chunk=30, stdout=self.stdout)
+        self.stdout.write(
+            self.style.SUCCESS(f"Done in {time.monotonic() - started:.0f}s.")
+        )
+
+    # Helpers
+
+    def _past(self, days=None):
+        seconds = self.rng.randint(0, (days or self.days) * 86400)
+        return self.now - timedelta(seconds=seconds)
+
+    def _bulk(self, model, objects):
+        created = []
+        for i in range(0, len(objects), self.batch_size):
+            with transaction.atomic():
+                created += model.objects.bulk_create(objects[i:i + self.batch_size])
+        return created
+
+    def _log(self, message):
+        self.stdout.write(message)
+
+    # Generators
+
+    def _categories(self):
+        return self._bulk(Category, [
+            Category(name=name, created_at=self.now, updated_at=self.now)
+            for name in CATEGORIES
+        ])
+
+    def _users(self, kind, user_type, n):
+        self._log(f"Creating {n} {kind}s...")
+        users = []
+        for i in range(n):
+            joined = self._past()
+            users.append(User(
+                email=f"{self.tag}-{kind}{i}@example.test",
+                username=f"{self.tag}-{kind}{i}",
+                name=f"{kind.title()} {i}",
+                phone_number=f"9{self.rng.randint(100000000, 999999999)}",
+                address=f"{self.rng.randint(1, 999)}, {self.rng.choice(AREAS)}, Bengaluru",
+                user_type=user_type,
+                password="!",  # unusable password, no hashing cost
+                is_active=True,
+                created_at=joined,
+                updated_at=joined,
+                date_joined=joined,
+            ))
+        return [user.pk for user in self._bulk(User, users)]
+
+    def _customer_details(self, customers):
+        self._bulk(CustomerDetail, [
+            CustomerDetail(customer_id=pk, name=f"Customer {i}", phone_number="0",
+                           address="Bengaluru")
+            for i, pk in enumerate(customers)
+        ])
+
+    def _delivery_persons(self, n):
+        users = self._users("rider", "delivery_person", n)
+        riders = self._bulk(DeliveryPerson, [
+            DeliveryPerson(
+                user_id=pk,
+                vehicle_details=f"KA-{self.rng.randint(1, 60):02d}-{self.rng.randint(1000, 9999)}",
+                latitude=Decimal("12.97") + Decimal(self.rng.randint(-900, 900)) / 10000,
+                longitude=Decimal("77.59") + Decimal(self.rng.randint(-900, 900)) / 10000,
+                created_at=self.now,
+                updated_at=self.now,
+            )
+            for pk in users
+        ])
+        return [rider.pk for rider in riders]
+
+    def _restaurants(self, owners, n):
+        self._log(f"Creating {n} restaurants...")
+        restaurants = []
+        for i in range(n):
+            area = self.rng.choice(AREAS)
+            opened = self._past(self.days * 3)
+            restaurants.append(Restaurant(
+                name=f"{self.rng.choice(('Spice', 'Royal', 'Udupi', 'Tandoor', 'Urban'))} "
+                     f"{self.rng.choice(('Kitchen', 'Garden', 'Palace', 'Cafe', 'House'))} {i}",
+                owner_id=owners[i % len(owners)],
+                address=f"{self.rng.randint(1, 999)}, {area}, Bengaluru",
+                phone_number=f"80{self.rng.randint(10000000, 99999999)}",
+                email=f"{self.tag}-restaurant{i}@example.test",
+                description=f"Popular {self.rng.choice(CATEGORIES).lower()} place in {area}.",
+                latitude=Decimal("12.97") + Decimal(self.rng.randint(-900, 900)) / 10000,
+                longitude=Decimal("77.59") + Decimal(self.rng.randint(-900, 900)) / 10000,
+                is_deleted=self.rng.random() < 0.02,
+                created_at=opened,
+                updated_at=opened,
+            ))
+        return [(restaurant.pk, restaurant.name) for restaurant in self._bulk(Restaurant, restaurants)]
+
+    def _menu_items(self, restaurants, per_restaurant, categories):
+        self._log(f"Creating {len(restaurants) * per_restaurant} menu items...")
+        # One (menu item ids, prices in paise) pair per restaurant, as arrays
+        # to keep a million items affordable in memory.
+        menus = []
+        step = max(1, self.batch_size // per_restaurant)
+        for start in range(0, len(restaurants), step):
+            chunk = restaurants[start:start + step]
+            items = []
+            for restaurant_id, _ in chunk:
+                for j in range(per_restaurant):
+                    items.append(MenuItem(
+                        restaurant_id=restaurant_id,
+                        name=f"{self.rng.choice(DISHES)} {j}",
+                        description="Freshly made.",
+                        price=Decimal(self.rng.randint(40, 600)),
+                        availability=self.rng.random() > 0.05,
+                        preparation_time=self.rng.choice((10, 15, 20, 25, 30, 40)),
+                        created_at=self.now,
+                        updated_at=self.now,
+                    ))
+            with transaction.atomic():
+                items = MenuItem.objects.bulk_create(items)
+                MenuItemCategory.objects.bulk_create([
+                    MenuItemCategory(
+                        menu_item_id=item.pk,
+                        category_id=self.rng.choice(categories).pk,
+                        created_at=self.now,
+                        updated_at=self.now,
+                    )
+                    for item in items
+                ])
+            for i in range(0, len(items), per_restaurant):
+                menu = items[i:i + per_restaurant]
+                menus.append((
+                    array("q", [item.pk for item in menu]),
+                    array("q", [int(item.price * 100) for item in menu]),
+                ))
+        return menus
+
+    def _orders(self, n, customers, riders, restaurants, menus):
+        self._log(f"Creating {n} orders with items, payments and reviews...")
+        done = 0
+        while done < n:
+            size = min(self.batch_size, n - done)
+            self._order_batch(size, customers, riders, restaurants, menus)
+            done += size
+            if done % (self.batch_size * 20) == 0 or done == n:
+                self._log(f"  {done}/{n}")
+
+    def _order_batch(self, size, customers, riders, restaurants, menus):
+        rng = self.rng
+        orders, baskets = [], []
+        for _ in range(size):
+            index = rng.randrange(len(restaurants))
+            ids, prices = menus[index]
+            picks = rng.sample(range(len(ids)), min(len(ids), rng.choice((1, 1, 2, 2, 3, 4))))
+            basket = [(ids[p], prices[p], rng.choice((1, 1, 1, 2, 3))) for p in picks]
+            total = sum(Decimal(price) / 100 * quantity for _, price, quantity in basket)
+            placed = self._past()
+            status = rng.choice(STATUSES)
+            orders.append(Order(
+                user_id=rng.choice(customers),
+                restaurant_id=restaurants[index][0],
+                total_amount=total,
+                order_status=status,
+                delivery_address=f"{rng.randint(1, 999)}, {rng.choice(AREAS)}, Bengaluru",
+                delivery_person_id=rng.choice(riders) if status in ("out_for_delivery", "delivered") else None,
+                item_count=sum(quantity for _, _, quantity in basket),
+                preparation_minutes=eta.DEFAULT_PREPARATION_MINUTES,
+                restaurant_name=restaurants[index][1],
+                order_date=placed,
+                # The checkout estimate, which every order gets
+                delivery_date=placed + timedelta(minutes=rng.randint(25, 70)),
+                created_at=placed,
+                updated_at=placed,
+            ))
+            baskets.append((index, basket))
+
+        with transaction.atomic():
+            orders = Order.objects.bulk_create(orders)
+            items, payments, reviews = [], [], []
+            for order, (index, basket) in zip(orders, baskets):
+                for menu_item_id, price, quantity in basket:
+                    items.append(OrderItem(
+                        order_id=order.pk, menu_item_id=menu_item_id, quantity=quantity,
+                        price=Decimal(price) / 100, created_at=order.order_date,
+                        updated_at=order.order_date,
+                    ))
+                payments.append(Payment(
+                    order_id=order.pk,
+                    payment_method=rng.choice(PAYMENT_METHODS),
+                    amount=order.total_amount,
+                    payment_status="completed" if order.order_status == "delivered" else "pending",
+                    payment_date=order.order_date,
+                    created_at=order.order_date,
+                    updated_at=order.order_date,
+                ))
+                if order.order_status == "delivered" and rng.random() < REVIEW_RATE:
+                    reviews.append(Review(
+                        user_id=order.user_id,
+                        customer_id=order.user_id,
+                        restaurant_id=restaurants[index][0],
+                        menu_item_id=basket[0][0],
+                        delivery_person_id=order.delivery_person_id,
+                        rating=Decimal(rng.choice((3, 4, 4, 5, 5, 5, 2, 1))),
+                        comment="Generated review.",
+                        # Reviewed around the estimated delivery time
+                        created_at=order.delivery_date,
+                        updated_at=order.delivery_date,
+                    ))
+            OrderItem.objects.bulk_create(items)
+            Payment.objects.bulk_create(payments)
+            Review.objects.bulk_create(reviews)
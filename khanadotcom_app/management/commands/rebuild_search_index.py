@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from khanadotcom_app import search
+
+
+class Command(BaseCommand):
+    help = "Rebuild the full-text search index of restaurants and menu items."
+
+    def handle(self, *args, **options):
+        if not search.search_available():
+            raise CommandError("Full-text search requires the SQLite database backend.")
+        with transaction.atomic():
+            count = search.rebuild_index()
+        self.stdout.write(self.style.SUCCESS(f"Indexed {count} documents."))
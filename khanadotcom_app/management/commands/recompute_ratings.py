@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from khanadotcom_app import ratings
+
+
+class Command(BaseCommand):
+    help = "Recompute rating counters and averages from all reviews."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--chunk-size", type=int, default=2000)
+
+    def handle(self, *args, **options):
+        updated = ratings.recompute_all(chunk_size=options["chunk_size"])
+        for model_name, count in updated.items():
+            self.stdout.write(f"{model_name}: {count} rated rows")
+        self.stdout.write(self.style.SUCCESS("Ratings recomputed."))
@@ -0,0 +1,222 @@
+import json
+import os
+import sqlite3
+import statistics
+import tempfile
+import time
+from contextlib import ExitStack, contextmanager
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, override_settings
+
+from khanadotcom_app.models import MenuItem, Order, Restaurant, User
+
+HOST = "testserver"
+DEFAULT_BASELINE = os.path.join(settings.BASE_DIR, "benchmarks", "baseline.json")
+
+# Wall time only counts as a regression above both limits; query counts are
+# deterministic and compared exactly.
+TIME_TOLERANCE = 0.5
+TIME_NOISE_MS = 5.0
+
+
+@contextmanager
+def capture_queries():
+    """{alias: CaptureQueriesContext} for every database connection."""
+    with ExitStack() as stack:
+        yield {
+            alias: stack.enter_context(CaptureQueriesContext(connections[alias]))
+            for alias in connections
+        }
+
+
+@contextmanager
+def database_copy():
+    """
+    Point every connection at a copy of the default database until exit.
+    The copy is taken with SQLite's backup API, so it is consistent even
+    while the database is taking writes, and is thrown away afterwards:
+    nothing the benchmark writes reaches the real database.
+    """
+    source = connections["default"]
+    if source.vendor != "sqlite":
+        raise CommandError("Benchmarks run on a copy of an SQLite database only.")
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "benchmark.sqlite3")
+        source.ensure_connection()
+        copy = sqlite3.connect(path)
+        try:
+            source.connection.backup(copy)
+        finally:
+            copy.close()
+        names = {}
+        for alias in connections:
+            connection = connections[alias]
+            connection.close()
+            names[alias] = connection.settings_dict["NAME"]
+            read_only = "mode=ro" in str(names[alias])
+            connection.settings_dict["NAME"] = f"file:{path}?mode=ro" if read_only else path
+        try:
+            yield
+        finally:
+            for alias, name in names.items():
+                connections[alias].close()
+                connections[alias].settings_dict["NAME"] = name
+
+
+def endpoints(restaurant_id, menu_item_id):
+    """(name, client, method, url, data) for every benchmarked request."""
+    order_form = {
+        "items": [str(menu_item_id)],
+        f"quantity_{menu_item_id}": "2",
+        "delivery_address": "12, Koramangala, Bengaluru",
+    }
+    return [
+        ("restaurant_list", "customer", "get", "/restaurants/", None),
+        ("restaurant_list_by_rating", "customer", "get", "/restaurants/?sort=rating", None),
+        ("restaurant_detail", "customer", "get", f"/restaurants/{restaurant_id}/", None),
+        ("menu_items", "customer", "get", f"/restaurants/{restaurant_id}/menu/", None),
+        ("order_placement_form", "customer", "get", f"/restaurants/{restaurant_id}/order/", None),
+        ("order_placement_submit", "customer", "post", f"/restaurants/{restaurant_id}/order/", order_form),
+        ("order_history", "customer", "get", "/order/history/", None),
+        ("search", "customer", "get", "/search/?q=biryani", None),
+        ("admin_restaurants", "staff", "get", "/admin/khanadotcom_app/restaurant/", None),
+        ("admin_menu_items", "staff", "get", "/admin/khanadotcom_app/menuitem/", None),
+        ("admin_orders", "staff", "get", "/admin/khanadotcom_app/order/", None),
+        ("admin_order_items", "staff", "get", "/admin/khanadotcom_app/orderitem/", None),
+        ("admin_payments", "staff", "get", "/admin/khanadotcom_app/payment/", None),
+        ("admin_reviews", "staff", "get", "/admin/khanadotcom_app/review/", None),
+    ]
+
+
+class Command(BaseCommand):
+    help = (
+        "Drive the main views through the test client and record SQL queries "
+        "and wall time per endpoint, compared against a baseline file. Requests "
+        "run on a throwaway copy of the database, outside a transaction as in "
+        "production, so browse reads go to the read replica. The committed "
+        "baseline was recorded on 'generate_data --scale 0.002'; re-record it "
+        "only with the change that moves the numbers."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--repeat", type=int, default=5, help="Timed runs per endpoint.")
+        parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+        parser.add_argument(
+            "--save-baseline", action="store_true",
+            help="Write the results as the new baseline instead of comparing.",
+        )
+        parser.add_argument("--only", nargs="*", help="Endpoint names to run.")
+
+    def handle(self, *args, **options):
+        target = (
+            MenuItem.objects.filter(availability=True, restaurant__is_deleted=False)
+            .order_by("pk")
+            .values_list("restaurant_id", "pk")
+            .first()
+        )
+        customer_id = Order.objects.order_by("-pk").values_list("user_id", flat=True).first()
+        if target is None or customer_id is None:
+            raise CommandError(
+                "Need at least one restaurant with a menu and one order; run generate_data first."
+            )
+
+        with database_copy():
+            results = self._run(target, customer_id, options)
+        report = {
+            "dataset": {
+                "restaurants": Restaurant.objects.count(),
+                "menu_items": MenuItem.objects.count(),
+                "orders": Order.objects.count(),
+            },
+            "endpoints": results,
+        }
+        if options["save_baseline"]:
+            os.makedirs(os.path.dirname(options["baseline"]), exist_ok=True)
+            with open(options["baseline"], "w") as f:
+                json.dump(report, f, indent=2, sort_keys=True)
+                f.write("\n")
+            self._print(results, {})
+            self.stdout.write(f"Baseline written to {options['baseline']}.")
+            return
+
+        baseline = {}
+        if os.path.exists(options["baseline"]):
+            with open(options["baseline"]) as f:
+                baseline = json.load(f)
+            if baseline.get("dataset") != report["dataset"]:
+                self.stdout.write(self.style.WARNING(
+                    f"Baseline dataset {baseline.get('dataset')} differs from "
+                    f"{report['dataset']}; timings are not comparable."
+                ))
+        regressions = self._print(results, baseline.get("endpoints", {}))
+        if regressions:
+            raise CommandError(f"Regressions: {', '.join(regressions)}")
+
+    def _run(self, target, customer_id, options):
+        clients = {"customer": Client(), "staff": Client()}
+        with override_settings(ALLOWED_HOSTS=[HOST]):
+            clients["customer"].force_login(User.objects.get(pk=customer_id))
+            clients["staff"].force_login(User.objects.create(
+                email="benchmark-staff@example.test", username="benchmark-staff",
+                name="Benchmark", user_type="customer", is_active=True,
+                is_staff=True, is_superuser=True,
+            ))
+            results = {}
+            for name, who, method, url, data in endpoints(*target):
+                if options["only"] and name not in options["only"]:
+                    continue
+                results[name] = self._measure(
+                    clients[who], method, url, data, options["repeat"]
+                )
+        return results
+
+    def _measure(self, client, method, url, data, repeat):
+        request = getattr(client, method)
+        response = request(url, data)  # warm caches and connections
+        if response.status_code >= 400:
+            raise CommandError(f"{method.upper()} {url} returned {response.status_code}")
+        timings = []
+        for _ in range(repeat):
+            with capture_queries() as queries:
+                started = time.perf_counter()
+                response = request(url, data)
+                timings.append((time.perf_counter() - started) * 1000)
+        replica_queries = sum(
+            len(captured) for alias, captured in queries.items() if alias != "default"
+        )
+        return {
+            "status": response.status_code,
+            "queries": sum(len(captured) for captured in queries.values()),
+            "replica_queries": replica_queries,
+            "median_ms": round(statistics.median(timings), 2),
+            "max_ms": round(max(timings), 2),
+        }
+
+    def _print(self, results, baseline):
+        regressions = []
+        self.stdout.write(
+            f"{'endpoint':<26} {'queries':>8} {'replica':>8} {'median ms':>10} {'max ms':>9}"
+            "  vs baseline"
+        )
+        for name, result in results.items():
+            before = baseline.get(name)
+            note = ""
+            if before:
+                slower = (
+                    result["median_ms"] > before["median_ms"] * (1 + TIME_TOLERANCE)
+                    and result["median_ms"] - before["median_ms"] > TIME_NOISE_MS
+                )
+                note = f"{before['queries']:>4} q {before['median_ms']:>8.2f} ms"
+                if result["queries"] > before["queries"] or slower:
+                    regressions.append(name)
+                    note = self.style.ERROR(note + "  REGRESSION")
+            self.stdout.write(
+                f"{name:<26} {result['queries']:>8} {result['replica_queries']:>8} "
+                f"{result['median_ms']:>10.2f} "
+                f"{result['max_ms']:>9.2f}  {note}"
+            )
+        return regressions
@@ -0,0 +1,28 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from khanadotcom_app import notifications
+from khanadotcom_app.models import User
+
+
+class Command(BaseCommand):
+    help = "Send a promotional notification to every active user of a type."
+
+    def add_arguments(self, parser):
+        parser.add_argument("message")
+        parser.add_argument(
+            "--user-type", default="customer", choices=[t for t, _ in User.USER_TYPES]
+        )
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        user_ids = (
+            User.objects.filter(user_type=options["user_type"], is_active=True)
+            .values_list("pk", flat=True)
+            .iterator(chunk_size=notifications.BATCH_SIZE)
+        )
+        sent = notifications.broadcast(user_ids, options["message"])
+        self.stdout.write(
+            self.style.SUCCESS(f"Sent {sent} notifications in {time.monotonic() - started:.1f}s.")
+        )
@@ -0,0 +1,28 @@
+import logging
+
+from django.core.management.base import BaseCommand
+
+from khanadotcom_app import outbox
+
+
+class Command(BaseCommand):
+    help = "Deliver queued outbound email in batches."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=50)
+        parser.add_argument("--poll-interval", type=float, default=2.0)
+        parser.add_argument(
+            "--once", action="store_true", help="Send a single batch and exit."
+        )
+
+    def handle(self, *args, **options):
+        logging.basicConfig(level=logging.INFO, format="%(asctime)s %(message)s")
+        if options["once"]:
+            sent, failed = outbox.send_batch(options["batch_size"])
+            self.stdout.write(f"Sent {sent} emails, {failed} failed.")
+            return
+        self.stdout.write("Mail worker running, press CTRL-C to stop.")
+        try:
+            outbox.run(options["batch_size"], options["poll_interval"])
+        except KeyboardInterrupt:
+            pass
@@ -0,0 +1,90 @@
+from django.conf import settings
+from django.core.cache import caches
+
+from .cache_versions import aget_version, bump_version, get_version
+from .models import MenuItem, MenuItemCategory
+
+# Each restaurant's menu is cached under a key that embeds a version number.
+# Changing a MenuItem or MenuItemCategory bumps the version (see signals.py),
+# so stale entries are never read again and simply age out of the backend.
+
+
+def _cache():
+    return caches[getattr(settings, "MENU_CACHE_ALIAS", "default")]
+
+
+def _version_key(restaurant_id):
+    return f"menu:version:{restaurant_id}"
+
+
+def _menu_key(restaurant_id, version):
+    return f"menu:{restaurant_id}:v{version}"
+
+
+def get_menu_version(restaurant_id):
+    return get_version(_cache(), _version_key(restaurant_id))
+
+
+def bump_menu_version(restaurant_id):
+    """Invalidate the cached menu; returns the new version."""
+    return bump_version(_cache(), _version_key(restaurant_id))
+
+
+async def aget_menu_version(restaurant_id):
+    return await aget_version(_cache(), _version_key(restaurant_id))
+
+
+def _menu_queries(restaurant_id):
+    menu_items = MenuItem.objects.filter(restaurant_id=restaurant_id).order_by(
+        "menu_item_id"
+    )
+    links = MenuItemCategory.objects.filter(
+        menu_item__restaurant_id=restaurant_id
+    ).values_list("menu_item_id", "category__name")
+    return menu_items, links
+
+
+def _attach_categories(menu_items, links):
+    category_names = {}
+    for menu_item_id, name in links:
+        category_names.setdefault(menu_item_id, []).append(name)
+    for item in menu_items:
+        item.category_names = category_names.get(item.menu_item_id, [])
+    return menu_items
+
+
+def _load_menu(restaurant_id):
+    menu_items, links = _menu_queries(restaurant_id)
+    return _attach_categories(list(menu_items), list(links))
+
+
+async def _aload_menu(restaurant_id):
+    menu_items, links = _menu_queries(restaurant_id)
+    return _attach_categories(
+        [item async for item in menu_items], [link async for link in links]
+    )
+
+
+def get_menu(restaurant_id):
+    """Return every MenuItem of the restaurant, served from the cache."""
+    cache = _cache()
+    key = _menu_key(restaurant_id, get_menu_version(restaurant_id))
+    menu = cache.get(key)
+    if menu is None:
+        menu = _load_menu(restaurant_id)
+        cache.set(key, menu, timeout=getattr(settings, "MENU_CACHE_TIMEOUT", 3600))
+    return menu
+
+
+async def aget_menu(restaurant_id):
+    cache = _cache()
+    key = _menu_key(restaurant_id, await aget_menu_version(restaurant_id))
+    menu = await cache.aget(key)
+    if menu is None:
+        menu = await _aload_menu(restaurant_id)
+        await cache.aset(key, menu, timeout=getattr(settings, "MENU_CACHE_TIMEOUT", 3600))
+    return menu
+
+
+def get_available_menu(restaurant_id):
+    return [item for item in get_menu(restaurant_id) if item.availability]
@@ -0,0 +1,175 @@
+import gzip
+import hashlib
+import json
+from decimal import Decimal
+
+from asgiref.sync import sync_to_async
+from django.http import HttpResponse, HttpResponseNotModified
+from django.utils.cache import patch_cache_control, patch_vary_headers
+
+from .image_pipeline import image_urls
+from .menu_cache import _cache, aget_menu_version, get_menu, get_menu_version
+from .models import MenuItemCategory, Restaurant
+
+# Each restaurant's menu is also kept as ready-to-send gzipped JSON, stored in
+# the menu cache next to the menu itself. A snapshot records the menu version
+# it was built for: when a MenuItem or its categories change, signals.py bumps
+# the version and patches the one affected item into the snapshot. Any other
+# bump (category rename, a patch that lost a race) leaves the snapshot behind
+# the version, and the next request rebuilds it from the menu cache.
+#
+# The ETag is a hash of the JSON, so a client's cached copy stays valid across
+# rebuilds as long as the menu is unchanged, and a matching If-None-Match is
+# answered with a 304 from two cache reads.
+
+
+def _snapshot_key(restaurant_id):
+    return f"menu:snapshot:{restaurant_id}"
+
+
+def _price(value):
+    return str(Decimal(str(value)).quantize(Decimal("0.01")))
+
+
+def item_entry(item, category_names=None):
+    """The JSON form of a MenuItem. ``category_names=None`` keeps the
+    categories the snapshot already has for the item when patching."""
+    return {
+        "id": item.menu_item_id,
+        "name": item.name,
+        "description": item.description,
+        "price": _price(item.price),
+        "available": item.availability,
+        "preparation_time": item.preparation_time,
+        "categories": category_names,
+        "image": image_urls(item, "menu_item_pic"),
+    }
+
+
+def _encode(data, version):
+    body = json.dumps(data, separators=(",", ":"), sort_keys=True).encode()
+    return {
+        "version": version,
+        "etag": '"%s"' % hashlib.sha1(body).hexdigest()[:20],
+        "body": gzip.compress(body, mtime=0),
+    }
+
+
+def _decode(snapshot):
+    return json.loads(gzip.decompress(snapshot["body"]))
+
+
+def build_snapshot(restaurant_id):
+    """Build and store the snapshot; None if the restaurant does not exist."""
+    # Read the version first: a change made while building leaves the
+    # snapshot behind the current version, so it is rebuilt again.
+    version = get_menu_version(restaurant_id)
+    restaurant = (
+        Restaurant.objects.filter(pk=restaurant_id).values("restaurant_id", "name").first()
+    )
+    if restaurant is None:
+        return None
+    data = {
+        "restaurant": {"id": restaurant["restaurant_id"], "name": restaurant["name"]},
+        "items": [item_entry(item, item.category_names) for item in get_menu(restaurant_id)],
+    }
+    snapshot = _encode(data, version)
+    _cache().set(_snapshot_key(restaurant_id), snapshot, timeout=None)
+    return snapshot
+
+
+def get_snapshot(restaurant_id):
+    snapshot = _cache().get(_snapshot_key(restaurant_id))
+    if snapshot is not None and snapshot["version"] == get_menu_version(restaurant_id):
+        return snapshot
+    return build_snapshot(restaurant_id)
+
+
+async def aget_snapshot(restaurant_id):
+    snapshot = await _cache().aget(_snapshot_key(restaurant_id))
+    if snapshot is not None and snapshot["version"] == await aget_menu_version(restaurant_id):
+        return snapshot
+    return await sync_to_async(build_snapshot)(restaurant_id)
+
+
+# Incremental updates, run on commit with the version the change bumped to.
+
+
+def _patch(restaurant_id, version, change):
+    cache = _cache()
+    key = _snapshot_key(restaurant_id)
+    snapshot = cache.get(key)
+    if snapshot is None:
+        return
+    if snapshot["version"] != version - 1:
+        # Another change got in between; rebuild on the next read.
+        cache.delete(key)
+        return
+    data = _decode(snapshot)
+    data["items"] = change(data["items"])
+    cache.set(key, _encode(data, version), timeout=None)
+
+
+def upsert_item(restaurant_id, version, entry):
+    def change(items):
+        previous = next((item for item in items if item["id"] == entry["id"]), None)
+        if entry["categories"] is None:
+            entry["categories"] = previous["categories"] if previous else []
+        items = [item for item in items if item["id"] != entry["id"]]
+        items.append(entry)
+        return sorted(items, key=lambda item: item["id"])
+
+    _patch(restaurant_id, version, change)
+
+
+def remove_item(restaurant_id, version, menu_item_id):
+    _patch(
+        restaurant_id,
+        version,
+        lambda items: [item for item in items if item["id"] != menu_item_id],
+    )
+
+
+def refresh_item_categories(restaurant_id, version, menu_item_id):
+    names = list(
+        MenuItemCategory.objects.filter(menu_item_id=menu_item_id).values_list(
+            "category__name", flat=True
+        )
+    )
+
+    def change(items):
+        for item in items:
+            if item["id"] == menu_item_id:
+                item["categories"] = names
+        return items
+
+    _patch(restaurant_id, version, change)
+
+
+def invalidate(restaurant_id):
+    _cache().delete(_snapshot_key(restaurant_id))
+
+
+def _etag_matches(request, etag):
+    header = request.headers.get("If-None-Match")
+    if not header:
+        return False
+    tags = [tag.strip().removeprefix("W/") for tag in header.split(",")]
+    return "*" in tags or etag in tags
+
+
+def snapshot_response(request, snapshot):
+    if _etag_matches(request, snapshot["etag"]):
+        response = HttpResponseNotModified()
+    elif "gzip" in request.headers.get("Accept-Encoding", ""):
+        response = HttpResponse(snapshot["body"], content_type="application/json")
+        response["Content-Encoding"] = "gzip"
+    else:
+        response = HttpResponse(
+            gzip.decompress(snapshot["body"]), content_type="application/json"
+        )
+    response["ETag"] = snapshot["etag"]
+    # Clients may keep the menu but must revalidate it on every use.
+    patch_cache_control(response, no_cache=True)
+    patch_vary_headers(response, ["Accept-Encoding"])
+    return response
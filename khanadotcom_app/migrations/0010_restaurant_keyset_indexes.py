@@ -0,0 +1,21 @@
+# Generated by Django 5.2.18 on 2026-10-18 04:19
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('khanadotcom_app', '0009_orderitem_availability'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='restaurant',
+            index=models.Index(condition=models.Q(('is_deleted', False)), fields=['restaurant_id'], name='restaurant_live_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='restaurant',
+            index=models.Index(condition=models.Q(('is_deleted', False)), fields=['-rating', '-restaurant_id'], name='restaurant_live_rating_idx'),
+        ),
+    ]
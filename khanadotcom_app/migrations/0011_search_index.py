@@ -0,0 +1,38 @@
+from django.db import migrations
+
+
+def create_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != "sqlite":
+        return
+    schema_editor.execute(
+        """
+        CREATE VIRTUAL TABLE IF NOT EXISTS search_index USING fts5(
+            kind UNINDEXED,
+            object_id UNINDEXED,
+            restaurant_id UNINDEXED,
+            name,
+            description,
+            address,
+            keywords,
+            tokenize = 'unicode61 remove_diacritics 2'
+        )
+        """
+    )
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != "sqlite":
+        return
+    schema_editor.execute("DROP TABLE IF EXISTS search_index")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('khanadotcom_app', '0010_restaurant_keyset_indexes'),
+    ]
+
+    operations = [
+        # Populate with: python manage.py rebuild_search_index
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
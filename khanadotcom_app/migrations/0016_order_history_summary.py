@@ -0,0 +1,50 @@
+# Generated by Django 5.2.18 on 2026-10-18 04:28
+
+from django.db import migrations, models
+from django.db.models import Min, Sum
+
+
+def backfill_order_summary(apps, schema_editor):
+    Order = apps.get_model('khanadotcom_app', 'Order')
+    OrderItem = apps.get_model('khanadotcom_app', 'OrderItem')
+    summaries = (
+        OrderItem.objects.values('order_id')
+        .annotate(item_count=Sum('quantity'), restaurant_name=Min('menu_item__restaurant__name'))
+        .order_by('order_id')
+    )
+    batch = []
+    for row in summaries.iterator(chunk_size=2000):
+        batch.append(Order(
+            order_id=row['order_id'],
+            item_count=row['item_count'],
+            restaurant_name=row['restaurant_name'] or '',
+        ))
+        if len(batch) >= 2000:
+            Order.objects.bulk_update(batch, ['item_count', 'restaurant_name'])
+            batch = []
+    Order.objects.bulk_update(batch, ['item_count', 'restaurant_name'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('khanadotcom_app', '0015_outbound_email'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='order',
+            name='item_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='order',
+            name='restaurant_name',
+            field=models.CharField(blank=True, max_length=500),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['user', '-order_date', '-order_id'], name='order_user_history_idx'),
+        ),
+        migrations.RunPython(backfill_order_summary, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,59 @@
+# Generated by Django 5.2.18 on 2026-10-18 04:41
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def create_usage_counters(apps, schema_editor):
+    # Unlimited shards for existing coupons; saving a coupon with max_uses
+    # spreads the limit over them.
+    Coupon = apps.get_model('khanadotcom_app', 'Coupon')
+    CouponUsageCounter = apps.get_model('khanadotcom_app', 'CouponUsageCounter')
+    shards = getattr(settings, 'COUPON_COUNTER_SHARDS', 8)
+    CouponUsageCounter.objects.bulk_create([
+        CouponUsageCounter(coupon_id=coupon_id, shard=shard)
+        for coupon_id in Coupon.objects.values_list('coupon_id', flat=True)
+        for shard in range(shards)
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('khanadotcom_app', '0017_image_variants'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='coupon',
+            name='max_uses',
+            field=models.PositiveIntegerField(blank=True, help_text='Leave empty for unlimited use', null=True),
+        ),
+        migrations.AddField(
+            model_name='order',
+            name='coupon',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='khanadotcom_app.coupon'),
+        ),
+        migrations.AddField(
+            model_name='order',
+            name='discount_amount',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=10),
+        ),
+        migrations.CreateModel(
+            name='CouponUsageCounter',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('shard', models.PositiveSmallIntegerField()),
+                ('used', models.PositiveIntegerField(default=0)),
+                ('limit', models.PositiveIntegerField(blank=True, null=True)),
+                ('coupon', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='usage_counters', to='khanadotcom_app.coupon')),
+            ],
+            options={
+                'db_table': 'coupon_usage_counter',
+                'managed': True,
+                'constraints': [models.UniqueConstraint(fields=('coupon', 'shard'), name='coupon_usage_counter_shard_uniq')],
+            },
+        ),
+        migrations.RunPython(create_usage_counters, migrations.RunPython.noop),
+    ]
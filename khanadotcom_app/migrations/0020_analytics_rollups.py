@@ -0,0 +1,47 @@
+# Generated by Django 5.2.18 on 2026-10-18 04:56
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('khanadotcom_app', '0019_notifications'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MenuItemDailyStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('quantity', models.PositiveIntegerField(default=0)),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('menu_item', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_stats', to='khanadotcom_app.menuitem')),
+                ('restaurant', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='menu_item_daily_stats', to='khanadotcom_app.restaurant')),
+            ],
+            options={
+                'db_table': 'menu_item_daily_stats',
+                'managed': True,
+                'indexes': [models.Index(fields=['restaurant', 'day'], name='menu_item_stats_restaurant_idx')],
+                'constraints': [models.UniqueConstraint(fields=('menu_item', 'day'), name='menu_item_daily_stats_uniq')],
+            },
+        ),
+        migrations.CreateModel(
+            name='RestaurantDailyStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('orders', models.PositiveIntegerField(default=0)),
+                ('items_sold', models.PositiveIntegerField(default=0)),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('restaurant', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_stats', to='khanadotcom_app.restaurant')),
+            ],
+            options={
+                'db_table': 'restaurant_daily_stats',
+                'managed': True,
+                'constraints': [models.UniqueConstraint(fields=('restaurant', 'day'), name='restaurant_daily_stats_uniq')],
+            },
+        ),
+    ]
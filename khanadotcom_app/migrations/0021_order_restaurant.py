@@ -0,0 +1,46 @@
+# Generated by Django 5.2.18 on 2026-10-18 04:59
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Min
+
+
+def backfill_order_restaurant(apps, schema_editor):
+    Order = apps.get_model('khanadotcom_app', 'Order')
+    OrderItem = apps.get_model('khanadotcom_app', 'OrderItem')
+    restaurants = (
+        OrderItem.objects.values('order_id')
+        .annotate(restaurant_id=Min('menu_item__restaurant_id'))
+        .order_by('order_id')
+    )
+    batch = []
+    for row in restaurants.iterator(chunk_size=2000):
+        batch.append(Order(order_id=row['order_id'], restaurant_id=row['restaurant_id']))
+        if len(batch) >= 2000:
+            Order.objects.bulk_update(batch, ['restaurant'])
+            batch = []
+    Order.objects.bulk_update(batch, ['restaurant'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('khanadotcom_app', '0020_analytics_rollups'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='order',
+            name='restaurant',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='orders', to='khanadotcom_app.restaurant'),
+        ),
+        migrations.RunPython(backfill_order_restaurant, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['restaurant', 'order_status', 'created_at'], name='order_kitchen_queue_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['restaurant', 'updated_at', 'order_id'], name='order_kitchen_changes_idx'),
+        ),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 5.2.18 on 2026-10-18 05:04
+
+from django.db import migrations, models
+from django.db.models import Max
+
+
+def backfill_preparation_minutes(apps, schema_editor):
+    # Only orders still in a kitchen count towards eta.py's queues.
+    Order = apps.get_model('khanadotcom_app', 'Order')
+    queued = Order.objects.filter(order_status__in=['pending', 'confirmed', 'preparing'])
+    batch = []
+    for order in queued.annotate(longest=Max('orderitem__menu_item__preparation_time')).only('order_id').iterator(chunk_size=2000):
+        order.preparation_minutes = order.longest or 15
+        batch.append(order)
+        if len(batch) >= 2000:
+            Order.objects.bulk_update(batch, ['preparation_minutes'])
+            batch = []
+    Order.objects.bulk_update(batch, ['preparation_minutes'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('khanadotcom_app', '0021_order_restaurant'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='order',
+            name='estimated_ready_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='order',
+            name='preparation_minutes',
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_preparation_minutes, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(condition=models.Q(('order_status__in', ['pending', 'confirmed', 'preparing'])), fields=['restaurant', 'created_at'], name='order_queued_idx'),
+        ),
+    ]
@@ -0,0 +1,21 @@
+from django.db import migrations
+
+
+def clear_owner_keywords(apps, schema_editor):
+    # Restaurant documents used to carry the owner's name and email.
+    if schema_editor.connection.vendor != "sqlite":
+        return
+    schema_editor.execute(
+        "UPDATE search_index SET keywords = '' WHERE kind = 'restaurant'"
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('khanadotcom_app', '0023_shared_cache_table'),
+    ]
+
+    operations = [
+        migrations.RunPython(clear_owner_keywords, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,23 @@
+from django.db import migrations
+
+
+def delete_cached_auth(apps, schema_editor):
+    # User snapshots (with password hashes) and cached sessions left in the
+    # shared cache table; sessions are still in django_session.
+    if 'shared_cache' not in schema_editor.connection.introspection.table_names():
+        return
+    schema_editor.execute(
+        "DELETE FROM shared_cache WHERE cache_key LIKE %s OR cache_key LIKE %s",
+        [':1:user:%', ':1:django.contrib.sessions.cached_db%'],
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('khanadotcom_app', '0024_search_index_owner_keywords'),
+    ]
+
+    operations = [
+        migrations.RunPython(delete_cached_auth, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,33 @@
+from django.db import migrations
+from django.db.models import Count
+
+
+def backfill_counters(apps, schema_editor):
+    # Unread notifications from before the counters existed; recounting
+    # also covers the ones created since.
+    Notification = apps.get_model('khanadotcom_app', 'Notification')
+    NotificationCounter = apps.get_model('khanadotcom_app', 'NotificationCounter')
+    db = schema_editor.connection.alias
+    unread = (
+        Notification.objects.using(db)
+        .filter(is_read=False)
+        .values_list('user_id')
+        .annotate(count=Count('pk'))
+        .order_by()
+    )
+    NotificationCounter.objects.using(db).all().delete()
+    NotificationCounter.objects.using(db).bulk_create(
+        (NotificationCounter(user_id=user_id, unread=count) for user_id, count in unread.iterator()),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('khanadotcom_app', '0025_drop_user_snapshots'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_counters, migrations.RunPython.noop),
+    ]
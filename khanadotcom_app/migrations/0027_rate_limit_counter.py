@@ -0,0 +1,34 @@
+# Generated by Django 5.2.18 on 2026-10-18 06:30
+
+from django.db import migrations, models
+
+
+def delete_cached_counters(apps, schema_editor):
+    # Counters kept in the shared cache before they moved to their own table.
+    if 'shared_cache' not in schema_editor.connection.introspection.table_names():
+        return
+    schema_editor.execute("DELETE FROM shared_cache WHERE cache_key LIKE %s", [':1:rl:%'])
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('khanadotcom_app', '0026_backfill_notification_counters'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RateLimitCounter',
+            fields=[
+                ('key', models.CharField(max_length=32, primary_key=True, serialize=False)),
+                ('window', models.BigIntegerField()),
+                ('hits', models.PositiveIntegerField(default=0)),
+                ('previous', models.PositiveIntegerField(default=0)),
+                ('expires', models.BigIntegerField(db_index=True)),
+            ],
+            options={
+                'db_table': 'rate_limit_counter',
+                'managed': True,
+            },
+        ),
+        migrations.RunPython(delete_cached_counters, migrations.RunPython.noop),
+    ]
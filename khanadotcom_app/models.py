@@ -37,6 +37,7 @@ class User(AbstractUser):
     updated_at = models.DateTimeField(auto_now=True)
     is_deleted = models.BooleanField(default=False)
     profile_picture = models.ImageField(upload_to="profile_pictures/", null=True, blank=True)
+    profile_picture_variants = models.JSONField(default=dict, blank=True, editable=False)
     is_staff = models.BooleanField(default=False)
     is_active = models.BooleanField(default=False)
     is_superuser = models.BooleanField(default=False)
@@ -77,9 +78,14 @@ class Restaurant(models.Model):
     phone_number = models.CharField(max_length=15)
     email = models.EmailField()
     profile_pic = models.ImageField(upload_to="profile_pictures/", null=True, blank=True)
+    profile_pic_variants = models.JSONField(default=dict, blank=True, editable=False)
     description = models.TextField(blank=True, null=True)
     rating = models.DecimalField(max_digits=3, decimal_places=2, blank=True, null=True)
+    rating_count = models.PositiveIntegerField(default=0, editable=False)
+    rating_sum = models.DecimalField(max_digits=12, decimal_places=2, default=0, editable=False)
     restaurant_GST = models.CharField(max_length=100, null=True, blank=True)
+    latitude = models.DecimalField(max_digits=9, decimal_places=6, blank=True, null=True)
+    longitude = models.DecimalField(max_digits=9, decimal_places=6, blank=True, null=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     is_deleted = models.BooleanField(default=False)
@@ -90,6 +96,19 @@ class Restaurant(models.Model):
     class Meta:
         managed = True
         db_table = 'restaurant_details'
+        indexes = [
+            # Partial indexes over live rows back the keyset-paginated listing
+            models.Index(
+                fields=['restaurant_id'],
+                condition=models.Q(is_deleted=False),
+                name='restaurant_live_id_idx',
+            ),
+            models.Index(
+                fields=['-rating', '-restaurant_id'],
+                condition=models.Q(is_deleted=False),
+                name='restaurant_live_rating_idx',
+            ),
+        ]
 
 
 
@@ -98,7 +117,11 @@ class DeliveryPerson(models.Model):
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
     vehicle_details = models.CharField(max_length=255, blank=True, null=True)
     availability_status = models.BooleanField(default=True)
+    latitude = models.DecimalField(max_digits=9, decimal_places=6, blank=True, null=True)
+    longitude = models.DecimalField(max_digits=9, decimal_places=6, blank=True, null=True)
     rating = models.DecimalField(max_digits=3, decimal_places=2, blank=True, null=True)
+    rating_count = models.PositiveIntegerField(default=0, editable=False)
+    rating_sum = models.DecimalField(max_digits=12, decimal_places=2, default=0, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
@@ -116,10 +139,13 @@ class MenuItem(models.Model):
     description = models.TextField(blank=True, null=True)
     price = models.DecimalField(max_digits=10, decimal_places=2)
     menu_item_pic = models.ImageField(upload_to="menu_items/", null=True, blank=True)
+    menu_item_pic_variants = models.JSONField(default=dict, blank=True, editable=False)
     availability = models.BooleanField(default=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     rating = models.DecimalField(max_digits=3, decimal_places=2, blank=True, null=True)
+    rating_count = models.PositiveIntegerField(default=0, editable=False)
+    rating_sum = models.DecimalField(max_digits=12, decimal_places=2, default=0, editable=False)
     preparation_time = models.IntegerField(help_text='Preparation time in minutes', blank=True, null=True)
 
     def __str__(self):
@@ -142,11 +168,22 @@ class Order(models.Model):
 
     order_id = models.AutoField(primary_key=True)
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, default=1)
+    restaurant = models.ForeignKey(Restaurant, on_delete=models.SET_NULL, blank=True, null=True, related_name='orders')
     total_amount = models.DecimalField(max_digits=10, decimal_places=2)
     order_status = models.CharField(max_length=20, choices=ORDER_STATUS_CHOICES, default='pending')
     delivery_address = models.TextField()
+    delivery_person = models.ForeignKey(DeliveryPerson, on_delete=models.SET_NULL, blank=True, null=True)
+    # Stored at checkout so order lists never need to look at the items
+    item_count = models.PositiveIntegerField(default=0)
+    restaurant_name = models.CharField(max_length=500, blank=True)
+    coupon = models.ForeignKey('Coupon', on_delete=models.SET_NULL, blank=True, null=True)
+    discount_amount = models.DecimalField(max_digits=10, decimal_places=2, default=0)
     order_date = models.DateTimeField(auto_now_add=True)
+    # Estimates made at checkout (eta.py). delivery_date is the expected
+    # delivery time, not when the order arrived: nothing records that.
     delivery_date = models.DateTimeField(blank=True, null=True)
+    estimated_ready_at = models.DateTimeField(blank=True, null=True)
+    preparation_minutes = models.PositiveSmallIntegerField(default=0)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
@@ -156,7 +193,35 @@ class Order(models.Model):
     class Meta:
         managed = True
         db_table = 'order'
+        indexes = [
+            models.Index(fields=['user', '-order_date', '-order_id'], name='order_user_history_idx'),
+            # Kitchen queue (kitchen.py): open orders oldest first, and the
+            # changes since a cursor
+            models.Index(fields=['restaurant', 'order_status', 'created_at'], name='order_kitchen_queue_idx'),
+            models.Index(fields=['restaurant', 'updated_at', 'order_id'], name='order_kitchen_changes_idx'),
+            # Orders still in a kitchen, for eta.py; small because orders
+            # leave it as they move on.
+            models.Index(
+                fields=['restaurant', 'created_at'],
+                condition=models.Q(order_status__in=['pending', 'confirmed', 'preparing']),
+                name='order_queued_idx',
+            ),
+        ]
+
+
+
+class OrderStatusLog(models.Model):
+    order = models.ForeignKey(Order, on_delete=models.CASCADE, related_name='status_log')
+    from_status = models.CharField(max_length=20, choices=Order.ORDER_STATUS_CHOICES)
+    to_status = models.CharField(max_length=20, choices=Order.ORDER_STATUS_CHOICES)
+    changed_at = models.DateTimeField(auto_now_add=True)
 
+    def __str__(self):
+        return f"Order {self.order_id}: {self.from_status} -> {self.to_status}"
+
+    class Meta:
+        managed = True
+        db_table = 'order_status_log'
 
         
 class OrderItem(models.Model):
@@ -210,6 +275,7 @@ class Review(models.Model):
     restaurant = models.ForeignKey(Restaurant, on_delete=models.CASCADE, blank=True, null=True)
     customer = models.ForeignKey(CustomerDetail, on_delete=models.CASCADE, related_name='reviews')
     delivery_person = models.ForeignKey(DeliveryPerson, on_delete=models.CASCADE, blank=True, null=True)
+    menu_item = models.ForeignKey(MenuItem, on_delete=models.CASCADE, blank=True, null=True)
     rating = models.DecimalField(max_digits=3, decimal_places=2)
     comment = models.TextField(blank=True, null=True)
     created_at = models.DateTimeField(auto_now_add=True)
@@ -264,6 +330,27 @@ class Notification(models.Model):
     class Meta:
         managed = True
         db_table = 'notification'
+        indexes = [
+            # Only unread rows: small however many notifications pile up
+            models.Index(
+                fields=['user', '-created_at'],
+                name='notification_unread_idx',
+                condition=models.Q(is_read=False),
+            ),
+        ]
+
+
+class NotificationCounter(models.Model):
+    # Unread notifications per user, maintained by notifications.py
+    user = models.OneToOneField(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, primary_key=True)
+    unread = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.unread} unread for user {self.user_id}"
+
+    class Meta:
+        managed = True
+        db_table = 'notification_counter'
 
 class Coupon(models.Model):
     coupon_id = models.AutoField(primary_key=True)
@@ -274,6 +361,7 @@ class Coupon(models.Model):
     valid_from = models.DateTimeField()
     valid_to = models.DateTimeField()
     active = models.BooleanField(default=True)
+    max_uses = models.PositiveIntegerField(blank=True, null=True, help_text='Leave empty for unlimited use')
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
@@ -282,4 +370,120 @@ class Coupon(models.Model):
 
     class Meta:
         managed = True
-        db_table = 'coupon'
\ No newline at end of file
+        db_table = 'coupon'
+
+
+class CouponUsageCounter(models.Model):
+    # Redemptions of a coupon are counted over several rows so concurrent
+    # checkouts with the same code do not all update one row. Each shard gets
+    # an equal part of max_uses as its limit (see coupons.py).
+    coupon = models.ForeignKey(Coupon, on_delete=models.CASCADE, related_name='usage_counters')
+    shard = models.PositiveSmallIntegerField()
+    used = models.PositiveIntegerField(default=0)
+    limit = models.PositiveIntegerField(blank=True, null=True)
+
+    def __str__(self):
+        return f"{self.coupon.code} #{self.shard}: {self.used}"
+
+    class Meta:
+        managed = True
+        db_table = 'coupon_usage_counter'
+        constraints = [
+            models.UniqueConstraint(fields=['coupon', 'shard'], name='coupon_usage_counter_shard_uniq'),
+        ]
+
+
+class OutboundEmail(models.Model):
+    STATUS_CHOICES = (
+        ('queued', 'Queued'),
+        ('sending', 'Sending'),
+        ('sent', 'Sent'),
+        ('dead', 'Dead'),
+    )
+
+    outbound_email_id = models.AutoField(primary_key=True)
+    subject = models.CharField(max_length=998)
+    body = models.TextField()
+    from_email = models.CharField(max_length=254, blank=True)
+    recipients = models.JSONField(default=dict)
+    alternatives = models.JSONField(default=list, blank=True)
+    headers = models.JSONField(default=dict, blank=True)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='queued')
+    attempts = models.PositiveSmallIntegerField(default=0)
+    next_attempt_at = models.DateTimeField()
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(blank=True, null=True)
+
+    def __str__(self):
+        return f"{self.subject} ({self.status})"
+
+    class Meta:
+        managed = True
+        db_table = 'outbound_email'
+        indexes = [
+            models.Index(fields=['status', 'next_attempt_at'], name='outbound_email_due_idx'),
+        ]
+
+
+class RestaurantDailyStats(models.Model):
+    # Delivered orders per restaurant and order day, maintained by
+    # analytics.py. Revenue is the restaurant's share of the items, before
+    # coupon discounts.
+    restaurant = models.ForeignKey(Restaurant, on_delete=models.CASCADE, related_name='daily_stats')
+    day = models.DateField()
+    orders = models.PositiveIntegerField(default=0)
+    items_sold = models.PositiveIntegerField(default=0)
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    def __str__(self):
+        return f"{self.restaurant_id} on {self.day}: {self.orders} orders"
+
+    class Meta:
+        managed = True
+        db_table = 'restaurant_daily_stats'
+        constraints = [
+            models.UniqueConstraint(fields=['restaurant', 'day'], name='restaurant_daily_stats_uniq'),
+        ]
+
+
+class MenuItemDailyStats(models.Model):
+    # Delivered quantity and revenue per menu item and order day; restaurant
+    # is copied from the menu item so a restaurant's top dishes are read
+    # without a join.
+    menu_item = models.ForeignKey(MenuItem, on_delete=models.CASCADE, related_name='daily_stats')
+    restaurant = models.ForeignKey(Restaurant, on_delete=models.CASCADE, related_name='menu_item_daily_stats')
+    day = models.DateField()
+    quantity = models.PositiveIntegerField(default=0)
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    def __str__(self):
+        return f"{self.menu_item_id} on {self.day}: {self.quantity} sold"
+
+    class Meta:
+        managed = True
+        db_table = 'menu_item_daily_stats'
+        constraints = [
+            models.UniqueConstraint(fields=['menu_item', 'day'], name='menu_item_daily_stats_uniq'),
+        ]
+        indexes = [
+            models.Index(fields=['restaurant', 'day'], name='menu_item_stats_restaurant_idx'),
+        ]
+
+
+class RateLimitCounter(models.Model):
+    # Requests per rate limit rule and client, counted by ratelimit.py with a
+    # single upsert. key is a hash of the scope, rule and client identity, so
+    # addresses and account names are not stored.
+    key = models.CharField(max_length=32, primary_key=True)
+    window = models.BigIntegerField()  # Unix time // rule period
+    hits = models.PositiveIntegerField(default=0)
+    previous = models.PositiveIntegerField(default=0)  # hits of window - 1
+    expires = models.BigIntegerField(db_index=True)  # Unix time
+
+    def __str__(self):
+        return f"{self.key}: {self.hits} in window {self.window}"
+
+    class Meta:
+        managed = True
+        db_table = 'rate_limit_counter'
@@ -0,0 +1,110 @@
+from collections import Counter
+from itertools import islice
+
+from django.db import transaction
+from django.db.models import F
+
+from .models import Notification, NotificationCounter, Order
+
+# In-app notifications. Events are fanned out with bulk_create in batches,
+# and each user's unread count is kept in NotificationCounter, updated in the
+# same transaction, so showing the badge is one primary key lookup instead of
+# counting rows. It is read straight from the table: a cached copy would go
+# stale in every other worker when the dispatcher or another request changes
+# it.
+
+BATCH_SIZE = 1000
+NOTIFICATIONS_PER_PAGE = 20
+
+
+def _increment(counts):
+    NotificationCounter.objects.bulk_create(
+        [NotificationCounter(user_id=user_id) for user_id in counts],
+        ignore_conflicts=True,
+    )
+    by_amount = {}
+    for user_id, amount in counts.items():
+        by_amount.setdefault(amount, []).append(user_id)
+    # Usually a single UPDATE: every user gets one notification per batch.
+    for amount, user_ids in by_amount.items():
+        NotificationCounter.objects.filter(user_id__in=user_ids).update(
+            unread=F("unread") + amount
+        )
+
+
+def send(notifications):
+    """
+    Create notifications from an iterable of (user_id, message) pairs,
+    BATCH_SIZE at a time. Returns the number created.
+    """
+    notifications = iter(notifications)
+    created = 0
+    while batch := list(islice(notifications, BATCH_SIZE)):
+        with transaction.atomic():
+            Notification.objects.bulk_create(
+                [Notification(user_id=user_id, message=message) for user_id, message in batch]
+            )
+            counts = Counter(user_id for user_id, _ in batch)
+            _increment(counts)
+        created += len(batch)
+    return created
+
+
+def broadcast(user_ids, message):
+    """Send the same message to every user in ``user_ids`` (any iterable)."""
+    return send((user_id, message) for user_id in user_ids)
+
+
+def _counter(user_id):
+    return NotificationCounter.objects.filter(user_id=user_id).values_list("unread", flat=True)
+
+
+def unread_count(user_id):
+    return _counter(user_id).first() or 0
+
+
+async def aunread_count(user_id):
+    return await _counter(user_id).afirst() or 0
+
+
+def mark_all_read(user_id):
+    """Mark every notification of the user read; returns how many were unread."""
+    with transaction.atomic():
+        # Reset the counter first: its row lock makes a concurrent send()
+        # commit before the notifications below are marked.
+        NotificationCounter.objects.filter(user_id=user_id).update(unread=0)
+        updated = Notification.objects.filter(user_id=user_id, is_read=False).update(
+            is_read=True
+        )
+    return updated
+
+
+def mark_read(user_id, notification_id):
+    with transaction.atomic():
+        updated = Notification.objects.filter(
+            pk=notification_id, user_id=user_id, is_read=False
+        ).update(is_read=True)
+        if updated:
+            NotificationCounter.objects.filter(user_id=user_id, unread__gt=0).update(
+                unread=F("unread") - 1
+            )
+    return bool(updated)
+
+
+# Event fan-out
+
+
+def order_status_changed(order_ids, to_status):
+    label = dict(Order.ORDER_STATUS_CHOICES)[to_status]
+    orders = Order.objects.filter(pk__in=order_ids).values_list("order_id", "user_id")
+    send(
+        (user_id, f"Your order #{order_id} is now {label.lower()}.")
+        for order_id, user_id in list(orders)
+    )
+
+
+def rider_assigned(order, delivery_person):
+    send([(
+        order.user_id,
+        f"A rider has been assigned to your order #{order.order_id}.",
+    )])
@@ -0,0 +1,120 @@
+from decimal import Decimal
+
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.db.models import Prefetch
+
+from . import coupons, eta
+from .models import MenuItem, Order, OrderItem, Payment
+from .pagination import akeyset_page, keyset_page
+
+ORDER_HISTORY_ORDERING = ("-order_date", "-order_id")
+ORDERS_PER_PAGE = 10
+
+
+def place_order(
+    user,
+    restaurant,
+    delivery_address,
+    quantities,
+    payment_method="cash_on_delivery",
+    coupon_code=None,
+):
+    """
+    Build an order from ``quantities`` ({menu_item_id: quantity}).
+
+    Every selected MenuItem is loaded in a single ``in_bulk`` query and
+    availability and price are checked against that snapshot. The Order,
+    its OrderItem rows and the Payment are written in one transaction, which
+    also redeems ``coupon_code`` when given. The ready and delivery
+    estimates come from eta.py.
+    """
+    if not quantities:
+        raise ValidationError("Select at least one menu item.")
+
+    # Refresh the ETA inputs (three aggregate queries when stale) before
+    # taking the write lock; estimate() below then only reads memory.
+    eta.state()
+    with transaction.atomic():
+        menu_items = MenuItem.objects.in_bulk(list(quantities))
+
+        total_amount = Decimal("0")
+        lines = []
+        for item_id, quantity in quantities.items():
+            menu_item = menu_items.get(int(item_id))
+            if menu_item is None or menu_item.restaurant_id != restaurant.pk:
+                raise ValidationError("One of the selected items no longer exists.")
+            if not menu_item.availability:
+                raise ValidationError(f"{menu_item.name} is currently unavailable.")
+            if quantity < 1:
+                raise ValidationError(f"Invalid quantity for {menu_item.name}.")
+            lines.append((menu_item, quantity))
+            total_amount += menu_item.price * quantity
+
+        coupon = None
+        discount_amount = Decimal("0")
+        if coupon_code:
+            coupon = coupons.find_coupon(coupon_code)
+            discount_amount = coupons.discount_for(coupon, total_amount)
+            coupons.redeem(coupon)
+            total_amount -= discount_amount
+
+        estimate = eta.estimate(restaurant.pk, lines)
+        order = Order.objects.create(
+            user=user,
+            restaurant=restaurant,
+            delivery_address=delivery_address,
+            total_amount=total_amount,
+            item_count=sum(quantity for _, quantity in lines),
+            restaurant_name=restaurant.name,
+            coupon_id=coupon.coupon_id if coupon else None,
+            discount_amount=discount_amount,
+            preparation_minutes=estimate.preparation_minutes,
+            estimated_ready_at=estimate.ready_at,
+            delivery_date=estimate.delivery_at,
+        )
+        OrderItem.objects.bulk_create(
+            [
+                OrderItem(
+                    order=order,
+                    menu_item=menu_item,
+                    quantity=quantity,
+                    price=menu_item.price,
+                )
+                for menu_item, quantity in lines
+            ]
+        )
+        Payment.objects.create(
+            order=order,
+            payment_method=payment_method,
+            amount=total_amount,
+            payment_status="pending",  # Adjust based on actual payment flow
+        )
+        transaction.on_commit(
+            lambda: eta.order_placed(restaurant.pk, estimate.preparation_minutes)
+        )
+
+    return order
+
+
+def order_history_queryset(user):
+    # Two queries per page whatever the number of orders: the orders, then
+    # their items joined with the menu items.
+    return Order.objects.filter(user=user).prefetch_related(
+        Prefetch(
+            "orderitem_set",
+            queryset=OrderItem.objects.select_related("menu_item").order_by("order_item_id"),
+        )
+    )
+
+
+def order_history_page(user, cursor=None, page_size=ORDERS_PER_PAGE):
+    return keyset_page(
+        order_history_queryset(user), ORDER_HISTORY_ORDERING, cursor, page_size
+    )
+
+
+async def aorder_history_page(user, cursor=None, page_size=ORDERS_PER_PAGE):
+    return await akeyset_page(
+        order_history_queryset(user), ORDER_HISTORY_ORDERING, cursor, page_size
+    )
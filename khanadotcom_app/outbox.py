@@ -0,0 +1,165 @@
+import logging
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.core.mail.backends.base import BaseEmailBackend
+from django.db.models import F
+from django.utils import timezone
+
+from .models import OutboundEmail
+
+logger = logging.getLogger(__name__)
+
+# Outgoing mail is written to the outbound_email table instead of being sent
+# inside the request. ``python manage.py send_queued_mail`` delivers it in
+# batches over one connection of OUTBOX_EMAIL_BACKEND, retrying failures with
+# exponential backoff until OUTBOX_MAX_ATTEMPTS, after which a message is
+# marked dead.
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+class QueuedEmailBackend(BaseEmailBackend):
+    """EMAIL_BACKEND that stores messages in the outbox."""
+
+    def send_messages(self, email_messages):
+        count = 0
+        for message in email_messages:
+            if message.attachments:
+                raise ValueError("Queued email does not support attachments.")
+            enqueue(message)
+            count += 1
+        return count
+
+
+def enqueue(message):
+    recipients = {"to": message.to, "cc": message.cc, "bcc": message.bcc}
+    if message.reply_to:
+        recipients["reply_to"] = message.reply_to
+    alternatives = [
+        [content, mimetype] for content, mimetype in getattr(message, "alternatives", [])
+    ]
+    if message.content_subtype != "plain":
+        alternatives.insert(0, [message.body, f"text/{message.content_subtype}"])
+    return OutboundEmail.objects.create(
+        subject=message.subject,
+        body=message.body,
+        from_email=message.from_email or "",
+        recipients=recipients,
+        alternatives=alternatives,
+        headers=message.extra_headers,
+        next_attempt_at=timezone.now(),
+    )
+
+
+def _build_message(email, connection):
+    recipients = email.recipients
+    message = EmailMultiAlternatives(
+        subject=email.subject,
+        body=email.body,
+        from_email=email.from_email or None,
+        to=recipients.get("to"),
+        cc=recipients.get("cc"),
+        bcc=recipients.get("bcc"),
+        reply_to=recipients.get("reply_to"),
+        headers=email.headers,
+        connection=connection,
+    )
+    for content, mimetype in email.alternatives:
+        if mimetype == "text/html" and content == email.body:
+            message.content_subtype = "html"
+        else:
+            message.attach_alternative(content, mimetype)
+    return message
+
+
+def backoff(attempts):
+    base = _setting("OUTBOX_RETRY_BASE_SECONDS", 30)
+    return timedelta(seconds=min(base * 2 ** (attempts - 1), 6 * 60 * 60))
+
+
+def _claim(batch_size):
+    # Claim rows one by one with a conditional UPDATE so that several
+    # workers can share the queue without sending a message twice. A claim
+    # is a lease: if the worker dies, the message is due again once
+    # next_attempt_at passes. Claiming counts the attempt, so a message that
+    # keeps killing its worker still runs out of attempts.
+    now = timezone.now()
+    lease_until = now + timedelta(seconds=_setting("OUTBOX_LEASE_SECONDS", 300))
+    max_attempts = _setting("OUTBOX_MAX_ATTEMPTS", 6)
+    due = OutboundEmail.objects.filter(
+        status__in=("queued", "sending"), next_attempt_at__lte=now
+    )
+    for pk in due.filter(attempts__gte=max_attempts).values_list("pk", flat=True):
+        if due.filter(pk=pk).update(status="dead", last_error="Lease expired"):
+            logger.error("Giving up on email %s: lease expired", pk)
+    candidates = due.order_by("next_attempt_at").values_list("pk", flat=True)[:batch_size]
+    claimed = [
+        pk for pk in candidates
+        if due.filter(pk=pk, attempts__lt=max_attempts).update(
+            status="sending", next_attempt_at=lease_until, attempts=F("attempts") + 1
+        )
+    ]
+    return list(OutboundEmail.objects.filter(pk__in=claimed).order_by("pk"))
+
+
+def _failed(email, error):
+    # The attempt was counted when the message was claimed.
+    email.last_error = f"{type(error).__name__}: {error}"
+    if email.attempts >= _setting("OUTBOX_MAX_ATTEMPTS", 6):
+        email.status = "dead"
+        logger.error("Giving up on email %s: %s", email.pk, email.last_error)
+    else:
+        email.status = "queued"
+        email.next_attempt_at = timezone.now() + backoff(email.attempts)
+    email.save(update_fields=["last_error", "status", "next_attempt_at"])
+
+
+def send_batch(batch_size=50):
+    """Send one batch of due messages; returns (sent, failed)."""
+    emails = _claim(batch_size)
+    if not emails:
+        return 0, 0
+    sent, failed = [], 0
+    connection = get_connection(
+        _setting("OUTBOX_EMAIL_BACKEND", "django.core.mail.backends.smtp.EmailBackend")
+    )
+    try:
+        connection.open()
+        for email in emails:
+            try:
+                connection.send_messages([_build_message(email, connection)])
+            except Exception as e:
+                _failed(email, e)
+                failed += 1
+                # The connection may be unusable after an SMTP error, so
+                # the rest of the batch goes over a fresh one.
+                connection.close()
+                connection.open()
+            else:
+                sent.append(email.pk)
+    except Exception as e:
+        # Could not connect at all: put the rest of the batch back
+        for email in emails:
+            if email.pk not in sent and email.status == "sending":
+                _failed(email, e)
+                failed += 1
+    finally:
+        connection.close()
+        OutboundEmail.objects.filter(pk__in=sent).update(
+            status="sent", sent_at=timezone.now(), last_error=""
+        )
+    return len(sent), failed
+
+
+def run(batch_size=50, poll_interval=2.0):
+    while True:
+        sent, failed = send_batch(batch_size)
+        if sent or failed:
+            logger.info("Sent %s queued emails, %s failed", sent, failed)
+        else:
+            time.sleep(poll_interval)
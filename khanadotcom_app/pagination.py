@@ -0,0 +1,188 @@
+import base64
+import datetime
+import json
+
+from django.core.exceptions import ValidationError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import F, Q
+
+
+class KeysetPage:
+    def __init__(self, items, next_cursor):
+        self.items = items
+        self.next_cursor = next_cursor
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def __len__(self):
+        return len(self.items)
+
+
+def encode_cursor(values):
+    # DjangoJSONEncoder cuts datetimes to milliseconds; a cursor needs the
+    # exact value to compare rows against.
+    values = [
+        value.isoformat() if isinstance(value, datetime.datetime) else value
+        for value in values
+    ]
+    raw = json.dumps(values, cls=DjangoJSONEncoder).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        values = json.loads(raw)
+    except (ValueError, TypeError):
+        return None
+    return values if isinstance(values, list) else None
+
+
+def cursor_values(queryset, ordering, cursor):
+    """
+    The values of ``cursor`` converted to the types of the ``ordering``
+    fields, or None when the cursor is missing or does not fit them (cursors
+    come from the query string, so they can be anything).
+    """
+    values = decode_cursor(cursor) if cursor else None
+    if values is None or len(values) != len(ordering):
+        return None
+    converted = []
+    for name, value in zip(ordering, values):
+        field = queryset.model._meta.get_field(name.lstrip("-"))
+        if value is None:
+            if not field.null:
+                return None
+            converted.append(None)
+            continue
+        if isinstance(value, (dict, list)):
+            return None
+        try:
+            converted.append(field.to_python(value))
+        except (ValidationError, TypeError, ValueError):
+            return None
+    return converted
+
+
+def _parse_ordering(queryset, ordering):
+    fields = []
+    for name in ordering:
+        descending = name.startswith("-")
+        name = name.lstrip("-")
+        nullable = queryset.model._meta.get_field(name).null
+        fields.append((name, descending, nullable))
+    return fields
+
+
+def _order_expression(name, descending, nullable):
+    nulls_last = True if nullable else None
+    if descending:
+        return F(name).desc(nulls_last=nulls_last)
+    return F(name).asc(nulls_last=nulls_last)
+
+
+def _equal(name, value):
+    if value is None:
+        return Q(**{f"{name}__isnull": True})
+    return Q(**{name: value})
+
+
+def _after(name, descending, nullable, value):
+    # NULLs always sort last, so nothing comes after a NULL value.
+    if value is None:
+        return None
+    condition = Q(**{f"{name}__{'lt' if descending else 'gt'}": value})
+    if nullable:
+        condition |= Q(**{f"{name}__isnull": True})
+    return condition
+
+
+def _page_query(queryset, fields, values, limit):
+    queryset = queryset.order_by(*[_order_expression(*field) for field in fields])
+    if values is not None:
+        # (a, b, c) > (x, y, z)  <=>  a > x OR (a = x AND b > y) OR ...
+        condition = Q(pk__in=[])
+        for i, (name, descending, nullable) in enumerate(fields):
+            after = _after(name, descending, nullable, values[i])
+            if after is None:
+                continue
+            for (prev_name, _, _), prev_value in zip(fields[:i], values[:i]):
+                after &= _equal(prev_name, prev_value)
+            condition |= after
+        # The redundant bound on the leading column lets the database seek
+        # into the index instead of filtering every row before the cursor.
+        name, descending, _ = fields[0]
+        condition &= Q(**{f"{name}__{'lte' if descending else 'gte'}": values[0]})
+        queryset = queryset.filter(condition)
+    return queryset[:limit]
+
+
+def _segments(queryset, ordering, cursor, page_size):
+    """
+    Yield the queries that make up one page; send back the rows each one
+    returned. NULLs sort last, so a nullable leading column is walked as the
+    rows with a value first and then the NULL ones, each part being a plain
+    range over the index.
+    """
+    fields = _parse_ordering(queryset, ordering)
+    values = cursor_values(queryset, ordering, cursor)
+    limit = page_size + 1
+
+    name, _, nullable = fields[0]
+    if not nullable:
+        items = yield _page_query(queryset, fields, values, limit)
+    else:
+        items = []
+        null_values = None
+        if values is None or values[0] is not None:
+            items = yield _page_query(
+                queryset.filter(**{f"{name}__isnull": False}), fields, values, limit
+            )
+        else:
+            null_values = values[1:]
+        if len(items) < limit:
+            items += yield _page_query(
+                queryset.filter(**{f"{name}__isnull": True}),
+                fields[1:],
+                null_values,
+                limit - len(items),
+            )
+
+    next_cursor = None
+    if len(items) > page_size:
+        items = items[:page_size]
+        last = items[-1]
+        next_cursor = encode_cursor([getattr(last, name) for name, _, _ in fields])
+    return KeysetPage(items, next_cursor)
+
+
+def keyset_page(queryset, ordering, cursor=None, page_size=20):
+    """
+    Return one page of ``queryset`` ordered by ``ordering``, starting after
+    ``cursor``. The last field of ``ordering`` must be unique (usually the
+    primary key) so that every row has a distinct position. Unlike OFFSET,
+    the cost of a page does not depend on how deep it is.
+    """
+    segments = _segments(queryset, ordering, cursor, page_size)
+    try:
+        query = next(segments)
+        while True:
+            query = segments.send(list(query))
+    except StopIteration as done:
+        return done.value
+
+
+async def akeyset_page(queryset, ordering, cursor=None, page_size=20):
+    """keyset_page() for async views."""
+    segments = _segments(queryset, ordering, cursor, page_size)
+    try:
+        query = next(segments)
+        while True:
+            query = segments.send([obj async for obj in query])
+    except StopIteration as done:
+        return done.value
@@ -0,0 +1,120 @@
+import asyncio
+import threading
+
+from django.conf import settings
+from django.utils.functional import SimpleLazyObject
+from django.utils.module_loading import import_string
+
+# Publish/subscribe used to push order updates to connected clients.
+# InProcessBroker only reaches subscribers of the current process; when the
+# web server runs several workers, or events are published from other
+# processes (e.g. the dispatcher), set TRACKING_BROKER to a class with the
+# same interface that is backed by a shared broker.
+
+
+class SubscriptionOverflow(Exception):
+    """Messages were dropped; the subscriber must read the current state again."""
+
+
+class Subscription:
+    def __init__(self, broker, channel, maxsize):
+        self.broker = broker
+        self.channel = channel
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue(maxsize=maxsize)
+        self.overflowed = False
+
+    def put(self, message):
+        # Must run in the subscriber's loop. A slow client drops messages
+        # rather than growing its queue without bound, and is told so by
+        # its next get().
+        if self.queue.full():
+            self.overflowed = True
+        else:
+            self.queue.put_nowait(message)
+
+    async def get(self, timeout=None):
+        """Raises SubscriptionOverflow once after messages were dropped."""
+        if self.overflowed:
+            self.overflowed = False
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            raise SubscriptionOverflow
+        return await asyncio.wait_for(self.queue.get(), timeout)
+
+    def close(self):
+        self.broker.unsubscribe(self)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def _put_all(subscriptions, message):
+    for subscription in subscriptions:
+        subscription.put(message)
+
+
+class InProcessBroker:
+    def __init__(self, queue_size=100):
+        self.queue_size = queue_size
+        self._channels = {}
+        self._lock = threading.Lock()
+
+    def subscribe(self, channel):
+        """Must be called from a running event loop."""
+        subscription = Subscription(self, channel, self.queue_size)
+        with self._lock:
+            self._channels.setdefault(channel, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            subscribers = self._channels.get(subscription.channel)
+            if subscribers is not None:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._channels[subscription.channel]
+
+    def publish(self, channel, message):
+        """Safe to call from sync code and from any thread."""
+        with self._lock:
+            subscribers = list(self._channels.get(channel, ()))
+        by_loop = {}
+        for subscription in subscribers:
+            by_loop.setdefault(subscription.loop, []).append(subscription)
+
+        try:
+            current_loop = asyncio.get_running_loop()
+        except RuntimeError:
+            current_loop = None
+        for loop, subscriptions in by_loop.items():
+            if loop is current_loop:
+                for subscription in subscriptions:
+                    subscription.put(message)
+                continue
+            # One wake-up per event loop rather than one per subscriber
+            try:
+                loop.call_soon_threadsafe(_put_all, subscriptions, message)
+            except RuntimeError:
+                # The subscribers' event loop is closed
+                for subscription in subscriptions:
+                    self.unsubscribe(subscription)
+        return len(subscribers)
+
+    def subscriber_count(self):
+        with self._lock:
+            return sum(len(subscribers) for subscribers in self._channels.values())
+
+
+broker = SimpleLazyObject(
+    lambda: import_string(
+        getattr(settings, "TRACKING_BROKER", "khanadotcom_app.pubsub.InProcessBroker")
+    )()
+)
+
+
+def order_channel(order_id):
+    return f"order:{order_id}"
@@ -0,0 +1,203 @@
+import hashlib
+import itertools
+import re
+import time
+from dataclasses import dataclass
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.db import connection
+from django.http import HttpResponse
+from django.urls import Resolver404, resolve
+
+from .models import RateLimitCounter
+
+# Rate limiting for the URL names in RATE_LIMITS, checked by
+# RateLimitMiddleware before the request reaches the view, so a rejected
+# request costs one small write instead of a password hash or an email.
+#
+# Each rule is a sliding window approximated from two fixed windows: the
+# count of the current window plus the previous window's count weighted by
+# how much of it still overlaps the sliding window. Both counts are kept in
+# one rate_limit_counter row per rule and client, updated and read back by a
+# single INSERT ... ON CONFLICT DO UPDATE ... RETURNING, so concurrent
+# requests from any worker process are all counted.
+
+_RATE_RE = re.compile(r"^(\d+)/(\d*)([smhd])$")
+_UNITS = {"s": 1, "m": 60, "h": 3600, "d": 86400}
+
+
+@dataclass(frozen=True)
+class Rule:
+    key: str  # "ip", "user" or "post:<field>"
+    limit: int
+    period: int  # seconds
+    methods: tuple = ("POST",)
+
+    @classmethod
+    def parse(cls, key, rate, methods=("POST",)):
+        """Rule.parse("ip", "20/m"); periods like "10/15m" are accepted."""
+        match = _RATE_RE.match(rate)
+        if not match:
+            raise ValueError(f"Invalid rate {rate!r}")
+        count, multiplier, unit = match.groups()
+        return cls(key, int(count), int(multiplier or 1) * _UNITS[unit], tuple(methods))
+
+
+def client_ip(request):
+    header = getattr(settings, "RATE_LIMIT_IP_HEADER", None)
+    if header and header in request.META:
+        # e.g. HTTP_X_FORWARDED_FOR set by a trusted proxy: first address
+        return request.META[header].split(",")[0].strip()
+    return request.META.get("REMOTE_ADDR", "")
+
+
+def identity(rule, request):
+    """The value the rule counts requests by, or None to skip the rule."""
+    if rule.key == "ip":
+        return client_ip(request)
+    if rule.key == "user":
+        user = getattr(request, "user", None)
+        return str(user.pk) if user is not None and user.is_authenticated else None
+    if rule.key.startswith("post:"):
+        value = request.POST.get(rule.key[5:], "").strip().lower()
+        return value or None
+    raise ValueError(f"Unknown rate limit key {rule.key!r}")
+
+
+# Rows whose windows can no longer count are deleted every PURGE_EVERY hits
+# made by a process.
+PURGE_EVERY = 1000
+_hits = itertools.count(1)
+
+
+def _counter_key(scope, rule, ident):
+    value = f"{scope}\0{rule.key}\0{rule.period}\0{ident}"
+    return hashlib.blake2b(value.encode(), digest_size=16).hexdigest()
+
+
+# SET expressions see the row as it was before the update. A hit for an
+# older window (clock skew between workers) counts in the stored one.
+_COUNT_SQL = (
+    "INSERT INTO {table} ({key}, {window}, {hits}, {previous}, {expires}) "
+    "VALUES (%s, %s, 1, 0, %s) "
+    "ON CONFLICT ({key}) DO UPDATE SET "
+    "{previous} = CASE WHEN excluded.{window} <= {window} THEN {previous} "
+    "WHEN excluded.{window} = {window} + 1 THEN {hits} ELSE 0 END, "
+    "{hits} = CASE WHEN excluded.{window} <= {window} THEN {hits} + 1 ELSE 1 END, "
+    "{window} = CASE WHEN excluded.{window} > {window} THEN excluded.{window} ELSE {window} END, "
+    "{expires} = CASE WHEN excluded.{expires} > {expires} THEN excluded.{expires} ELSE {expires} END "
+    "RETURNING {hits}, {previous}"
+)
+
+
+def _count(key, window, expires):
+    """Add a hit to ``window``; returns its hits and the previous window's."""
+    qn = connection.ops.quote_name
+    columns = {name: qn(name) for name in ("key", "window", "hits", "previous", "expires")}
+    sql = _COUNT_SQL.format(table=qn(RateLimitCounter._meta.db_table), **columns)
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [key, window, expires])
+        return cursor.fetchone()
+
+
+def purge(now=None):
+    """Delete counters whose windows have all ended."""
+    now = time.time() if now is None else now
+    return RateLimitCounter.objects.filter(expires__lt=now).delete()[0]
+
+
+def hit(scope, rule, ident, now=None):
+    """
+    Count one request; returns 0 when allowed, otherwise the number of
+    seconds until the client may retry.
+    """
+    now = time.time() if now is None else now
+    window = int(now // rule.period)
+    elapsed = now / rule.period - window
+    # A window counts as the previous one until the end of the next.
+    expires = (window + 2) * rule.period
+    current, previous = _count(_counter_key(scope, rule, ident), window, expires)
+    if next(_hits) % PURGE_EVERY == 0:
+        purge(now)
+    if previous * (1 - elapsed) + current <= rule.limit:
+        return 0
+    return max(1, int(rule.period * (1 - elapsed)))
+
+
+def check(scope, request):
+    """Apply the rules of ``scope``; returns the Retry-After seconds or 0."""
+    retry_after = 0
+    for rule in rules(scope):
+        if request.method not in rule.methods:
+            continue
+        ident = identity(rule, request)
+        if ident is None:
+            continue
+        retry_after = max(retry_after, hit(scope, rule, ident))
+    return retry_after
+
+
+_rules = {}
+
+
+def rules(scope):
+    if scope not in _rules:
+        config = getattr(settings, "RATE_LIMITS", {})
+        _rules[scope] = [Rule.parse(*args) for args in config.get(scope, ())]
+    return _rules[scope]
+
+
+def reset_rules():
+    """Forget the parsed rules; called when RATE_LIMITS changes."""
+    _rules.clear()
+
+
+def too_many_requests(retry_after):
+    response = HttpResponse(
+        "Too many requests, please try again later.", status=429, content_type="text/plain"
+    )
+    response["Retry-After"] = str(retry_after)
+    return response
+
+
+class RateLimitMiddleware:
+    """
+    Reject requests over the RATE_LIMITS of their URL name with a 429. Must
+    come after AuthenticationMiddleware for the "user" rules.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def _scope(self, request):
+        scopes = getattr(settings, "RATE_LIMITS", {})
+        if not scopes:
+            return None
+        try:
+            match = resolve(request.path_info, getattr(request, "urlconf", None))
+        except Resolver404:
+            return None
+        return match.url_name if match.url_name in scopes else None
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        scope = self._scope(request)
+        retry_after = check(scope, request) if scope else 0
+        if retry_after:
+            return too_many_requests(retry_after)
+        return self.get_response(request)
+
+    async def __acall__(self, request):
+        scope = self._scope(request)
+        # The rules may load request.user, which needs the ORM.
+        retry_after = await sync_to_async(check)(scope, request) if scope else 0
+        if retry_after:
+            return too_many_requests(retry_after)
+        return await self.get_response(request)
@@ -0,0 +1,107 @@
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Count, F, FloatField, Sum, Value
+from django.db.models.functions import Cast, NullIf, Round
+
+from .models import DeliveryPerson, MenuItem, Restaurant, Review
+
+# Restaurant, MenuItem and DeliveryPerson keep running rating_count and
+# rating_sum counters, updated with F() expressions whenever a Review is
+# created, changed or deleted, so ``rating`` is always a precomputed average.
+
+# Review foreign key -> rated model
+RATED_FIELDS = {
+    "restaurant_id": Restaurant,
+    "menu_item_id": MenuItem,
+    "delivery_person_id": DeliveryPerson,
+}
+
+
+def _average(count, total):
+    return Round(Cast(total, FloatField()) / NullIf(count, Value(0)), 2)
+
+
+def _apply(model, pk, count_delta, sum_delta):
+    count = F("rating_count") + count_delta
+    total = F("rating_sum") + sum_delta
+    model.objects.filter(pk=pk).update(
+        rating_count=count,
+        rating_sum=total,
+        rating=_average(count, total),
+    )
+
+
+def snapshot(review):
+    """What the stored row of ``review`` currently contributes."""
+    values = {field: getattr(review, field) for field in RATED_FIELDS}
+    values["rating"] = review.rating
+    return values
+
+
+def review_saved(review, created):
+    previous = None if created else getattr(review, "_rating_snapshot", None)
+    current = snapshot(review)
+    with transaction.atomic():
+        for field, model in RATED_FIELDS.items():
+            old_pk = previous[field] if previous else None
+            new_pk = current[field]
+            old_rating = Decimal(previous["rating"]) if previous else None
+            new_rating = Decimal(review.rating)
+            if old_pk == new_pk:
+                if new_pk is not None and old_rating != new_rating:
+                    _apply(model, new_pk, 0, new_rating - old_rating)
+                continue
+            if old_pk is not None:
+                _apply(model, old_pk, -1, -old_rating)
+            if new_pk is not None:
+                _apply(model, new_pk, 1, new_rating)
+    review._rating_snapshot = current
+
+
+def review_deleted(review):
+    previous = getattr(review, "_rating_snapshot", None) or snapshot(review)
+    with transaction.atomic():
+        for field, model in RATED_FIELDS.items():
+            if previous[field] is not None:
+                _apply(model, previous[field], -1, -Decimal(previous["rating"]))
+
+
+def recompute_all(chunk_size=2000):
+    """
+    Rebuild every rating aggregate from the Review table, streaming one
+    GROUP BY per rated model. Returns the number of rows updated per model.
+    """
+    updated = {}
+    with transaction.atomic():
+        for field, model in RATED_FIELDS.items():
+            model.objects.update(rating_count=0, rating_sum=0, rating=None)
+            totals = (
+                Review.objects.filter(**{f"{field}__isnull": False})
+                .values(field)
+                .annotate(count=Count("review_id"), total=Sum("rating"))
+                .order_by()
+                .iterator(chunk_size=chunk_size)
+            )
+            batch = []
+            updated[model.__name__] = 0
+            for row in totals:
+                total = Decimal(row["total"])
+                batch.append(
+                    model(
+                        pk=row[field],
+                        rating_count=row["count"],
+                        rating_sum=total,
+                        rating=round(total / row["count"], 2),
+                    )
+                )
+                if len(batch) >= chunk_size:
+                    updated[model.__name__] += _flush(model, batch)
+            updated[model.__name__] += _flush(model, batch)
+    return updated
+
+
+def _flush(model, batch):
+    count = model.objects.bulk_update(batch, ["rating_count", "rating_sum", "rating"])
+    batch.clear()
+    return count
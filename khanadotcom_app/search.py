@@ -0,0 +1,189 @@
+import re
+
+from django.db import connection
+from django.db.models.expressions import RawSQL
+
+from .models import Category, MenuItem, MenuItemCategory, Restaurant
+
+# Full-text search over restaurants and menu items, backed by an SQLite FTS5
+# table (created in migration 0011). Rows are keyed by rowid so that single
+# documents can be replaced without scanning the index:
+#   restaurant -> restaurant_id * 2, menu item -> menu_item_id * 2 + 1
+# Kept up to date from model signals (see signals.py); rebuild with
+# ``python manage.py rebuild_search_index``.
+
+SEARCH_TABLE = "search_index"
+RESTAURANT = "restaurant"
+MENU_ITEM = "menu_item"
+
+# bm25 weights, one per column of the FTS table
+RANK_WEIGHTS = (0, 0, 0, 10.0, 3.0, 1.0, 2.0)
+
+_WORD_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def search_available():
+    return connection.vendor == "sqlite"
+
+
+def _q(name):
+    return connection.ops.quote_name(name)
+
+
+def _restaurant_select(where=""):
+    # Only what the restaurant shows its customers: the owner's name and
+    # email must not be searchable.
+    r = _q(Restaurant._meta.db_table)
+    return f"""
+        SELECT r.restaurant_id * 2, '{RESTAURANT}', r.restaurant_id, r.restaurant_id,
+               r.name, COALESCE(r.description, ''), r.address, ''
+        FROM {r} r
+        WHERE NOT r.is_deleted {where}
+    """
+
+
+def _menu_item_select(where=""):
+    m = _q(MenuItem._meta.db_table)
+    r = _q(Restaurant._meta.db_table)
+    mc = _q(MenuItemCategory._meta.db_table)
+    c = _q(Category._meta.db_table)
+    return f"""
+        SELECT m.menu_item_id * 2 + 1, '{MENU_ITEM}', m.menu_item_id, m.restaurant_id,
+               m.name, COALESCE(m.description, ''), '',
+               r.name || ' ' || COALESCE((
+                   SELECT group_concat(c.name, ' ')
+                   FROM {mc} mc JOIN {c} c ON c.category_id = mc.category_id
+                   WHERE mc.menu_item_id = m.menu_item_id
+               ), '')
+        FROM {m} m JOIN {r} r ON r.restaurant_id = m.restaurant_id
+        WHERE NOT r.is_deleted {where}
+    """
+
+
+def _insert(select, params):
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"INSERT INTO {SEARCH_TABLE} "
+            "(rowid, kind, object_id, restaurant_id, name, description, address, keywords) "
+            + select,
+            params,
+        )
+
+
+def _delete_rowids(rowids):
+    if not rowids:
+        return
+    placeholders = ", ".join(["%s"] * len(rowids))
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"DELETE FROM {SEARCH_TABLE} WHERE rowid IN ({placeholders})", list(rowids)
+        )
+
+
+def index_menu_items(menu_item_ids):
+    if not search_available() or not menu_item_ids:
+        return
+    menu_item_ids = list(menu_item_ids)
+    _delete_rowids([pk * 2 + 1 for pk in menu_item_ids])
+    placeholders = ", ".join(["%s"] * len(menu_item_ids))
+    _insert(_menu_item_select(f"AND m.menu_item_id IN ({placeholders})"), menu_item_ids)
+
+
+def unindex_menu_item(menu_item_id):
+    if search_available():
+        _delete_rowids([menu_item_id * 2 + 1])
+
+
+def index_restaurant(restaurant_id):
+    # Menu item documents carry the restaurant name and disappear with a
+    # soft-deleted restaurant, so they are refreshed along with it.
+    if not search_available():
+        return
+    _delete_rowids([restaurant_id * 2])
+    _insert(_restaurant_select("AND r.restaurant_id = %s"), [restaurant_id])
+    menu_item_ids = list(
+        MenuItem.objects.filter(restaurant_id=restaurant_id).values_list(
+            "menu_item_id", flat=True
+        )
+    )
+    _delete_rowids([pk * 2 + 1 for pk in menu_item_ids])
+    _insert(_menu_item_select("AND m.restaurant_id = %s"), [restaurant_id])
+
+
+def unindex_restaurant(restaurant_id):
+    if search_available():
+        _delete_rowids([restaurant_id * 2])
+
+
+def rebuild_index():
+    """Repopulate the whole index with one INSERT ... SELECT per kind."""
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {SEARCH_TABLE}")
+    _insert(_restaurant_select(), [])
+    _insert(_menu_item_select(), [])
+    with connection.cursor() as cursor:
+        cursor.execute(f"INSERT INTO {SEARCH_TABLE}({SEARCH_TABLE}) VALUES ('optimize')")
+        cursor.execute(f"SELECT count(*) FROM {SEARCH_TABLE}")
+        return cursor.fetchone()[0]
+
+
+def build_match_query(text):
+    # Quote every word so user input can never be read as FTS5 syntax, and
+    # match prefixes so that results show up while the user is still typing.
+    words = _WORD_RE.findall(text or "")
+    return " ".join('"%s"*' % word.replace('"', '""') for word in words)
+
+
+def search(text, kind=None, limit=20, offset=0):
+    """Return ranked (kind, object_id) pairs matching ``text``."""
+    match = build_match_query(text)
+    if not match:
+        return []
+    sql = (
+        f"SELECT kind, object_id FROM {SEARCH_TABLE} "
+        f"WHERE {SEARCH_TABLE} MATCH %s"
+    )
+    params = [match]
+    if kind is not None:
+        sql += " AND kind = %s"
+        params.append(kind)
+    sql += f" ORDER BY bm25({SEARCH_TABLE}, {', '.join(map(str, RANK_WEIGHTS))})"
+    if limit is not None:
+        sql += " LIMIT %s OFFSET %s"
+        params += [limit, offset]
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return cursor.fetchall()
+
+
+def matching_ids(kind, text):
+    """
+    A subquery of the primary keys of ``kind`` matching ``text``, for
+    ``pk__in`` in admin search; None when ``text`` has no words. A subquery
+    rather than a list, as broad terms match more ids than SQLite takes
+    query parameters.
+    """
+    match = build_match_query(text)
+    if not match:
+        return None
+    return RawSQL(
+        f"SELECT object_id FROM {SEARCH_TABLE} WHERE {SEARCH_TABLE} MATCH %s AND kind = %s",
+        [match, kind],
+    )
+
+
+def search_objects(text, limit=20, offset=0):
+    """Ranked Restaurant and MenuItem instances matching ``text``."""
+    hits = search(text, limit=limit, offset=offset)
+    restaurants = Restaurant.objects.in_bulk(
+        [pk for kind, pk in hits if kind == RESTAURANT]
+    )
+    menu_items = MenuItem.objects.select_related("restaurant").in_bulk(
+        [pk for kind, pk in hits if kind == MENU_ITEM]
+    )
+    results = []
+    for kind, pk in hits:
+        obj = (restaurants if kind == RESTAURANT else menu_items).get(pk)
+        if obj is not None:
+            results.append((kind, obj))
+    return results
@@ -0,0 +1,175 @@
+from django.core.signals import setting_changed
+from django.db import transaction
+from django.db.models.signals import post_delete, post_init, post_save
+from django.dispatch import receiver
+
+from . import (
+    coupons, image_pipeline, menu_snapshot, notifications, ratelimit, ratings, search,
+    tracking,
+)
+from .dispatch import rider_assigned
+from .lifecycle import order_status_changed
+from .menu_cache import bump_menu_version
+from .models import Category, Coupon, MenuItem, MenuItemCategory, Restaurant, Review, User
+
+
+@receiver(post_save, sender=MenuItem)
+def menu_item_saved(sender, instance, **kwargs):
+    restaurant_id = instance.restaurant_id
+    entry = menu_snapshot.item_entry(instance)
+    transaction.on_commit(
+        lambda: menu_snapshot.upsert_item(
+            restaurant_id, bump_menu_version(restaurant_id), entry
+        )
+    )
+
+
+@receiver(post_delete, sender=MenuItem)
+def menu_item_deleted(sender, instance, **kwargs):
+    restaurant_id = instance.restaurant_id
+    menu_item_id = instance.menu_item_id
+    transaction.on_commit(
+        lambda: menu_snapshot.remove_item(
+            restaurant_id, bump_menu_version(restaurant_id), menu_item_id
+        )
+    )
+
+
+@receiver([post_save, post_delete], sender=MenuItemCategory)
+def menu_item_category_changed(sender, instance, **kwargs):
+    restaurant_id = (
+        MenuItem.objects.filter(pk=instance.menu_item_id)
+        .values_list("restaurant_id", flat=True)
+        .first()
+    )
+    menu_item_id = instance.menu_item_id
+    # The menu item itself may already be gone when it is deleted in cascade;
+    # its own post_delete bumps the version in that case.
+    if restaurant_id is not None:
+        transaction.on_commit(
+            lambda: menu_snapshot.refresh_item_categories(
+                restaurant_id, bump_menu_version(restaurant_id), menu_item_id
+            )
+        )
+
+
+@receiver(post_save, sender=Category)
+def category_changed(sender, instance, created, **kwargs):
+    if created:
+        return
+    restaurant_ids = set(
+        MenuItemCategory.objects.filter(category=instance).values_list(
+            "menu_item__restaurant_id", flat=True
+        )
+    )
+    for restaurant_id in restaurant_ids:
+        transaction.on_commit(lambda rid=restaurant_id: bump_menu_version(rid))
+
+
+@receiver(post_save, sender=Restaurant)
+def restaurant_changed(sender, instance, **kwargs):
+    # The menu snapshot embeds the restaurant name
+    restaurant_id = instance.restaurant_id
+    transaction.on_commit(lambda: menu_snapshot.invalidate(restaurant_id))
+
+
+@receiver(post_save, sender=Restaurant)
+def index_restaurant(sender, instance, raw=False, **kwargs):
+    if not raw:
+        search.index_restaurant(instance.restaurant_id)
+
+
+@receiver(post_delete, sender=Restaurant)
+def unindex_restaurant(sender, instance, **kwargs):
+    search.unindex_restaurant(instance.restaurant_id)
+
+
+@receiver(post_save, sender=MenuItem)
+def index_menu_item(sender, instance, raw=False, **kwargs):
+    if not raw:
+        search.index_menu_items([instance.menu_item_id])
+
+
+@receiver(post_delete, sender=MenuItem)
+def unindex_menu_item(sender, instance, **kwargs):
+    search.unindex_menu_item(instance.menu_item_id)
+
+
+@receiver([post_save, post_delete], sender=MenuItemCategory)
+def index_menu_item_categories(sender, instance, raw=False, **kwargs):
+    if not raw:
+        search.index_menu_items([instance.menu_item_id])
+
+
+@receiver(post_save, sender=Category)
+def index_category_menu_items(sender, instance, created, raw=False, **kwargs):
+    if created or raw:
+        return
+    search.index_menu_items(
+        MenuItemCategory.objects.filter(category=instance).values_list(
+            "menu_item_id", flat=True
+        )
+    )
+
+
+@receiver(post_save, sender=Restaurant)
+@receiver(post_save, sender=MenuItem)
+@receiver(post_save, sender=User)
+def build_image_variants(sender, instance, raw=False, **kwargs):
+    if not raw:
+        image_pipeline.schedule(instance)
+
+
+@receiver(post_save, sender=Coupon)
+def coupon_saved(sender, instance, raw=False, **kwargs):
+    if not raw:
+        coupons.sync_counters(instance)
+    transaction.on_commit(coupons.bump_index_version)
+
+
+@receiver(post_delete, sender=Coupon)
+def coupon_deleted(sender, instance, **kwargs):
+    transaction.on_commit(coupons.bump_index_version)
+
+
+@receiver(post_init, sender=Review)
+def remember_review_rating(sender, instance, **kwargs):
+    if instance.pk is not None:
+        instance._rating_snapshot = ratings.snapshot(instance)
+
+
+@receiver(post_save, sender=Review)
+def update_ratings_on_save(sender, instance, created, raw=False, **kwargs):
+    if not raw:
+        ratings.review_saved(instance, created)
+
+
+@receiver(post_delete, sender=Review)
+def update_ratings_on_delete(sender, instance, **kwargs):
+    ratings.review_deleted(instance)
+
+
+@receiver(order_status_changed)
+def push_order_status(sender, order_ids, to_status, **kwargs):
+    tracking.publish_status(order_ids, to_status)
+
+
+@receiver(rider_assigned)
+def push_rider_assignment(sender, order, delivery_person, **kwargs):
+    tracking.publish_rider(order.order_id, delivery_person)
+
+
+@receiver(order_status_changed)
+def notify_order_status(sender, order_ids, to_status, **kwargs):
+    notifications.order_status_changed(order_ids, to_status)
+
+
+@receiver(rider_assigned)
+def notify_rider_assignment(sender, order, delivery_person, **kwargs):
+    notifications.rider_assigned(order, delivery_person)
+
+
+@receiver(setting_changed)
+def reset_rate_limit_rules(sender, setting, **kwargs):
+    if setting == "RATE_LIMITS":
+        ratelimit.reset_rules()
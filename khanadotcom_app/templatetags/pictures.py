@@ -0,0 +1,42 @@
+from django import template
+from django.utils.html import format_html, format_html_join
+
+from ..image_pipeline import image_urls
+
+register = template.Library()
+
+
+@register.simple_tag
+def picture(instance, image_field, width=480, alt=""):
+    """
+    Render ``instance.<image_field>`` as a <picture> with WebP and JPEG
+    variants, lazily loaded over its blurred placeholder. Falls back to the
+    original file until the variants are built.
+
+        {% load pictures %}
+        {% picture restaurant "profile_pic" width=160 alt=restaurant.name %}
+    """
+    urls = image_urls(instance, image_field)
+    if urls is None:
+        return ""
+    if not urls["sizes"]:
+        return format_html(
+            '<img src="{}" alt="{}" width="{}" loading="lazy" decoding="async">',
+            urls["original"], alt, width,
+        )
+    sizes = urls["sizes"]
+    # The smallest variant at least as wide as the slot, else the largest
+    fallback = next((size for size in sizes if size["width"] >= width), sizes[-1])
+    height = round(urls["height"] * width / urls["width"])
+    return format_html(
+        '<picture><source type="image/webp" srcset="{}" sizes="{}px">'
+        '<img src="{}" srcset="{}" sizes="{}px" alt="{}" width="{}" height="{}" '
+        'loading="lazy" decoding="async" '
+        'style="background-size:cover;background-image:url({})"></picture>',
+        format_html_join(", ", "{} {}w", ((s["webp"], s["width"]) for s in sizes)),
+        width,
+        fallback["jpeg"],
+        format_html_join(", ", "{} {}w", ((s["jpeg"], s["width"]) for s in sizes)),
+        width, alt, width, height,
+        urls["placeholder"],
+    )
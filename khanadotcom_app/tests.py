@@ -1,3 +1,780 @@
-from django.test import TestCase
+import datetime
+import importlib
+import json
+import random
+import threading
+from collections import Counter
+from decimal import Decimal
+from types import SimpleNamespace
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import sync_to_async
+from django.core.exceptions import ValidationError
+from django.core.mail import EmailMessage
+from django.core.mail.backends.locmem import EmailBackend as LocmemEmailBackend
+from django.apps import apps
+from django.db import connection, connections
+from django.test import AsyncClient, RequestFactory, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from . import (
+    analytics, coupons, dispatch, eta, lifecycle, menu_cache, menu_snapshot, notifications,
+    outbox, ratelimit, search, tracking,
+)
+from .admin_tools import EstimatedCountPaginator
+from .models import (
+    Coupon, CustomerDetail, DeliveryPerson, MenuItem, MenuItemDailyStats, Notification,
+    NotificationCounter, Order, OrderItem, OrderStatusLog, OutboundEmail, RateLimitCounter,
+    Restaurant, RestaurantDailyStats, Review, User,
+)
+from .orders import order_history_page, place_order
+from .pagination import encode_cursor, keyset_page
+
+
+def make_user(email="customer@example.com", **fields):
+    return User.objects.create_user(
+        email=email, password="pass-1234", name="Customer", is_active=True, **fields
+    )
+
+
+def make_restaurant(owner, name="Spice Route", **fields):
+    return Restaurant.objects.create(
+        name=name, owner=owner, address="1 Main Road",
+        phone_number="9999999999", email="spice@example.com", **fields
+    )
+
+
+class MenuCacheTests(TestCase):
+    def setUp(self):
+        self.restaurant = make_restaurant(make_user("owner@example.com"))
+        with self.captureOnCommitCallbacks(execute=True):
+            self.item = MenuItem.objects.create(
+                restaurant=self.restaurant, name="Thali", price=200
+            )
+
+    def names(self):
+        return [item.name for item in menu_cache.get_menu(self.restaurant.pk)]
+
+    def test_saving_a_menu_item_replaces_the_cached_menu(self):
+        self.assertEqual(self.names(), ["Thali"])
+        with self.assertNumQueries(0):
+            self.assertEqual(self.names(), ["Thali"])
+        with self.captureOnCommitCallbacks(execute=True):
+            self.item.name = "Veg Thali"
+            self.item.save()
+        self.assertEqual(self.names(), ["Veg Thali"])
+
+    def test_deleting_a_menu_item_replaces_the_cached_menu(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            MenuItem.objects.create(restaurant=self.restaurant, name="Dosa", price=80)
+        self.assertEqual(self.names(), ["Thali", "Dosa"])
+        with self.captureOnCommitCallbacks(execute=True):
+            self.item.delete()
+        self.assertEqual(self.names(), ["Dosa"])
+
+
+class MenuSnapshotTests(TestCase):
+    def setUp(self):
+        self.restaurant = make_restaurant(make_user("owner@example.com"))
+        with self.captureOnCommitCallbacks(execute=True):
+            self.item = MenuItem.objects.create(
+                restaurant=self.restaurant, name="Thali", price=200
+            )
+        self.snapshot = menu_snapshot.get_snapshot(self.restaurant.pk)
+
+    def get(self, **headers):
+        request = RequestFactory().get("/menu.json", headers=headers)
+        return menu_snapshot.snapshot_response(
+            request, menu_snapshot.get_snapshot(self.restaurant.pk)
+        )
+
+    def test_matching_etag_gets_a_304_without_queries(self):
+        with self.assertNumQueries(0):
+            response = self.get(if_none_match=self.snapshot["etag"])
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response["ETag"], self.snapshot["etag"])
+        self.assertEqual(self.get(if_none_match='"other"').status_code, 200)
+
+    def test_changed_item_is_patched_into_the_snapshot(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.item.price = 250
+            self.item.save()
+        # Patched on commit: the next read neither rebuilds nor queries.
+        with self.assertNumQueries(0):
+            response = self.get(if_none_match=self.snapshot["etag"])
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], self.snapshot["etag"])
+        items = json.loads(response.content)["items"]
+        self.assertEqual([(item["name"], item["price"]) for item in items], [("Thali", "250.00")])
+
+
+class KeysetPaginationTests(TestCase):
+    ordering = ("-created_at", "order_id")
+
+    def setUp(self):
+        user = make_user()
+        self.orders = [
+            Order.objects.create(user=user, total_amount=10, delivery_address="Home")
+            for _ in range(3)
+        ]
+        # Same millisecond, different microseconds
+        moment = timezone.now().replace(microsecond=500000)
+        for offset, order in enumerate(self.orders):
+            Order.objects.filter(pk=order.pk).update(
+                created_at=moment + datetime.timedelta(microseconds=offset * 100)
+            )
+
+    def test_pages_keep_rows_from_the_same_millisecond(self):
+        seen, cursor = [], None
+        while True:
+            page = keyset_page(Order.objects.all(), self.ordering, cursor, page_size=1)
+            seen += [order.pk for order in page]
+            if not page.has_next:
+                break
+            cursor = page.next_cursor
+        self.assertEqual(seen, [order.pk for order in reversed(self.orders)])
+
+    def test_tampered_cursor_starts_from_the_first_page(self):
+        first = keyset_page(Order.objects.all(), self.ordering, page_size=1)
+        for values in (["x", 1], [{"a": 1}, 1], [None, 1], [[], "y"]):
+            page = keyset_page(
+                Order.objects.all(), self.ordering, encode_cursor(values), page_size=1
+            )
+            self.assertEqual(page.items, first.items)
+        page = keyset_page(Order.objects.all(), self.ordering, "not base64!", page_size=1)
+        self.assertEqual(page.items, first.items)
+
+
+class KitchenFeedTests(TestCase):
+    def setUp(self):
+        owner = make_user("owner@example.com")
+        self.restaurant = make_restaurant(owner)
+        self.order = Order.objects.create(
+            user=make_user(), restaurant=self.restaurant, total_amount=10,
+            delivery_address="Home",
+        )
+        self.client.force_login(owner)
+        self.url = reverse("kitchen_feed", args=[self.restaurant.pk])
+
+    def test_tampered_cursor_gets_a_full_resync(self):
+        for values in (["x", 1], [{"a": 1}, 1], [None, "y"], [1]):
+            response = self.client.get(self.url, {"after": encode_cursor(values)})
+            self.assertEqual(response.status_code, 200)
+            feed = response.json()
+            self.assertTrue(feed["full"])
+            self.assertEqual([entry["id"] for entry in feed["orders"]], [self.order.pk])
+
+    def test_cursor_from_an_empty_queue_picks_up_new_orders(self):
+        Order.objects.all().delete()
+        start = self.client.get(self.url).json()
+        order = Order.objects.create(
+            user=self.order.user, restaurant=self.restaurant, total_amount=10,
+            delivery_address="Home",
+        )
+        feed = self.client.get(self.url, {"after": start["cursor"]}).json()
+        self.assertFalse(feed["full"])
+        self.assertEqual([entry["id"] for entry in feed["orders"]], [order.pk])
+
+
+class LifecycleTests(TestCase):
+    def setUp(self):
+        self.restaurant = make_restaurant(make_user("owner@example.com"))
+        customer = make_user()
+        self.orders = [
+            Order.objects.create(
+                user=customer, restaurant=self.restaurant, total_amount=10,
+                delivery_address="Home", order_status=status,
+            )
+            for status in ("pending", "pending", "preparing")
+        ]
+
+    def statuses(self):
+        return list(Order.objects.order_by("pk").values_list("order_status", flat=True))
+
+    def test_illegal_transition_is_rejected_without_writing(self):
+        with self.assertRaises(lifecycle.InvalidTransition):
+            lifecycle.transition(self.orders[0].pk, "pending", "delivered")
+        self.assertEqual(self.statuses(), ["pending", "pending", "preparing"])
+        self.assertFalse(OrderStatusLog.objects.exists())
+
+    def test_transition_from_a_stale_status_does_nothing(self):
+        order = self.orders[0]
+        self.assertTrue(lifecycle.advance(order, "confirmed"))
+        # A second worker still holding the order as pending
+        self.assertFalse(lifecycle.transition(order.pk, "pending", "cancelled"))
+        self.assertEqual(self.statuses(), ["confirmed", "pending", "preparing"])
+        self.assertEqual(
+            list(OrderStatusLog.objects.values_list("from_status", "to_status")),
+            [("pending", "confirmed")],
+        )
+
+    def test_bulk_transition_moves_only_orders_in_the_status(self):
+        confirmed = lifecycle.confirm_pending_orders(self.restaurant.pk)
+        self.assertEqual(sorted(confirmed), [self.orders[0].pk, self.orders[1].pk])
+        self.assertEqual(self.statuses(), ["confirmed", "confirmed", "preparing"])
+        self.assertEqual(lifecycle.confirm_pending_orders(self.restaurant.pk), [])
+        self.assertEqual(OrderStatusLog.objects.count(), 2)
+
+
+class DailyRollupTests(TestCase):
+    def setUp(self):
+        self.restaurant = make_restaurant(make_user("owner@example.com"))
+        self.item = MenuItem.objects.create(restaurant=self.restaurant, name="Thali", price=200)
+        customer = make_user()
+        eta.state()
+        self.orders = [
+            place_order(customer, self.restaurant, "Home", {self.item.pk: quantity})
+            for quantity in (1, 2)
+        ]
+        Order.objects.update(order_status="out_for_delivery")
+
+    def totals(self):
+        return (
+            list(RestaurantDailyStats.objects.values_list("orders", "items_sold", "revenue")),
+            list(MenuItemDailyStats.objects.values_list("quantity", "revenue")),
+        )
+
+    def test_delivered_orders_are_counted_once(self):
+        for order in self.orders:
+            self.assertTrue(lifecycle.transition(order.pk, "out_for_delivery", "delivered"))
+        # A second worker delivering the same order again
+        self.assertFalse(lifecycle.transition(self.orders[0].pk, "out_for_delivery", "delivered"))
+        expected = ([(2, 3, Decimal("600"))], [(3, Decimal("600"))])
+        self.assertEqual(self.totals(), expected)
+
+    def test_rebuild_matches_the_incremental_rollups_and_can_be_rerun(self):
+        for order in self.orders:
+            lifecycle.transition(order.pk, "out_for_delivery", "delivered")
+        incremental = self.totals()
+        today = timezone.localdate()
+        for _ in range(2):
+            self.assertEqual(analytics.rebuild(today, today), 1)
+            self.assertEqual(self.totals(), incremental)
+
+
+class RatingTests(TestCase):
+    def setUp(self):
+        owner = make_user("owner@example.com")
+        self.first = make_restaurant(owner)
+        self.second = make_restaurant(owner, name="Dosa Corner")
+        user = make_user()
+        self.customer = CustomerDetail.objects.create(
+            customer=user, name="Customer", phone_number="8888888888", address="Home"
+        )
+        self.review = self.add_review(self.first, 4)
+        self.add_review(self.first, 2)
+
+    def add_review(self, restaurant, rating):
+        return Review.objects.create(
+            user=self.customer.customer, customer=self.customer, restaurant=restaurant,
+            rating=rating,
+        )
+
+    def assertRating(self, restaurant, count, total, rating):
+        restaurant.refresh_from_db()
+        self.assertEqual(
+            (restaurant.rating_count, restaurant.rating_sum, restaurant.rating),
+            (count, Decimal(total), None if rating is None else Decimal(rating)),
+        )
+
+    def test_new_reviews_are_counted(self):
+        self.assertRating(self.first, 2, 6, "3.00")
+        self.assertRating(self.second, 0, 0, None)
+
+    def test_changed_rating_applies_the_difference(self):
+        self.review.rating = 5
+        self.review.save()
+        self.assertRating(self.first, 2, 7, "3.50")
+
+    def test_review_moved_to_another_restaurant(self):
+        review = Review.objects.get(pk=self.review.pk)
+        review.restaurant = self.second
+        review.rating = 3
+        review.save()
+        self.assertRating(self.first, 1, 2, "2.00")
+        self.assertRating(self.second, 1, 3, "3.00")
+
+    def test_deleted_review_is_taken_out(self):
+        self.review.delete()
+        self.assertRating(self.first, 1, 2, "2.00")
+        Review.objects.get().delete()
+        self.assertRating(self.first, 0, 0, None)
+
+
+class SearchTests(TestCase):
+    def setUp(self):
+        self.restaurant = make_restaurant(make_user("priya.owner@example.com"))
+
+    def test_owner_is_not_searchable(self):
+        expected = [(search.RESTAURANT, self.restaurant.pk)]
+        for _ in range(2):
+            self.assertEqual(search.search("spice"), expected)
+            self.assertEqual(search.search("priya.owner@example.com"), [])
+            self.assertEqual(search.search("customer"), [])
+            search.rebuild_index()
+
+
+class AdminSearchTests(TestCase):
+    def test_matches_are_filtered_with_a_subquery(self):
+        restaurant = make_restaurant(make_user())
+        MenuItem.objects.bulk_create(
+            MenuItem(restaurant=restaurant, name=f"Biryani {n}", price=100) for n in range(50)
+        )
+        MenuItem.objects.create(restaurant=restaurant, name="Dosa", price=80)
+        search.rebuild_index()
+        matches = MenuItem.objects.filter(
+            pk__in=search.matching_ids(search.MENU_ITEM, "biryani")
+        )
+        with self.assertNumQueries(1):
+            self.assertEqual(len(matches), 50)
+        self.assertIn("SELECT object_id FROM search_index", str(matches.query))
+        self.assertIsNone(search.matching_ids(search.MENU_ITEM, "!!"))
+
+
+class DispatchTests(TransactionTestCase):
+    """Several dispatcher workers, each in its own thread and connection."""
+
+    databases = {"default", "replica"}
+    riders = 30
+    orders = 50
+
+    def setUp(self):
+        rng = random.Random(0)
+
+        def point():
+            # Somewhere in a ~20 km box around central Bengaluru
+            return {
+                "latitude": Decimal("12.97") + Decimal(rng.randint(-900, 900)) / 10000,
+                "longitude": Decimal("77.59") + Decimal(rng.randint(-900, 900)) / 10000,
+            }
+
+        owner = make_user("owner@example.com")
+        items = [
+            MenuItem.objects.create(
+                restaurant=make_restaurant(owner, name=f"Kitchen {n}", **point()),
+                name="Thali", price=100,
+            )
+            for n in range(5)
+        ]
+        # Without a password: hashing one per rider would dominate the test
+        User.objects.bulk_create(
+            User(email=f"rider{n}@example.com", name=f"Rider {n}") for n in range(self.riders)
+        )
+        DeliveryPerson.objects.bulk_create(
+            DeliveryPerson(user=user, **point())
+            for user in User.objects.filter(email__startswith="rider").order_by("pk")
+        )
+        customer = make_user()
+        for _ in range(self.orders):
+            order = Order.objects.create(
+                user=customer, total_amount=100, delivery_address="Home",
+                order_status=dispatch.DISPATCH_STATUS,
+            )
+            OrderItem.objects.create(
+                order=order, menu_item=rng.choice(items), quantity=1, price=100
+            )
+
+    def run_workers(self, batch_sizes):
+        errors = []
+        # Every worker reads its first batch before any of them assigns, so
+        # they all compete for the same riders; with different batch sizes
+        # they pair them with different orders.
+        first_batch = threading.Barrier(len(batch_sizes), timeout=10)
+        local = threading.local()
+        pickup_points = dispatch.pickup_points
+
+        def synchronised_pickup_points(orders):
+            if not getattr(local, "waited", False):
+                local.waited = True
+                first_batch.wait()
+            return pickup_points(orders)
+
+        def worker(batch_size):
+            try:
+                while dispatch.dispatch_batch(batch_size):
+                    pass
+            except Exception as error:
+                errors.append(error)
+            finally:
+                connections.close_all()
+
+        threads = [threading.Thread(target=worker, args=(size,)) for size in batch_sizes]
+        with mock.patch.object(dispatch, "pickup_points", synchronised_pickup_points):
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        self.assertEqual(errors, [])
+
+    def test_concurrent_workers_never_double_book(self):
+        self.run_workers(batch_sizes=(3, 5, 8, 13, 21, 34))
+        bookings = Counter(
+            Order.objects.filter(delivery_person__isnull=False).values_list(
+                "delivery_person_id", flat=True
+            )
+        )
+        self.assertEqual(sum(bookings.values()), self.riders)
+        self.assertEqual(max(bookings.values()), 1)
+        self.assertEqual(
+            set(bookings),
+            set(
+                DeliveryPerson.objects.filter(availability_status=False).values_list(
+                    "pk", flat=True
+                )
+            ),
+        )
+
+
+class FlakyEmailBackend(LocmemEmailBackend):
+    """Fails on subjects starting with "fail"; counts opened connections."""
+
+    opened = 0
+
+    def open(self):
+        FlakyEmailBackend.opened += 1
+        return True
+
+    def send_messages(self, messages):
+        if any(message.subject.startswith("fail") for message in messages):
+            raise ConnectionError("SMTP error")
+        return super().send_messages(messages)
+
+
+@override_settings(
+    OUTBOX_EMAIL_BACKEND="khanadotcom_app.tests.FlakyEmailBackend", OUTBOX_MAX_ATTEMPTS=2
+)
+class OutboxTests(TestCase):
+    def setUp(self):
+        FlakyEmailBackend.opened = 0
+
+    def queue(self, subject):
+        return outbox.enqueue(EmailMessage(subject, "Body", to=["a@example.com"]))
+
+    def test_batch_reopens_the_connection_once_after_an_error(self):
+        for subject in ("ok 1", "fail", "ok 2", "ok 3"):
+            self.queue(subject)
+        self.assertEqual(outbox.send_batch(), (3, 1))
+        self.assertEqual(FlakyEmailBackend.opened, 2)
+
+    def test_expired_leases_count_as_attempts(self):
+        email = self.queue("crashes the worker")
+        for _ in range(2):
+            self.assertEqual([e.pk for e in outbox._claim(10)], [email.pk])
+            # The worker dies; the lease runs out.
+            OutboundEmail.objects.filter(pk=email.pk).update(next_attempt_at=timezone.now())
+        self.assertEqual(outbox._claim(10), [])
+        email.refresh_from_db()
+        self.assertEqual((email.status, email.attempts), ("dead", 2))
+
+
+class OrderEventsTests(TestCase):
+    def setUp(self):
+        self.order = Order.objects.create(
+            user=make_user(), total_amount=10, delivery_address="Home"
+        )
+
+    async def test_stream_starts_with_the_assigned_rider(self):
+        rider_user = await User.objects.acreate(email="rider@example.com", name="Ravi")
+        rider = await DeliveryPerson.objects.acreate(user=rider_user, vehicle_details="Bike")
+        await Order.objects.filter(pk=self.order.pk).aupdate(delivery_person=rider)
+        events = tracking.order_events(self.order.pk)
+        self.assertIn("event: status", await anext(events))
+        rider_event = await anext(events)
+        self.assertIn("event: rider", rider_event)
+        self.assertIn('"name": "Ravi"', rider_event)
+        await events.aclose()
+
+    async def test_stream_resyncs_after_dropped_updates(self):
+        events = tracking.order_events(self.order.pk)
+        await anext(events)
+        # More updates than the subscription holds, and the final one lost
+        for _ in range(tracking.broker.queue_size + 1):
+            tracking.publish_status([self.order.pk], "preparing")
+        await Order.objects.filter(pk=self.order.pk).aupdate(order_status="delivered")
+        remaining = [event async for event in events]
+        self.assertIn('"order_status": "delivered"', remaining[-1])
+
+
+class NotificationTests(TestCase):
+    def setUp(self):
+        self.alice = make_user("alice@example.com")
+        self.bob = make_user("bob@example.com")
+
+    def counts(self):
+        return notifications.unread_count(self.alice.pk), notifications.unread_count(self.bob.pk)
+
+    def test_sending_counts_per_user(self):
+        notifications.send(
+            [(self.alice.pk, "One"), (self.alice.pk, "Two"), (self.bob.pk, "Three")]
+        )
+        notifications.broadcast([self.alice.pk, self.bob.pk], "Sale")
+        self.assertEqual(self.counts(), (3, 2))
+        with self.assertNumQueries(1):
+            notifications.unread_count(self.alice.pk)
+
+    def test_reading_takes_the_count_down(self):
+        notifications.broadcast([self.alice.pk, self.alice.pk, self.bob.pk], "Sale")
+        first = Notification.objects.filter(user=self.alice).first()
+        self.assertTrue(notifications.mark_read(self.alice.pk, first.pk))
+        self.assertFalse(notifications.mark_read(self.alice.pk, first.pk))
+        self.assertEqual(self.counts(), (1, 1))
+        self.assertEqual(notifications.mark_all_read(self.alice.pk), 1)
+        self.assertEqual(self.counts(), (0, 1))
+
+    def test_changes_from_other_workers_show_at_once(self):
+        self.assertEqual(self.counts(), (0, 0))
+        # e.g. the dispatcher notifying the user from its own process
+        NotificationCounter.objects.create(user=self.alice, unread=4)
+        self.assertEqual(self.counts(), (4, 0))
+
+    def test_migration_backfills_counters_from_unread_rows(self):
+        Notification.objects.bulk_create(
+            [Notification(user=self.alice, message="Old") for _ in range(3)]
+            + [Notification(user=self.bob, message="Old", is_read=True)]
+        )
+        NotificationCounter.objects.create(user=self.bob, unread=2)
+        migration = importlib.import_module(
+            "khanadotcom_app.migrations.0026_backfill_notification_counters"
+        )
+        # Only the connection of the schema editor is used
+        migration.backfill_counters(apps, SimpleNamespace(connection=connection))
+        self.assertEqual(self.counts(), (3, 0))
+
+
+class CouponTests(TestCase):
+    def setUp(self):
+        self.customer = make_user()
+        self.restaurant = make_restaurant(make_user("owner@example.com"))
+        self.item = MenuItem.objects.create(restaurant=self.restaurant, name="Thali", price=200)
+        now = timezone.now()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.coupon = Coupon.objects.create(
+                code="FEAST", discount_percentage=10, max_uses=5,
+                valid_from=now - datetime.timedelta(days=1),
+                valid_to=now + datetime.timedelta(days=1),
+            )
+
+    def order(self):
+        return place_order(
+            self.customer, self.restaurant, "Home", {self.item.pk: 1}, coupon_code="feast"
+        )
+
+    def test_coupon_discounts_the_order(self):
+        self.assertEqual(self.order().discount_amount, 20)
+
+    def test_deactivated_coupon_is_rejected_by_a_stale_index(self):
+        coupons.active_coupons()
+        # Deactivated by another process: this one's index still has it.
+        Coupon.objects.filter(pk=self.coupon.pk).update(active=False)
+        self.assertIn("FEAST", coupons.active_coupons())
+        with self.assertRaisesMessage(ValidationError, "not valid"):
+            self.order()
+        self.assertFalse(Order.objects.exists())
+        self.assertEqual(coupons.times_used(self.coupon), 0)
+
+
+class PlaceOrderTests(TestCase):
+    def setUp(self):
+        self.customer = make_user()
+        self.restaurant = make_restaurant(make_user("owner@example.com"))
+        self.item = MenuItem.objects.create(
+            restaurant=self.restaurant, name="Thali", price=200, preparation_time=20
+        )
+        eta._state = None
+
+    def test_eta_inputs_are_loaded_before_the_transaction(self):
+        with CaptureQueriesContext(connection) as queries:
+            order = place_order(self.customer, self.restaurant, "Home", {self.item.pk: 1})
+        sql = [query["sql"] for query in queries]
+        first_write = next(n for n, statement in enumerate(sql) if "SAVEPOINT" in statement)
+        self.assertGreaterEqual(first_write, 3)
+        self.assertIsNotNone(eta._state)
+        self.assertEqual(order.preparation_minutes, 20)
+        self.assertGreater(order.delivery_date, order.estimated_ready_at)
+
+    def test_query_count_does_not_grow_with_the_basket(self):
+        extra = MenuItem.objects.bulk_create(
+            MenuItem(restaurant=self.restaurant, name=f"Side {n}", price=50) for n in range(4)
+        )
+        eta.state()
+        # Savepoint, items, order, order items, payment, release
+        with self.assertNumQueries(6):
+            place_order(self.customer, self.restaurant, "Home", {self.item.pk: 1})
+        basket = {self.item.pk: 2, **{item.pk: 3 for item in extra}}
+        with self.assertNumQueries(6):
+            order = place_order(self.customer, self.restaurant, "Home", basket)
+        self.assertEqual(order.item_count, 14)
+        self.assertEqual(order.total_amount, 2 * 200 + 4 * 3 * 50)
+        self.assertEqual(
+            sorted(order.orderitem_set.values_list("quantity", flat=True)), [2, 3, 3, 3, 3]
+        )
+
+    def test_unavailable_item_rejects_the_whole_order(self):
+        side = MenuItem.objects.create(
+            restaurant=self.restaurant, name="Raita", price=30, availability=False
+        )
+        with self.assertRaisesMessage(ValidationError, "Raita is currently unavailable."):
+            place_order(self.customer, self.restaurant, "Home", {self.item.pk: 1, side.pk: 1})
+        self.assertFalse(Order.objects.exists())
+
+
+class OrderHistoryTests(TestCase):
+    def setUp(self):
+        self.customer = make_user()
+        restaurant = make_restaurant(make_user("owner@example.com"))
+        self.items = MenuItem.objects.bulk_create(
+            MenuItem(restaurant=restaurant, name=name, price=100) for name in ("Idli", "Vada")
+        )
+        eta.state()
+
+    def place(self, count):
+        for _ in range(count):
+            place_order(
+                self.customer, self.items[0].restaurant, "Home",
+                {item.pk: 1 for item in self.items},
+            )
+
+    def render_page(self):
+        page = order_history_page(self.customer, page_size=5)
+        return [
+            (order.restaurant_name, order.item_count,
+             [(item.menu_item.name, item.quantity) for item in order.orderitem_set.all()])
+            for order in page
+        ]
+
+    def test_page_takes_two_queries_whatever_the_number_of_orders(self):
+        self.place(2)
+        with self.assertNumQueries(2):
+            rows = self.render_page()
+        self.assertEqual(len(rows), 2)
+        self.place(6)
+        with self.assertNumQueries(2):
+            rows = self.render_page()
+        self.assertEqual(len(rows), 5)
+        self.assertEqual(rows[0], ("Spice Route", 2, [("Idli", 1), ("Vada", 1)]))
+
+
+class RateLimitTests(TestCase):
+    def login(self):
+        return self.client.post(reverse("login"), {"username": "a@example.com", "password": "x"})
+
+    @override_settings(RATE_LIMITS={"login": [("ip", "2/m")]})
+    def test_limit_is_enforced_and_follows_setting_changes(self):
+        self.assertNotEqual(self.login().status_code, 429)
+        self.assertNotEqual(self.login().status_code, 429)
+        self.assertEqual(self.login().status_code, 429)
+        with override_settings(RATE_LIMITS={"login": [("ip", "100/m")]}):
+            self.assertEqual(ratelimit.rules("login")[0].limit, 100)
+            self.assertNotEqual(self.login().status_code, 429)
+        self.assertEqual(ratelimit.rules("login")[0].limit, 2)
+
+    def test_previous_window_is_weighted_by_its_overlap(self):
+        rule = ratelimit.Rule.parse("ip", "4/m")
+        start = 600 * 60.0
+        for second in range(4):
+            self.assertEqual(ratelimit.hit("test", rule, "10.0.0.1", now=start + second), 0)
+        self.assertAlmostEqual(ratelimit.hit("test", rule, "10.0.0.1", now=start + 4), 56, delta=1)
+        # Half way through the next window half of the 5 hits still count.
+        self.assertEqual(ratelimit.hit("test", rule, "10.0.0.1", now=start + 90), 0)
+        self.assertAlmostEqual(ratelimit.hit("test", rule, "10.0.0.1", now=start + 91), 29, delta=1)
+        # Two windows later nothing is left to count.
+        self.assertEqual(ratelimit.hit("test", rule, "10.0.0.1", now=start + 180), 0)
+        self.assertEqual(RateLimitCounter.objects.get().previous, 0)
+        self.assertEqual(ratelimit.purge(now=start + 301), 1)
+
+
+class ConcurrentRateLimitTests(TransactionTestCase):
+    def test_limit_holds_for_concurrent_requests(self):
+        rule = ratelimit.Rule.parse("ip", "100/h")
+        now = 1000 * 3600.0
+        threads, hits_per_thread = 8, 50
+        allowed, errors = [], []
+        start = threading.Barrier(threads, timeout=10)
+
+        def worker():
+            try:
+                start.wait()
+                for _ in range(hits_per_thread):
+                    if ratelimit.hit("test", rule, "10.0.0.1", now=now) == 0:
+                        allowed.append(1)
+            except Exception as error:
+                errors.append(error)
+            finally:
+                connections.close_all()
+
+        workers = [threading.Thread(target=worker) for _ in range(threads)]
+        for thread in workers:
+            thread.start()
+        for thread in workers:
+            thread.join()
+        self.assertEqual(errors, [])
+        self.assertEqual(len(allowed), rule.limit)
+        self.assertEqual(RateLimitCounter.objects.get().hits, threads * hits_per_thread)
+
+
+class SmallEstimatedCountPaginator(EstimatedCountPaginator):
+    COUNT_LIMIT = 4
+    PAGES_AHEAD = 1
+
+
+class EstimatedCountPaginatorTests(TestCase):
+    def setUp(self):
+        user = make_user()
+        Order.objects.bulk_create(
+            Order(user=user, total_amount=10, delivery_address="Home") for _ in range(12)
+        )
+
+    def paginator(self, queryset, current_page=1):
+        return SmallEstimatedCountPaginator(
+            queryset.order_by("pk"), 2, current_page=current_page
+        )
+
+    def test_filtered_count_is_capped_and_grows_with_the_page(self):
+        pending = Order.objects.filter(order_status="pending")
+        first = self.paginator(pending)
+        self.assertEqual((first.count, first.count_display), (4, "4+"))
+        deeper = self.paginator(pending, current_page=5)
+        self.assertEqual((deeper.count, deeper.count_display), (12, "12"))
+        self.assertEqual(len(deeper.page(5).object_list), 2)
+
+    def test_pages_past_an_estimated_end_show_the_last_page(self):
+        Order.objects.filter(pk__in=Order.objects.order_by("pk").values("pk")[:3]).delete()
+        paginator = self.paginator(Order.objects.all())
+        self.assertEqual(paginator.count_display, f"about {Order.objects.order_by('-pk')[0].pk}")
+        near_end = self.paginator(Order.objects.all(), current_page=6)
+        self.assertEqual(near_end.count, 9)
+        page = near_end.page(6)
+        self.assertEqual(page.number, 5)
+        self.assertEqual(len(page.object_list), 1)
+
+
+class ExportTests(TransactionTestCase):
+    # Exports read through the replica connection, which can't see rows
+    # inside an open TestCase transaction.
+    databases = {"default", "replica"}
+
+    def setUp(self):
+        self.staff = make_user("staff@example.com", is_staff=True)
+        user = make_user()
+        Order.objects.bulk_create(
+            Order(user=user, total_amount=10, delivery_address="Home") for _ in range(5)
+        )
+
+    async def test_asgi_export_streams_from_an_async_iterator(self):
+        await sync_to_async(self.client.force_login)(self.staff)
+        client = AsyncClient()
+        client.cookies = self.client.cookies
+        response = await client.get("/exports/payments.csv")
+        self.assertEqual(response.status_code, 200)
+        # A sync iterator would be collected into a list before sending.
+        self.assertTrue(response.is_async)
+        body = b"".join([chunk async for chunk in response.streaming_content])
+        self.assertTrue(body.startswith(b"payment_id,"))
+
+    def test_wsgi_export_streams_from_a_sync_iterator(self):
+        self.client.force_login(self.staff)
+        response = self.client.get("/exports/payments.csv")
+        self.assertFalse(response.is_async)
+        self.assertTrue(b"".join(response.streaming_content).startswith(b"payment_id,"))
@@ -0,0 +1,85 @@
+import asyncio
+import json
+
+from .eta import eta_fields
+from .models import Order
+from .pubsub import SubscriptionOverflow, broker, order_channel
+
+# Live order updates pushed to customers as Server-Sent Events.
+
+KEEPALIVE_SECONDS = 15
+FINAL_STATUSES = ("delivered", "cancelled")
+
+
+def publish_status(order_ids, status):
+    for order_id in order_ids:
+        broker.publish(order_channel(order_id), ("status", {"order_status": status}))
+
+
+def _rider_data(delivery_person_id, name, vehicle_details):
+    return {
+        "delivery_person_id": delivery_person_id,
+        "name": name,
+        "vehicle_details": vehicle_details,
+    }
+
+
+def publish_rider(order_id, delivery_person):
+    broker.publish(
+        order_channel(order_id),
+        (
+            "rider",
+            _rider_data(
+                delivery_person.delivery_person_id,
+                delivery_person.user.name,
+                delivery_person.vehicle_details,
+            ),
+        ),
+    )
+
+
+def sse_event(event, data):
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+async def _current_state(order_id):
+    """The order's status, and the events that describe its current state."""
+    order = await Order.objects.values(
+        "order_status", "estimated_ready_at", "delivery_date", "delivery_person_id",
+        "delivery_person__user__name", "delivery_person__vehicle_details",
+    ).aget(pk=order_id)
+    events = [
+        sse_event("status", {"order_status": order["order_status"], **eta_fields(order)})
+    ]
+    if order["delivery_person_id"] is not None:
+        events.append(sse_event("rider", _rider_data(
+            order["delivery_person_id"],
+            order["delivery_person__user__name"],
+            order["delivery_person__vehicle_details"],
+        )))
+    return order["order_status"], events
+
+
+async def order_events(order_id):
+    # Subscribe before reading the current state so no change can slip
+    # through between the two.
+    with broker.subscribe(order_channel(order_id)) as subscription:
+        status, events = await _current_state(order_id)
+        for event in events:
+            yield event
+        while status not in FINAL_STATUSES:
+            try:
+                event, data = await subscription.get(timeout=KEEPALIVE_SECONDS)
+            except asyncio.TimeoutError:
+                yield ": keepalive\n\n"
+                continue
+            except SubscriptionOverflow:
+                # Updates were dropped, possibly the last one: send the
+                # current state instead.
+                status, events = await _current_state(order_id)
+                for event in events:
+                    yield event
+                continue
+            if event == "status":
+                status = data["order_status"]
+            yield sse_event(event, data)
@@ -1,6 +1,10 @@
+from django.conf import settings
 from django.urls import path
 from django.contrib.auth import views as auth_views
-from . import views
+from . import async_views, views
+
+# Restaurant browsing and order history run as async views under ASGI
+browse_views = async_views if getattr(settings, "ASYNC_BROWSE_VIEWS", False) else views
 
 urlpatterns = [
     # Authentication related paths
@@ -33,16 +37,23 @@ urlpatterns = [
     path("activate/<uidb64>/<token>/", views.activate, name="activate"),
     
     # Restaurant related paths
-    path("restaurants/", views.restaurant_list, name="restaurant_list"),
+    path("restaurants/", browse_views.restaurant_list, name="restaurant_list"),
     path(
         "restaurants/<int:restaurant_id>/",
-        views.restaurant_detail,
+        browse_views.restaurant_detail,
         name="restaurant_detail",
     ),
     path(
-        "restaurants/<int:restaurant_id>/menu/", views.menu_items, name="menu_items"
+        "restaurants/<int:restaurant_id>/menu/", browse_views.menu_items, name="menu_items"
+    ),
+    path(
+        "restaurants/<int:restaurant_id>/menu.json",
+        browse_views.menu_json,
+        name="menu_json",
     ),
     
+    path("search/", views.search_view, name="search"),
+
     # Order related paths
     path(
         "restaurants/<int:restaurant_id>/order/", 
@@ -54,12 +65,28 @@ urlpatterns = [
         views.order_confirmation_view,
         name="order_confirmation",
     ),
+    path(
+        "order/<int:order_id>/track/",
+        views.order_tracking_stream,
+        name="order_tracking",
+    ),
     
     # User profile and order history paths
     path("profile/", views.user_profile_view, name="user_profile"),
-    path("order/history/", views.order_history_view, name="order_history"),
+    path("order/history/", browse_views.order_history_view, name="order_history"),
+    path("notifications/", views.notifications_view, name="notifications"),
+    path("owner/dashboard/", views.owner_dashboard_view, name="owner_dashboard"),
+    path(
+        "owner/restaurants/<int:restaurant_id>/kitchen/feed/",
+        views.kitchen_feed_view,
+        name="kitchen_feed",
+    ),
     
     
+    # Monitoring
+    path("metrics/", views.request_metrics_view, name="request_metrics"),
+    path("exports/<slug:kind>.<slug:fmt>", views.export_view, name="export"),
+
     # Validations
     path('validate-aadhaar/', views.validate_aadhaar_view, name='validate_aadhaar'),
 ]
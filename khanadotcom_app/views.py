@@ -1,16 +1,29 @@
 from django.shortcuts import render, HttpResponse, redirect, get_object_or_404
-from django.contrib.auth import authenticate, login, logout, get_user_model
+from django.http import Http404, HttpResponseBadRequest, JsonResponse, StreamingHttpResponse
+from django.contrib.auth import login, logout, get_user_model
 from django.contrib.auth.decorators import login_required
+from django.contrib.admin.views.decorators import staff_member_required
 from django.contrib.sites.shortcuts import get_current_site
+from django.core.handlers.asgi import ASGIRequest
 from django.core.mail import EmailMessage
 from django.template.loader import render_to_string
 from django.utils.encoding import force_bytes, force_str
 from django.utils.http import urlsafe_base64_encode, urlsafe_base64_decode
 from .models import *
 from .tokens import account_activation_token
+from .orders import order_history_page, place_order
+from .menu_cache import get_menu, get_available_menu
+from .exports import EXPORTS, FORMATS, export_response, parse_filters
+from . import analytics, kitchen
+from .menu_snapshot import get_snapshot, snapshot_response
+from .notifications import NOTIFICATIONS_PER_PAGE, mark_all_read
+from .pagination import keyset_page
+from .search import search_available, search_objects
+from .tracking import order_events
+from . import instrumentation
 from .form import *
 from django.contrib.auth.forms import AuthenticationForm
-from django.core.exceptions import ValidationError
+from django.core.exceptions import PermissionDenied, ValidationError
 from stdnum.in_ import aadhaar
 
 User = get_user_model()
@@ -43,14 +56,12 @@ def login_page(request):
     if request.method == "POST":
         form = AuthenticationForm(request, request.POST)
         if form.is_valid():
-            username = form.cleaned_data.get("username")
-            password = form.cleaned_data.get("password")
-            user = authenticate(username=username, password=password)
-            if user is not None:
-                login(request, user)
-                return redirect(
-                    "home"
-                )  # Redirect to home page or wherever you want after login
+            # The form has already authenticated the user: hashing the
+            # password a second time would double the cost of every login.
+            login(request, form.get_user())
+            return redirect(
+                "home"
+            )  # Redirect to home page or wherever you want after login
         # Handle invalid login details here (optional)
     else:
         form = AuthenticationForm()
@@ -104,9 +115,25 @@ def user_profile_view(request):
     return render(request, "user_profile.html", context)
 
 
+RESTAURANT_ORDERINGS = {
+    "default": ("restaurant_id",),
+    "rating": ("-rating", "-restaurant_id"),
+    "newest": ("-restaurant_id",),
+}
+RESTAURANTS_PER_PAGE = 20
+
+
 def restaurant_list(request):
-    restaurants = Restaurant.objects.all()
-    context = {"restaurants": restaurants}
+    sort = request.GET.get("sort")
+    if sort not in RESTAURANT_ORDERINGS:
+        sort = "default"
+    restaurants = keyset_page(
+        Restaurant.objects.filter(is_deleted=False),
+        RESTAURANT_ORDERINGS[sort],
+        cursor=request.GET.get("after"),
+        page_size=RESTAURANTS_PER_PAGE,
+    )
+    context = {"restaurants": restaurants, "sort": sort}
     return render(request, "restaurant_list.html", context)
 
 
@@ -118,7 +145,7 @@ def restaurant_detail(request, restaurant_id):
 
 def menu_items(request, restaurant_id):
     restaurant = get_object_or_404(Restaurant, pk=restaurant_id)
-    menu_items = MenuItem.objects.filter(restaurant=restaurant)
+    menu_items = get_menu(restaurant.restaurant_id)
     context = {
         "restaurant": restaurant,
         "menu_items": menu_items,
@@ -126,51 +153,34 @@ def menu_items(request, restaurant_id):
     return render(request, "menu_items.html", context)
 
 
+def menu_json(request, restaurant_id):
+    snapshot = get_snapshot(restaurant_id)
+    if snapshot is None:
+        raise Http404("No Restaurant matches the given query.")
+    return snapshot_response(request, snapshot)
+
+
 @login_required(login_url="login")
 def order_placement_view(request, restaurant_id):
     restaurant = get_object_or_404(Restaurant, pk=restaurant_id)
-    menu_items = MenuItem.objects.filter(restaurant=restaurant, availability=True)
+    menu_items = get_available_menu(restaurant.restaurant_id)
 
     if request.method == "POST":
         form = OrderForm(restaurant_id, request.POST)
         if form.is_valid():
-            # Create Order object
-            order = Order.objects.create(
-                user=request.user,  # Assuming user is authenticated
-                delivery_address=form.cleaned_data["delivery_address"],
-                total_amount=0,  # Placeholder for total amount
-            )
-
-            # Process each selected menu item in the form
-            total_amount = 0
-
-            for item_id in form.cleaned_data["items"]:
-                menu_item = get_object_or_404(MenuItem, pk=item_id)
-                quantity = 1  # For simplicity, assuming quantity is always 1
-                OrderItem.objects.create(
-                    order=order,
-                    menu_item=menu_item,
-                    quantity=quantity,
-                    price=menu_item.price,
+            try:
+                order = place_order(
+                    user=request.user,
+                    restaurant=restaurant,
+                    delivery_address=form.cleaned_data["delivery_address"],
+                    quantities=form.cleaned_quantities(),
+                    coupon_code=form.cleaned_data["coupon_code"],
                 )
-                total_amount += (
-                    menu_item.price
-                )  # Accumulate menu item price to total_amount
-
-            # Update total_amount in the Order model
-            order.total_amount = total_amount
-            order.save()
-
-            # Create Payment object (example: cash on delivery)
-            payment = Payment.objects.create(
-                order=order,
-                payment_method="cash_on_delivery",
-                amount=total_amount,
-                payment_status="pending",  # Adjust based on actual payment flow
-            )
-
-            # Redirect to order confirmation page
-            return redirect("order_confirmation", order_id=order.order_id)
+            except ValidationError as e:
+                form.add_error(None, e)
+            else:
+                # Redirect to order confirmation page
+                return redirect("order_confirmation", order_id=order.order_id)
 
     else:
         form = OrderForm(restaurant_id=restaurant_id)
@@ -184,14 +194,30 @@ def order_placement_view(request, restaurant_id):
 
 
 def order_confirmation_view(request, order_id):
-    order = get_object_or_404(Order, order_id=order_id)
+    order = get_object_or_404(Order.objects.select_related("coupon"), order_id=order_id)
     context = {"order": order}
     return render(request, "order_confirmation.html", context)
 
 
+async def order_tracking_stream(request, order_id):
+    # Server-Sent Events stream of status changes and rider assignment.
+    # Needs the ASGI application so that open streams do not hold a thread.
+    user = await request.auser()
+    if not user.is_authenticated:
+        return HttpResponse(status=401)
+    if not await Order.objects.filter(pk=order_id, user=user).aexists():
+        raise Http404("No such order.")
+    response = StreamingHttpResponse(
+        order_events(order_id), content_type="text/event-stream"
+    )
+    response["Cache-Control"] = "no-cache"
+    response["X-Accel-Buffering"] = "no"
+    return response
+
+
+@login_required(login_url="login")
 def order_history_view(request):
-    # Fetch orders for the current user (assuming user is authenticated)
-    orders = Order.objects.filter(user=request.user).order_by("-order_date")
+    orders = order_history_page(request.user, cursor=request.GET.get("after"))
 
     context = {
         "orders": orders,
@@ -199,6 +225,110 @@ def order_history_view(request):
     return render(request, "order_history.html", context)
 
 
+@login_required(login_url="login")
+def notifications_view(request):
+    if request.method == "POST":
+        mark_all_read(request.user.pk)
+        return redirect("notifications")
+    page = keyset_page(
+        Notification.objects.filter(user=request.user),
+        ("-created_at", "-notification_id"),
+        cursor=request.GET.get("after"),
+        page_size=NOTIFICATIONS_PER_PAGE,
+    )
+    context = {"notifications": page}
+    return render(request, "notifications.html", context)
+
+
+SEARCH_RESULTS_PER_PAGE = 20
+
+
+def search_view(request):
+    query = request.GET.get("q", "").strip()
+    try:
+        page = max(int(request.GET.get("page", 1)), 1)
+    except ValueError:
+        page = 1
+
+    results = []
+    if query and search_available():
+        results = search_objects(
+            query,
+            limit=SEARCH_RESULTS_PER_PAGE + 1,
+            offset=(page - 1) * SEARCH_RESULTS_PER_PAGE,
+        )
+    context = {
+        "query": query,
+        "results": results[:SEARCH_RESULTS_PER_PAGE],
+        "page": page,
+        "has_next": len(results) > SEARCH_RESULTS_PER_PAGE,
+    }
+    return render(request, "search.html", context)
+
+
+@login_required(login_url="login")
+def owner_dashboard_view(request):
+    if request.user.user_type != "restaurant_owner":
+        raise PermissionDenied
+    restaurants = list(
+        Restaurant.objects.filter(owner=request.user)
+        .order_by("name")
+        .values_list("restaurant_id", "name")
+    )
+    if not restaurants:
+        return render(request, "owner_dashboard.html", {"restaurants": []})
+    selected = dict(restaurants)
+    try:
+        restaurant_id = int(request.GET.get("restaurant", restaurants[0][0]))
+        days = int(request.GET.get("days", 30))
+    except ValueError:
+        restaurant_id, days = restaurants[0][0], 30
+    if restaurant_id not in selected:
+        raise Http404("No such restaurant")
+    if days not in analytics.DASHBOARD_PERIODS:
+        days = 30
+    context = {
+        "restaurants": restaurants,
+        "restaurant_id": restaurant_id,
+        "restaurant_name": selected[restaurant_id],
+        "days": days,
+        "periods": analytics.DASHBOARD_PERIODS,
+        "stats": analytics.dashboard(restaurant_id, days),
+    }
+    return render(request, "owner_dashboard.html", context)
+
+
+@login_required(login_url="login")
+def kitchen_feed_view(request, restaurant_id):
+    # Polled by kitchen screens: ?after=<cursor from the previous response>
+    if not Restaurant.objects.filter(pk=restaurant_id, owner=request.user).exists():
+        raise Http404("No such restaurant")
+    return JsonResponse(kitchen.feed(restaurant_id, request.GET.get("after")))
+
+
+@staff_member_required
+def request_metrics_view(request):
+    # Latest per-view metrics of every worker process
+    instrumentation.flush(instrumentation.registry.snapshot())
+    return JsonResponse(
+        instrumentation.load_snapshots(), json_dumps_params={"indent": 2}
+    )
+
+
+@staff_member_required
+def export_view(request, kind, fmt):
+    # e.g. /exports/orders.csv?from=2024-01-01&to=2024-01-31&restaurant=12
+    if kind not in EXPORTS or fmt not in FORMATS:
+        raise Http404("Unknown export")
+    try:
+        filters = parse_filters(request.GET)
+    except ValueError:
+        return HttpResponseBadRequest("Invalid filter: use from/to=YYYY-MM-DD and restaurant=<id>.")
+    return export_response(
+        kind, fmt, **filters, asynchronous=isinstance(request, ASGIRequest)
+    )
+
+
 def validate_aadhaar_view(request):
     if request.method == "POST":
         form = AadhaarValidationForm(request.POST)
@@ -29,7 +29,12 @@ DEBUG = True
 ALLOWED_HOSTS = ['20.55.108.142']
 
 #email sender
-EMAIL_BACKEND = "django.core.mail.backends.smtp.EmailBackend"
+# Mail is queued in the outbox table and delivered by
+# "python manage.py send_queued_mail" through OUTBOX_EMAIL_BACKEND.
+EMAIL_BACKEND = "khanadotcom_app.outbox.QueuedEmailBackend"
+OUTBOX_EMAIL_BACKEND = "django.core.mail.backends.smtp.EmailBackend"
+OUTBOX_MAX_ATTEMPTS = 6
+OUTBOX_RETRY_BASE_SECONDS = 30
 EMAIL_HOST = "smtp.gmail.com"
 EMAIL_PORT = 587
 EMAIL_USE_TLS = True  # TLS (Transport Layer Security) protocol is used
@@ -55,20 +60,30 @@ INSTALLED_APPS = [
 AUTH_USER_MODEL = "khanadotcom_app.User"
 
 MIDDLEWARE = [
+    'khanadotcom_app.instrumentation.RequestMetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'khanadotcom_app.ratelimit.RateLimitMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
 ROOT_URLCONF = 'khanadotcom_project.urls'
 
+# Serve the read-heavy browse pages from khanadotcom_app/async_views.py
+ASYNC_BROWSE_VIEWS = True
+
+# Per-view request metrics (khanadotcom_app/instrumentation.py); each process
+# writes a snapshot to REQUEST_METRICS_DIR (default: a temp directory)
+REQUEST_METRICS_DIR = None
+REQUEST_METRICS_FLUSH_SECONDS = 30
+
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        'BACKEND': 'khanadotcom_app.instrumentation.InstrumentedDjangoTemplates',
         'DIRS': [],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -77,6 +92,7 @@ TEMPLATES = [
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
+                'khanadotcom_app.context_processors.notifications',
             ],
         },
     },
@@ -88,13 +104,108 @@ WSGI_APPLICATION = 'khanadotcom_project.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.0/ref/settings/#databases
 
+# Connections are kept open between requests (CONN_MAX_AGE) and tuned on
+# connect with SQLITE_PRAGMAS (see khanadotcom_app/database.py). Transactions
+# on "default" start with BEGIN IMMEDIATE so concurrent writers wait on the
+# busy timeout instead of failing with "database is locked" when a read
+# transaction tries to upgrade to a write. "replica" is a read-only connection
+# to the same file used by ReadReplicaRouter for the browse pages.
+
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
-    }
+        'CONN_MAX_AGE': 600,
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {
+            'transaction_mode': 'IMMEDIATE',
+            'timeout': 5,
+        },
+        # A file rather than memory, so tests running several threads get
+        # WAL and the busy timeout like the real database.
+        'TEST': {
+            'NAME': BASE_DIR / 'test_db.sqlite3',
+        },
+    },
+    'replica': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': f"file:{BASE_DIR / 'db.sqlite3'}?mode=ro",
+        'CONN_MAX_AGE': 600,
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {
+            'timeout': 5,
+        },
+        'TEST': {
+            'MIRROR': 'default',
+        },
+    },
 }
 
+DATABASE_ROUTERS = ['khanadotcom_app.database.ReadReplicaRouter']
+READ_REPLICA_DATABASE = 'replica'
+
+SQLITE_PRAGMAS = {
+    'journal_mode': 'wal',
+    'synchronous': 'normal',
+    'busy_timeout': 5000,
+    'mmap_size': 256 * 1024 * 1024,
+    'cache_size': -64 * 1024,
+}
+
+
+# Cache
+# https://docs.djangoproject.com/en/5.0/topics/cache/
+# The "menu" cache holds per-restaurant menus (see khanadotcom_app/menu_cache.py).
+# LocMemCache is per process; with several workers switch it to a shared
+# backend, e.g. "django.core.cache.backends.filebased.FileBasedCache" with
+# LOCATION set to a directory, or "django.core.cache.backends.redis.RedisCache".
+# MAX_ENTRIES / CULL_FREQUENCY control eviction for the local and file backends.
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'menu': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'menu',
+        'OPTIONS': {
+            'MAX_ENTRIES': 1000,
+            'CULL_FREQUENCY': 3,
+        },
+    },
+    # Shared by every worker process, for values that must not go stale in
+    # one worker while another changes them, such as the coupon index
+    # version. Its table is created by migration 0023.
+    'shared': {
+        'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+        'LOCATION': 'shared_cache',
+        'OPTIONS': {
+            'MAX_ENTRIES': 50000,
+            'CULL_FREQUENCY': 4,
+        },
+    },
+}
+
+MENU_CACHE_ALIAS = 'menu'
+MENU_CACHE_TIMEOUT = 3600
+
+# The version of the in-process coupon indexes (khanadotcom_app/coupons.py)
+COUPON_CACHE_ALIAS = 'shared'
+COUPON_INDEX_MAX_AGE = 300
+
+# With REDIS_URL set (e.g. "redis://127.0.0.1:6379/1"; needs the redis
+# package), sessions are read from Redis and written through to the
+# database, so a steady-state request makes no session query. A cache in
+# the database would save nothing, so without Redis sessions stay in the
+# database.
+if os.environ.get('REDIS_URL'):
+    CACHES['sessions'] = {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': os.environ['REDIS_URL'],
+    }
+    SESSION_ENGINE = 'django.contrib.sessions.backends.cached_db'
+    SESSION_CACHE_ALIAS = 'sessions'
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.0/ref/settings/#auth-password-validators
@@ -139,4 +250,29 @@ STATICFILES_DIRS = [
 MEDIA_URL = "/media/"
 MEDIA_ROOT = os.path.join(BASE_DIR, "media")
 
+# Uploaded pictures are resized into WebP/JPEG variants by a pool of worker
+# processes (khanadotcom_app/image_pipeline.py). Files under
+# MEDIA_ROOT/variants/ are content-hashed: serve them with
+# "Cache-Control: public, max-age=31536000, immutable".
+IMAGE_PIPELINE_WORKERS = 2
+
+# Requests per client for the URL names below, enforced by RateLimitMiddleware
+# (khanadotcom_app/ratelimit.py) before the view runs. Rules are
+# (key, rate[, methods]); key is "ip", "user" (logged-in user) or
+# "post:<field>" (a submitted value, e.g. the account being logged into).
+# Counters are kept in the rate_limit_counter table, so the limits hold across
+# worker processes. Behind a proxy, set RATE_LIMIT_IP_HEADER to the
+# header carrying the client address, e.g. "HTTP_X_FORWARDED_FOR".
+RATE_LIMITS = {
+    'login': [('ip', '20/m'), ('post:username', '5/m'), ('post:username', '20/h')],
+    'signup': [('ip', '5/h')],
+    'password_reset': [('ip', '5/h'), ('post:email', '3/h')],
+    'validate_aadhaar': [('ip', '30/m'), ('user', '10/m')],
+}
+RATE_LIMIT_IP_HEADER = None
+
+# Coupon redemptions are counted over this many rows per coupon
+# (khanadotcom_app/coupons.py).
+COUPON_COUNTER_SHARDS = 8
+
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'